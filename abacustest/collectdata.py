@@ -1,6 +1,8 @@
-import os,sys,json
+import os,sys,json,gc
 sys.path.append(os.path.split(__file__)[0])
-from .lib_collectdata.collectdata import RESULT
+from .lib_collectdata.collectdata import RESULT,ResultClass
+from .lib_collectdata.cache import ParseCache
+from .lib_collectdata.resultfile import WriteResults,JsonlWriter,JsonlIndex,CompactJsonl
 import argparse
 import traceback
 
@@ -17,8 +19,21 @@ def parse_param(paramf):
         print("ERROR: can not find file %s" % paramf)
         return []
 
-def parse_value(abacus_result,allparams):
+def param_keys(allparams):
+    '''return the keys required by allparams, the element of allparams is a key or a dict of {key: subkeys}'''
+    keys = []
+    for param in allparams:
+        if isinstance(param,str):
+            keys.append(param)
+        elif isinstance(param,dict):
+            keys += [k for k in param if isinstance(k,str)]
+    return keys
+
+def parse_value(abacus_result,allparams,low_memory=False):
     allresult = {}
+    # only the methods of the required keys are run, by the order of their dependencies
+    abacus_result.Evaluate(param_keys(allparams),low_memory=low_memory)
+
     for param in allparams:
         if isinstance(param,str):
             allresult[param] = abacus_result[param]
@@ -44,16 +59,162 @@ def parse_value(abacus_result,allparams):
             print("%s should be str or dict" % str(param))
     return allresult                        
 
+def current_rss():
+    '''return the resident memory (MB) of this process, or None if it is unknown'''
+    try:
+        with open("/proc/self/statm") as f1:
+            return int(f1.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except:
+        return None
+
+def trim_memory():
+    '''collect the garbage and return the freed heap memory to the system'''
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except:
+        pass
+
+class Collector:
+    '''
+    A session to collect the values of many jobs in one process. The modules and self-defined methods are
+    imported, and the reference file is read only once when the session is created:
+        collector = Collector("abacus",modules=["trajectory"],ref="resultREF.json")
+        values = collector.collect(["job1","job2"],["energy","natom"])    # {"job1": {"energy":..,"natom":..},..}
+        df = collector.collect(glob.glob("*"),["energy"],dataframe=True) # a DataFrame, each row is a job
+    If cache is True, the valid values in job/.abacustest_cache.json are reused, and the new values are saved to it.
+    If low_memory is True, the raw context of the output files is released once it is not needed (see Result.Evaluate).
+    If max_rss (MB) is set, the low memory mode is used, and the freed memory is returned to the system 
+    after a job if the resident memory exceeds max_rss.
+    '''
+    def __init__(self,fmt="abacus",newmethods=None,modules=None,ref=None,cache=False,low_memory=False,max_rss=None):
+        self.fmt = fmt
+        self.result_class = ResultClass(fmt=fmt,newmethods=newmethods,modules=modules)
+        # the registered keys are not changed in the session
+        self.allkeys = list(self.result_class.AllMethod().keys())
+        self.ref = ref
+        self.ref_data = {}
+        if ref and os.path.isfile(ref):
+            with open(ref) as f1: self.ref_data = json.load(f1)
+        self.cache = cache
+        self.low_memory = low_memory or bool(max_rss)
+        self.max_rss = max_rss
+
+    def result(self,path):
+        '''return the Result of the job in path'''
+        result = self.result_class(path=path,resultREF=self.ref)
+        result.resultREF = self.ref_data
+        return result
+
+    def collect_job(self,path,allparams=None,outsource=False):
+        '''
+        Collect the values of allparams from the job in path. If allparams is empty, all registered keys are collected.
+        Return (values, sources), sources is the dict returned by AllSourceUsed() if outsource is True.
+        If the collection is failed, values is None.
+        '''
+        try:
+            result = self.result(path)
+            if not allparams:
+                allparams = self.allkeys
+            if self.cache:
+                parse_cache = ParseCache(path)
+                parse_cache.Restore(result,param_keys(allparams))
+            values = parse_value(result,allparams,low_memory=self.low_memory)
+            if self.cache:
+                parse_cache.Update(result)
+                parse_cache.Save()
+            sources = result.AllSourceUsed() if outsource else None
+            del result
+            if self.max_rss:
+                self.check_rss(path)
+            return values,sources
+        except:
+            traceback.print_exc()
+            print("ERROR: collect data from %s failed, skip it!" % path)
+            return None,None
+
+    def check_rss(self,path):
+        rss = current_rss()
+        if rss == None or rss <= self.max_rss:
+            return
+        trim_memory()
+        rss = current_rss()
+        if rss > self.max_rss:
+            print("WARNING: the resident memory is %.1f MB after collecting %s, larger than the limit %.1f MB" % (rss,path,self.max_rss))
+
+    def collect(self,paths,keys=None,dataframe=False):
+        '''
+        Collect the values of keys (default is all registered keys) from the jobs in paths.
+        Return a dict of {path: {key: value}}, or a pandas DataFrame whose index is path if dataframe is True.
+        The failed jobs are skipped.
+        '''
+        allvalues = {}
+        for path in paths:
+            values,_ = self.collect_job(path,keys)
+            if values != None:
+                allvalues[path] = values
+        if dataframe:
+            import pandas as pd
+            return pd.DataFrame.from_dict(allvalues,orient="index")
+        return allvalues
+
+_WORKER_COLLECTOR = None
+
+def _init_worker(jobtype,newmethods,modules,ref,cache,low_memory,max_rss):
+    # each worker has one collector, so the self-defined methods and modules are imported once
+    global _WORKER_COLLECTOR
+    _WORKER_COLLECTOR = Collector(fmt=jobtype,newmethods=newmethods,modules=modules,ref=ref,cache=cache,
+                                  low_memory=low_memory,max_rss=max_rss)
+
+def _collect_job_worker(args):
+    return _WORKER_COLLECTOR.collect_job(*args)
+
+def collect_jobs(jobtype,jobs,allparams,newmethods=None,modules=None,ref=None,outsource=False,cache=False,nproc=1,chunksize=None,
+                 low_memory=False,max_rss=None):
+    '''
+    A generator of (ipath, values, sources) of each job in jobs, see Collector.collect_job. 
+    The results are yielded by the order of jobs.
+    If nproc > 1, the jobs are collected by a pool of nproc processes, and each worker
+    handles chunksize jobs at once (default is len(jobs)/nproc/4), and max_rss is the limit of each process.
+    '''
+    if nproc > 1 and len(jobs) > 1:
+        import multiprocessing
+        if not chunksize:
+            chunksize = max(1,len(jobs) // (nproc * 4))
+        print("Collect %d jobs by %d processes, chunksize = %d" % (len(jobs),nproc,chunksize))
+        with multiprocessing.Pool(nproc,initializer=_init_worker,initargs=(jobtype,newmethods,modules,ref,cache,low_memory,max_rss)) as pool:
+            results = pool.imap(_collect_job_worker,[(ipath,allparams,outsource) for ipath in jobs],chunksize=chunksize)
+            for i,(ipath,(values,sources)) in enumerate(zip(jobs,results)):
+                print("Finished %d/%d: %s" % (i+1,len(jobs),ipath))
+                yield ipath,values,sources
+    else:
+        collector = Collector(fmt=jobtype,newmethods=newmethods,modules=modules,ref=ref,cache=cache,
+                              low_memory=low_memory,max_rss=max_rss)
+        for ipath in jobs:
+            print("Handle %s" % ipath)
+            values,sources = collector.collect_job(ipath,allparams,outsource)
+            yield ipath,values,sources
+
 def CollectDataArgs(parser):
     parser.description = "This script is used to collect some key values from the output of ABACUS/QE/VASP jobs"
     parser.add_argument('-j', '--jobs', default=["."], help='the path of jobs', action="extend",nargs="*")
     parser.add_argument('-t', '--type', type=int, default=0, help='0:abacus, 1:qe, 2:vasp. Default: 0',choices=[0,1,2])
     parser.add_argument('-p', '--param', type=str, default=None, help='the parameter file, should be .json type')
-    parser.add_argument('-o', '--output', type=str, default="result.json",help='the file name to store the output results, default is "result.json"')
+    parser.add_argument('-o', '--output', type=str, default="result.json",help='the file name to store the output results, default is "result.json". The columnar format is used if the extension is .npz or .parquet')
     parser.add_argument('-m', '--modules',help='add extra modules. Default only module \'job-type\' will be loaded, such as: \'abacus\' for abacus type. You can check all modules by --outparam', action="extend",nargs="*")
     parser.add_argument('--newmethods', help='the self-defined python modules, and shuold be format of import, such as "abc"(the file name is abc.py), "a.b.c" (teh file is a/b/c.py)', action="extend",nargs="*")
     parser.add_argument('--outparam', nargs='?',type=int, const=1, default=0,help='output the registed parameters, you can set the type by -t or --type to choose abacus/qe/vasp. 0: No, 1: yes')
     parser.add_argument('--ref', type=str, nargs='?',default=None,const="resultREF.json",help='A json file includes the reference value of some keys. Generally, get values of keys start with \"delta_\" require this file. Default is resultREF.json')
+    parser.add_argument('--outsource', nargs='?',type=int, const=1, default=0,help='output the source files read by the method of each key. 0: No, 1: yes')
+    parser.add_argument('--cache', nargs='?',type=int, const=1, default=0,help='reuse the values cached in .abacustest_cache.json of each job if the files read and the methods are not changed, and save the new values to it. 0: No, 1: yes')
+    parser.add_argument('--jsonl', type=str, default=None,help='write the values of each job to this .jsonl file once the job is collected, and write the output file from it at the end')
+    parser.add_argument('--resume', nargs='?',type=int, const=1, default=0,help='skip the jobs that have been collected in the jsonl file (default is the output file name with extension .jsonl), and append the new jobs to it. 0: No, 1: yes')
+    parser.add_argument('--fsync', type=int, default=50,help='fsync the jsonl file after every N jobs, default is 50')
+    parser.add_argument('--nproc', type=int, default=1,help='the number of processes to collect the jobs in parallel, default is 1')
+    parser.add_argument('--chunksize', type=int, default=None,help='the number of jobs sent to a process at once when nproc > 1. Default is njobs/nproc/4')
+    parser.add_argument('--lowmem', nargs='?',type=int, const=1, default=0,help='release the context of the output files of a job once the values needing them are collected, to reduce the memory. 0: No, 1: yes')
+    parser.add_argument('--maxrss', type=float, default=None,help='the limit of resident memory (MB) of each process, the freed memory is returned to the system if it is exceeded. Imply --lowmem')
     return parser
 
 def collectdata(param):    
@@ -82,21 +243,51 @@ def collectdata(param):
         return
 
     allparams = parse_param(paramf)
-    allresult = {}
+    jobs = []
     for ipath in alljobs:
         if not os.path.isdir(ipath):
             print("ERROR: %s is not a directory, skip it!" % ipath)
             continue
+        jobs.append(ipath)
 
-        print("Handle %s" % ipath)
-    
-        result = RESULT(fmt=jobtype, path=ipath,newmethods=param.newmethods,modules=param.modules,resultREF=param.ref)
-        if len(allparams) == 0:
-            allparams = list(result.AllMethod().keys())
-        allresult[ipath] = parse_value(result,allparams)
+    # in the streaming mode, the values of each job are written to the jsonl file and not kept in memory
+    jsonlf = param.jsonl
+    if param.resume and jsonlf == None:
+        jsonlf = os.path.splitext(outputf)[0] + ".jsonl"
+    writer = None
+    todo_jobs = jobs
+    if jsonlf != None:
+        if param.resume:
+            collected = JsonlIndex(jsonlf,repair=True)
+            todo_jobs = [i for i in jobs if i not in collected]
+            print("%d jobs have been collected in %s, skip them" % (len(jobs) - len(todo_jobs),jsonlf))
+        writer = JsonlWriter(jsonlf,append=param.resume,sync_every=param.fsync)
+
+    allresult = {}
+    try:
+        for ipath,values,sources in collect_jobs(jobtype,todo_jobs,allparams,newmethods=param.newmethods,modules=param.modules,
+                                                 ref=param.ref,outsource=param.outsource,cache=param.cache,nproc=param.nproc,chunksize=param.chunksize,
+                                                 low_memory=param.lowmem,max_rss=param.maxrss):
+            if values == None:
+                continue
+            if writer != None:
+                writer.Write(ipath,values)
+            else:
+                allresult[ipath] = values
+            if param.outsource:
+                print("Sources used by %s:" % ipath)
+                for k,v in sources.items():
+                    print("%20s:\t%s" % (k,", ".join(v)))
+    finally:
+        if writer != None:
+            writer.Close()
 
     print("Write the results to %s" % outputf)
-    json.dump(allresult,open(outputf,"w"),indent=4)
+    if writer != None:
+        CompactJsonl(jsonlf,outputf,jobs)
+        print("Use 'abacustest outresult -r %s' to show the results" % outputf)
+        return
+    WriteResults(allresult,outputf)
     
     from .outresult import pandas_out
     pandas_out(allresult)
@@ -1,5 +1,6 @@
 import os,sys,json,copy,traceback,glob
 from . import comm_echarts,comm_func
+from abacustest.lib_collectdata.resultfile import ReadResults
 from dp.launching.report import Report, AutoReportElement, ReportSection, ChartReportElement
 
 # the unit of some metrics
@@ -527,7 +528,7 @@ def produce_metrics(metric_file, output_path, ref_data={}, report_titile="metric
     import pandas as pd
 
     metric_filename = os.path.split(metric_file)[-1]
-    allresults = json.load(open(metric_file))
+    allresults = ReadResults(metric_file)
     allresults,ref_metric_name = add_ref(allresults, ref_data)
     csv_filename = os.path.splitext(metric_filename)[0] + ".csv"
     _, _, savefile_names = outresult.pandas_out(
@@ -1,56 +1,63 @@
 import os,sys,glob,re
 from ..resultAbacus import ResultAbacus
 from .. import comm
+import numpy as np
+
+# the rows of force ("Al1  x  y  z") and stress ("xx  xy  xz") in running_xxx.log
+FLOAT_PATTERN = r'[-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?'
+FORCE_ROW_PATTERN = re.compile(r'^\s*[A-Z][a-z]?[1-9][0-9]*' + r'\s+%s' % FLOAT_PATTERN * 3 + r'\s*$')
+STRESS_ROW_PATTERN = re.compile(r'^\s*%s' % FLOAT_PATTERN + r'\s+%s' % FLOAT_PATTERN * 2 + r'\s*$')
 
 class Abacus(ResultAbacus):
     
-    @ResultAbacus.register(version="the version of ABACUS")
+    @ResultAbacus.register(sources=["LOGINDEX"],
+                           version="the version of ABACUS")
     def GetVersion(self):
-        if len(self.LOG) > 0:
-            for line_idx,line in enumerate(self.LOG):
-                if "WELCOME TO ABACUS" in line:
-                    version = line.split()[-1]
-                    if version[0].lower() != 'v':
-                        print("Unknow version of '%s'" % version)
-                    self['version'] = version
-                    return
-                elif line[30:36] == "ABACUS":
-                    version = line[36:].strip()
-                    commit = "unknown"
-                    for ii in range(30):
-                        if line_idx + ii >= len(self.LOG):
-                            break
-                        if "Commit:" in self.LOG[line_idx + ii]:
-                            commit = re.split(":",self.LOG[line_idx + ii].strip(),maxsplit=1)[-1].strip()
-                            break
-                    self['version'] = version + "(" + commit + ")"
-                    return
+        # the version is in the line of "WELCOME TO ABACUS", or in the header of old version like:
+        #                              ABACUS v2.3.0
+        # which is found from the lines that have "ABACUS" in LOGINDEX, no line is walked through here
+        welcome_idx = self.LOGINDEX.First("WELCOME TO ABACUS")
+        header_idx = [i for i in self.LOGINDEX.Find("ABACUS") if self.LOG[i][30:36] == "ABACUS"]
+        if welcome_idx != None and (len(header_idx) == 0 or welcome_idx < header_idx[0]):
+            version = self.LOG[welcome_idx].split()[-1]
+            if version[0].lower() != 'v':
+                print("Unknow version of '%s'" % version)
+            self['version'] = version
+        elif len(header_idx) > 0:
+            line_idx = header_idx[0]
+            version = self.LOG[line_idx][36:].strip()
+            commit = "unknown"
+            for ii in self.LOGINDEX.Find("Commit:"):
+                if line_idx <= ii < line_idx + 30:
+                    commit = re.split(":",self.LOG[ii].strip(),maxsplit=1)[-1].strip()
+                    break
+            self['version'] = version + "(" + commit + ")"
                                               
-    @ResultAbacus.register(ncore="the mpi cores")
+    @ResultAbacus.register(sources=["LOGINDEX"],
+                           ncore="the mpi cores")
     def GetNcore(self):
-        for line in self.LOG:
-            if "DSIZE =" in line:
-                self['ncore'] = int(line.split()[-1])
-                return
+        i = self.LOGINDEX.First("DSIZE =")
+        if i != None:
+            self['ncore'] = int(self.LOG[i].split()[-1])
     
-    @ResultAbacus.register(normal_end="if the job is normal ending")
+    @ResultAbacus.register(sources=["LOGTAIL"],
+                           normal_end="if the job is normal ending")
     def GetNormalEnd(self):
-        if len(self.LOG) == 0:
+        lastlines = self.LOGTAIL.LastLines(10)
+        if len(lastlines) == 0:
             self['normal_end'] = None
             return
-        elif len(self.LOG) > 0 and " Total  Time  :" in self.LOG[-1]:
+        elif " Total  Time  :" in lastlines[-1]:
             self['normal_end'] = True
             return
         else:
             self['normal_end'] = False
 
             print("Job is not normal ending!!! The latest 10 lines is:")
-            if len(self.LOG) < 10:
-                print(''.join(self.LOG))
-            else:
-                print(''.join(self.LOG[-10:]))
+            print(''.join(lastlines))
 
-    @ResultAbacus.register(INPUT="a dict to store the setting in OUT.xxx/INPUT")
+    @ResultAbacus.register(sources=["OUTINPUT","INPUT"],
+                           INPUT="a dict to store the setting in OUT.xxx/INPUT")
     def GetInputParameter(self):
         def str2intfloat(ii):
             try:
@@ -62,11 +69,10 @@ class Abacus(ResultAbacus):
             except:
                 return ii
 
-        INPUTf = os.path.join(self.PATH,"OUT.%s/INPUT" % self.SUFFIX)
-        if os.path.isfile(INPUTf):
-            with open(INPUTf) as f1:
-                input_context = f1.readlines()
-        else:
+        # OUT.xxx/INPUT is always used, so that the value is updated when it is written later,
+        # and the INPUT in job path is read if it does not exist
+        input_context = self.OUTINPUT
+        if not os.path.isfile(self.OUTINPUTf):
             input_context = self.INPUT
         
         readinput = False
@@ -82,7 +88,8 @@ class Abacus(ResultAbacus):
                     INPUT[sline[0].lower()] = str2intfloat(sline[1].strip())
         self["INPUT"] = INPUT
     
-    @ResultAbacus.register(kpt="list, the K POINTS setting in KPT file")
+    @ResultAbacus.register(sources=["KPT"],
+                           kpt="list, the K POINTS setting in KPT file")
     def GetKptParam(self):
         if len(self.KPT) > 3:
             self["kpt"] = [int(i) for i in self.KPT[3].split()[:3]]
@@ -90,7 +97,8 @@ class Abacus(ResultAbacus):
             self["kpt"] = None
 
 
-    @ResultAbacus.register(nbands="number of bands",
+    @ResultAbacus.register(sources=["LOGINDEX"],
+                           nbands="number of bands",
                            nkstot = "total K point number",
                            ibzk = "irreducible K point number",
                            natom ="total atom number",
@@ -103,7 +111,11 @@ class Abacus(ResultAbacus):
         nelec = 0
         point_group = None
         point_group_in_space_group = None
-        for i,line in enumerate(self.LOG):
+        markers = ["NBANDS =","nkstot =","nkstot_ibz =","number of atom for this type =",
+                   "total electron number of element","[fft grid for charge/potential] =",
+                   "POINT GROUP =","POINT GROUP IN SPACE GROUP ="]
+        for i in self.LOGINDEX.Lines(markers):
+            line = self.LOG[i]
             if "NBANDS =" in line:
                 self['nbands'] = int(line.split()[2])
             elif 'nkstot =' in line:
@@ -128,7 +140,8 @@ class Abacus(ResultAbacus):
         if nelec > 0:
             self["nelec"] = nelec 
 
-    @ResultAbacus.register(converge="if the SCF is converged",
+    @ResultAbacus.register(depends=["natom"],sources=["LOGINDEX"],
+                           converge="if the SCF is converged",
                            total_mag="total magnetism (Bohr mag/cell)",
                            absolute_mag="absolute magnetism (Bohr mag/cell)",
                            energy = "the total energy (eV)",
@@ -142,7 +155,11 @@ class Abacus(ResultAbacus):
         converge = None
         energy = None
         volume = None
-        for i,line in enumerate(self.LOG):
+        markers = ['charge density convergence is achieved','convergence has NOT been achieved!',
+                   'convergence has not been achieved','total magnetism (Bohr mag/cell)',
+                   'absolute magnetism',"!FINAL_ETOT_IS","Volume (A^3) =",'E_Fermi']
+        for i in self.LOGINDEX.Lines(markers):
+            line = self.LOG[i]
             if 'charge density convergence is achieved' in line:
                 converge = True
             elif 'convergence has NOT been achieved!' in line or\
@@ -180,75 +197,52 @@ class Abacus(ResultAbacus):
         if self["natom"] != None and self['energy'] != None:
             self["energy_per_atom"] = self['energy']/self["natom"]
     
-    @ResultAbacus.register(force="list[3*natoms], force of the system, if is MD or RELAX calculation, this is the last one")
+    @ResultAbacus.register(sources=["LOGTAIL"],
+                           force="list[3*natoms], force of the system, if is MD or RELAX calculation, this is the last one")
     def GetForceFromLog(self):
         force = None
-        for i in range(len(self.LOG)):
-            i = -1*i - 1
-            line = self.LOG[i]
-            if 'TOTAL-FORCE (eV/Angstrom)' in line:
-                #head_pattern = re.compile(r'^\s*atom\s+x\s+y\s+z\s*$')
-                value_pattern = re.compile(r'^\s*[A-Z][a-z]?[1-9][0-9]*\s+[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?\s+[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?\s+[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?\s*$')
-                j = i
-                noforce = False
-                while not value_pattern.match(self.LOG[j]):
-                    j += 1
-                    if j >= i + 10:
-                        print("Warning: can not find the first line of force")
-                        noforce = True
-                        break
-                if noforce:
-                    break
-                
-                while value_pattern.match(self.LOG[j]):
-                    if force == None:
-                        force = []
-                    force += [float(ii) for ii in self.LOG[j].split()[1:4]]
-                    j += 1
-                break
+        pos,_ = self.LOGTAIL.FindLast(['TOTAL-FORCE (eV/Angstrom)'])
+        if pos != None:
+            force = comm.ReadBlock(self.LOGTAIL.LinesFrom(pos),pattern=FORCE_ROW_PATTERN,maxskip=9,columns=range(1,4))
+            if force is None:
+                print("Warning: can not find the first line of force")
+            else:
+                force = force.flatten().tolist()
         self['force'] = force
     
-    @ResultAbacus.register(stress="list[9], stress of the system, if is MD or RELAX calculation, this is the last one",
+    @ResultAbacus.register(sources=["LOGTAIL"],
+                           stress="list[9], stress of the system, if is MD or RELAX calculation, this is the last one",
                            virial="list[9], virial of the system,  = stress * volume, which is the last one.")
     def GetStessFromLog(self):
         stress = None
-        for i in range(len(self.LOG)):
-            i = -1*i - 1
-            line = self.LOG[i]
-            if 'TOTAL-STRESS (KBAR)' in line:
-                value_pattern = re.compile(r'^\s*[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?\s+[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?\s+[-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?\s*$')
-                j = i 
-                nostress = False
-                # find the first line of stress
-                while not value_pattern.match(self.LOG[j]):
-                    j += 1
-                    if j >= i + 10: # if can not find the first line of force in 10 lines, then stop
-                        print("Warning: can not find the first line of force")
-                        nostress = True
-                        break
-                if nostress:
-                    break
-                
-                while value_pattern.match(self.LOG[j]):
-                    if stress == None:
-                        stress = []
-                    stress += [float(ii) for ii in self.LOG[j].split()[:3]]
-                    j += 1
-                break
+        pos,_ = self.LOGTAIL.FindLast(['TOTAL-STRESS (KBAR)'])
+        if pos != None:
+            # if can not find the first line of stress in 10 lines, then stop
+            stress = comm.ReadBlock(self.LOGTAIL.LinesFrom(pos),pattern=STRESS_ROW_PATTERN,maxskip=9,columns=range(3))
+            if stress is None:
+                print("Warning: can not find the first line of stress")
+            else:
+                stress = stress.flatten().tolist()
         self['stress'] = stress
-        if stress != None and self["volume"] != None:
-            self['virial'] = [i * self["volume"] * comm.KBAR2EVPERANGSTROM3 for i in stress]
+
+        # the volume of the last ION step, is same as self["volume"] but do not need to read the whole log
+        volume = None
+        pos,_ = self.LOGTAIL.FindLast(["Volume (A^3) ="])
+        if pos != None:
+            volume = float(self.LOGTAIL.Lines(pos,1)[0].split()[-1])
+        if stress != None and volume != None:
+            self['virial'] = [i * volume * comm.KBAR2EVPERANGSTROM3 for i in stress]
         else:
             self['virial'] = None
         
-    @ResultAbacus.register(largest_gradient="list, the largest gradient of each ION step. Unit in eV/Angstrom")
+    @ResultAbacus.register(sources=["LOGINDEX"],
+                           largest_gradient="list, the largest gradient of each ION step. Unit in eV/Angstrom")
     def GetLargestGradientFromLog(self):
         lg = None
-        for line in self.LOG:
-            if "Largest gradient is" in line:
-                if lg == None:
-                    lg = []
-                lg.append(float(line.split()[-1]))
+        for i in self.LOGINDEX.Find("Largest gradient is"):
+            if lg == None:
+                lg = []
+            lg.append(float(self.LOG[i].split()[-1]))
         self['largest_gradient'] = lg
         
     '''
@@ -307,7 +301,8 @@ class Abacus(ResultAbacus):
         self['band_gap'] = band_gap
     '''
         
-    @ResultAbacus.register(band_gap = "band gap of the system")
+    @ResultAbacus.register(depends=["nbands","ibzk","nkstot","nelec"],sources=["LOGINDEX"],
+                           band_gap = "band gap of the system")
     def GetBandGapFromLog(self):
         def ErrorReturn(strinfo):
             print("WARNING: %s, skip the catch of band gap info" % strinfo)
@@ -339,39 +334,40 @@ class Abacus(ResultAbacus):
                 
         band_gap = None
         #print("nelec:",nelec,"occu_band:",occu_band,"nband:",nband,"nk:",nk)
-        for i,line in enumerate(self.LOG):
-            if 'STATE ENERGY(eV) AND OCCUPATIONS' in line:
-                nspin = int(line.split()[-1])
-                if nspin not in [1,2]:
-                    ErrorReturn("NOT SUPPORT FOR NSPIN=%d now" % nspin)
-                    return
+        i = self.LOGINDEX.First('STATE ENERGY(eV) AND OCCUPATIONS')
+        if i != None:
+            line = self.LOG[i]
+            nspin = int(line.split()[-1])
+            if nspin not in [1,2]:
+                ErrorReturn("NOT SUPPORT FOR NSPIN=%d now" % nspin)
+                return
 
-                totalcb = None
-                totalvb = None
-                for ispin in range(nspin):
-                    cb = None
-                    vb = None
-                    for k in range(nk):
-                        eband1 = float(self.LOG[((nband+2)*nk + 1) * ispin + (nband+2)*k + nspin + occu_band + i].split()[1])  # the highest occupied band
-                        eband2 = float(self.LOG[((nband+2)*nk + 1) * ispin + (nband+2)*k + nspin + occu_band + 1 + i].split()[1])  # the lowest unoccupied band
-                        if cb == None or eband1 > cb:
-                            cb = eband1
-                        if vb == None or eband2 < vb:
-                            vb = eband2
-                        #print("k:",k,"eband1:",eband1,"eband2:",eband2,"cb:",cb,"vb:",vb)
-                    if totalcb == None or (cb != None and totalcb < cb): totalcb = cb
-                    if totalvb == None or (vb != None and totalvb > vb): totalvb = vb
-                    #print("ispin:",ispin,"totalcb:",totalcb,"totalvb:",totalvb)
-                if totalcb == None or totalvb == None:
-                    band_gap = None
-                else:
-                    band_gap = totalvb-totalcb
-                    if band_gap < 0: band_gap = 0
-                break
+            totalcb = None
+            totalvb = None
+            for ispin in range(nspin):
+                cb = None
+                vb = None
+                for k in range(nk):
+                    eband1 = float(self.LOG[((nband+2)*nk + 1) * ispin + (nband+2)*k + nspin + occu_band + i].split()[1])  # the highest occupied band
+                    eband2 = float(self.LOG[((nband+2)*nk + 1) * ispin + (nband+2)*k + nspin + occu_band + 1 + i].split()[1])  # the lowest unoccupied band
+                    if cb == None or eband1 > cb:
+                        cb = eband1
+                    if vb == None or eband2 < vb:
+                        vb = eband2
+                    #print("k:",k,"eband1:",eband1,"eband2:",eband2,"cb:",cb,"vb:",vb)
+                if totalcb == None or (cb != None and totalcb < cb): totalcb = cb
+                if totalvb == None or (vb != None and totalvb > vb): totalvb = vb
+                #print("ispin:",ispin,"totalcb:",totalcb,"totalvb:",totalvb)
+            if totalcb == None or totalvb == None:
+                band_gap = None
+            else:
+                band_gap = totalvb-totalcb
+                if band_gap < 0: band_gap = 0
                 
         self['band_gap'] = band_gap
 
-    @ResultAbacus.register(total_time="the total time of the job",
+    @ResultAbacus.register(sources=["OUTPUT","TIME"],
+                           total_time="the total time of the job",
                            stress_time="the time to do the calculation of stress",
                            force_time = "the time to do the calculation of force",
                            scf_time = "the time to do SCF",
@@ -430,16 +426,29 @@ class Abacus(ResultAbacus):
             self['scf_steps'] = len(scftime)
             self['scf_time_each_step'] = scftime
 
-    @ResultAbacus.register(atom_mag="list, the magnization of each atom")
+    @ResultAbacus.register(sources=["TIMETABLE","TIME","OUTPUT"],
+                           time_profile="dict, the time of each function, {\"class_name/function_name\": [cpu_second, calls]}, and \"total\": [total time, 1]. Read from time.json, or the timing table in output")
+    def GetTimeProfile(self):
+        if len(self.TIMETABLE) == 0:
+            self['time_profile'] = None
+            return
+        time_profile = {}
+        for (class_name,func_name),value in self.TIMETABLE.items():
+            if class_name == "total" and func_name == None:
+                time_profile["total"] = list(value)
+            elif func_name != None:
+                time_profile["%s/%s" % (class_name,func_name)] = list(value)
+        self['time_profile'] = time_profile
+
+    @ResultAbacus.register(sources=["MULLIKEN"],
+                           atom_mag="list, the magnization of each atom")
     def GetAtomMag(self):
-        mullikenf = os.path.join(os.path.split(self.LOGf)[0],"mulliken.txt")
-        if not os.path.isfile(mullikenf):
+        if len(self.MULLIKEN) == 0:
             self['atom_mag'] = None
             return
         
         atom_mag = []
-        with open(mullikenf) as f1: lines = f1.readlines()
-        for line in lines:
+        for line in self.MULLIKEN:
             if line[:5] == "STEP:":
                 atom_mag.append([])
             elif "Total Magnetism on atom" in line:
@@ -453,13 +462,11 @@ class Abacus(ResultAbacus):
                     
         self['atom_mag'] = None if len(atom_mag) == 0 else atom_mag
     
-    @ResultAbacus.register(drho="[], drho of each scf step",
+    @ResultAbacus.register(sources=["LOGINDEX"],
+                           drho="[], drho of each scf step",
                            drho_last="drho of the last scf step")
     def GetDrho(self):
-        drho = []
-        for line in self.LOG:
-            if "Density error is" in line:
-                drho.append(float(line.split()[-1]))
+        drho = [float(self.LOG[i].split()[-1]) for i in self.LOGINDEX.Find("Density error is")]
         
         if len(drho) == 0:
             self['drho'] = None
@@ -468,50 +475,44 @@ class Abacus(ResultAbacus):
             self["drho_last"] = drho[-1]
     
     
-    @ResultAbacus.register(lattice_constant="unit in angstrom",
+    @ResultAbacus.register(depends=["natom"],sources=["LOGINDEX","LOGTAIL"],
+                           lattice_constant="unit in angstrom",
                            cell = "[[],[],[]], two-dimension list, unit in Angstrom. If is relax or md, will output the last one",
                            coordinate = "[[],..], two dimension list, is a cartesian type, unit in Angstrom. If is relax or md, will output the last one",
                            element_list = "list[], a list of the element name of all atoms",
                            atomlabel_list = "list[], a list of atom label of all atoms")
     def GetCell(self):    
-        for line in self.LOG:
-            if "lattice constant (Angstrom)" in line:
-                self["lattice_constant"] = float(line.split()[-1])
-                break
+        iline = self.LOGINDEX.First("lattice constant (Angstrom)")
+        if iline != None:
+            self["lattice_constant"] = float(self.LOG[iline].split()[-1])
         
         cell = None
-        for i in range(len(self.LOG)): 
-            iline = -i - 1 
-            line = self.LOG[iline]
-            if "Lattice vectors: (Cartesian coordinate: in unit of a_0)" in line:
-                cell = []
-                for k in range(1, 4):
-                    cell.append([float(x) * self["lattice_constant"] for x in self.LOG[iline + k].split()[0:3]])
-                break
+        pos,_ = self.LOGTAIL.FindLast(["Lattice vectors: (Cartesian coordinate: in unit of a_0)"])
+        if pos != None:
+            cell = (comm.ReadBlock(self.LOGTAIL.Lines(pos,4),start=1,nrows=3,columns=range(3)) * self["lattice_constant"]).tolist()
         self['cell'] = cell
         
         coordinate = None
-        for i in range(len(self.LOG)): 
-            iline = -i - 1 
-            line = self.LOG[iline]
+        pos,_ = self.LOGTAIL.FindLast(["COORDINATES"])
+        while pos != None: 
+            line = self.LOGTAIL.Lines(pos,1)[0]
             if len(line.split()) >= 2 and line.split()[1] == "COORDINATES":  
-                coordinate = []
                 if line.split()[0] == "DIRECT":
-                    for k in range(2, 2 + self["natom"]):
-                        coordinate.append([float(x) for x in self.LOG[iline + k].split()[1:4]])
-                    import numpy as np
-                    coordinate = np.array(coordinate).dot(np.array(self["cell"])).tolist()
+                    coordinate = comm.ReadBlock(self.LOGTAIL.LinesFrom(pos),start=2,nrows=self["natom"],columns=range(1,4))
+                    coordinate = coordinate.dot(np.array(self["cell"])).tolist()
                 elif line.split()[0] == "CARTESIAN":
-                    for k in range(2, 2 + self["natom"]):
-                        coordinate.append([float(x) for x in self.LOG[iline + k].split()[1:4]])
+                    coordinate = comm.ReadBlock(self.LOGTAIL.LinesFrom(pos),start=2,nrows=self["natom"],columns=range(1,4)).tolist()
                 else:
+                    coordinate = []
                     print("Unrecongnized coordinate type: %s" % (line))   
                 break
+            pos,_ = self.LOGTAIL.FindLast(["COORDINATES"],pos)
         self['coordinate'] = coordinate   
               
         element_list = None
         atomlabel_list = None
-        for line in self.LOG:
+        for i in self.LOGINDEX.Lines(["atom label =","number of atom for this type ="]):
+            line = self.LOG[i]
             if "atom label =" in line:
                 label = line.split()[-1]
                 element = label
@@ -528,7 +529,8 @@ class Abacus(ResultAbacus):
         self['element_list'] = element_list
         self['atomlabel_list'] = atomlabel_list
             
-    @ResultAbacus.register(delta_energy="the difference between energy and the reference value. Unit in eV. Key in reference file is \"energy\"",
+    @ResultAbacus.register(depends=["energy","natom"],sources=["resultREF"],
+                           delta_energy="the difference between energy and the reference value. Unit in eV. Key in reference file is \"energy\"",
                            delta_energyPerAtom="delta_energy/natom, unit in eV")
     def GetDeltaEnergy(self): 
         if self.resultREF.get("energy",None) != None:
@@ -545,37 +547,41 @@ class Abacus(ResultAbacus):
 
 class AbacusRelax(ResultAbacus):
     
-    @ResultAbacus.register(relax_converge="if the relax is converged")
+    @ResultAbacus.register(sources=["LOGTAIL"],
+                           relax_converge="if the relax is converged")
     def GetRelaxConverge(self):
-        #need read self.LOG
-        if self.LOG:
-            for i in range(len(self.LOG)):
-                line = self.LOG[-i-1]
-                if "Relaxation is converged!" in line:
-                    self["relax_converge"] = True
-                    return
-                elif "Relaxation is not converged yet!" in line:
-                    self["relax_converge"] = False
-                    return
-                elif "Ion relaxation is not converged yet" in line or \
-                    "Lattice relaxation is not converged yet" in line:
-                    self["relax_converge"] = False
-                    return
-                elif "Lattice relaxation is converged!" in line or \
-                    "Ion relaxation is converged!" in line:
-                    self["relax_converge"] = True
-                    return
+        #only read the end of self.LOGf
+        markers = ["Relaxation is converged!","Relaxation is not converged yet!",
+                   "Ion relaxation is not converged yet","Lattice relaxation is not converged yet",
+                   "Lattice relaxation is converged!","Ion relaxation is converged!"]
+        pos,_ = self.LOGTAIL.FindLast(markers)
+        if pos != None:
+            line = self.LOGTAIL.Lines(pos,1)[0]
+            if "Relaxation is converged!" in line:
+                self["relax_converge"] = True
+                return
+            elif "Relaxation is not converged yet!" in line:
+                self["relax_converge"] = False
+                return
+            elif "Ion relaxation is not converged yet" in line or \
+                "Lattice relaxation is not converged yet" in line:
+                self["relax_converge"] = False
+                return
+            elif "Lattice relaxation is converged!" in line or \
+                "Ion relaxation is converged!" in line:
+                self["relax_converge"] = True
+                return
         self["relax_converge"] = None
     
-    @ResultAbacus.register(relax_steps= "the total ION steps")
+    @ResultAbacus.register(sources=["LOGTAIL"],
+                           relax_steps= "the total ION steps")
     def GetRelaxSteps(self):
-        #need read self.LOG
-        if self.LOG:
-            for i in range(len(self.LOG)):
-                line = self.LOG[-i-1]
-                if "ALGORITHM --------------- ION=" in line:
-                    index_ben = line.index("ION=") + 4
-                    index_end = line.index("ELEC")
-                    self["relax_steps"] = int(line[index_ben:index_end])
-                    return
+        #only read the end of self.LOGf
+        pos,_ = self.LOGTAIL.FindLast(["ALGORITHM --------------- ION="])
+        if pos != None:
+            line = self.LOGTAIL.Lines(pos,1)[0]
+            index_ben = line.index("ION=") + 4
+            index_end = line.index("ELEC")
+            self["relax_steps"] = int(line[index_ben:index_end])
+            return
         self["relax_steps"] = None
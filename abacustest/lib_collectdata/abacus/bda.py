@@ -3,7 +3,8 @@ from ..resultAbacus import ResultAbacus
 
 class BdaAbacus(ResultAbacus):
     
-    @ResultAbacus.register(bda_mag_moment="mag_moment of some metal element",
+    @ResultAbacus.register(depends=["cell","element_list","coordinate","atom_mag"],
+                           bda_mag_moment="mag_moment of some metal element",
                            bda_bond_length="bond_length of some metal element")
     def GetBDAinfo(self):
         from pymatgen.core.structure import Structure
@@ -0,0 +1,126 @@
+import os,sys,glob,re
+import numpy as np
+from ..resultAbacus import ResultAbacus
+from .. import comm
+from .abacus import FLOAT_PATTERN,FORCE_ROW_PATTERN,STRESS_ROW_PATTERN
+
+# the header of each ION step, for relax the header is printed at each ELEC step,
+# and a new ION step starts when the step number is changed.
+STEP_PATTERN = re.compile(r"(?:ALGORITHM --------------- ION=|STEP OF (?:ION RELAXATION|RELAXATION|MOLECULAR DYNAMICS)\s*:)\s*(\d+)")
+# the rows of coordinate ("taud_Si1  x  y  z  [mag vx vy vz]")
+COORD_ROW_PATTERN = re.compile(r'^\s*\S+' + r'\s+%s' % FLOAT_PATTERN * 3 + r'(\s+\S+)*\s*$')
+
+def ReadTrajectory(logfile,natom=None):
+    '''
+    Read the energy, force, stress, cell, coordinate and scf steps of each ION step
+    from running_xxx.log by one pass.
+    The cell and coordinate of one step are the latest ones printed before the final energy of this step.
+    If there is no ION step header (scf calculation), all results belong to one step.
+    The rows of each coordinate block are the lines that look like "label x y z" after the title line,
+    so they do not rely on the atom number counted before. If natom is given, a block with a different
+    number of rows is warned.
+    All blocks are converted by comm.ReadBlock, and the values are numpy arrays.
+    '''
+    lattice_constant = None
+    cell = None
+    coordinate = None   # the latest coordinate block, and if it is direct type
+    direct = False
+    steps = []
+    step_id = None
+
+    def cartesian(coord,direct,cell):
+        if coord is None or not direct:
+            return coord
+        return None if cell is None else coord.dot(cell)
+
+    def current_step():
+        if len(steps) == 0:
+            steps.append({"energy":None,"force":None,"stress":None,"scf_steps":0,"cell":None,"coordinate":None})
+        return steps[-1]
+
+    with open(logfile) as f1:
+        for line in f1:
+            if "ION=" in line or "STEP OF" in line:
+                match = STEP_PATTERN.search(line)
+                if match and match.group(1) != step_id:
+                    step_id = match.group(1)
+                    steps.append({"energy":None,"force":None,"stress":None,"scf_steps":0,"cell":None,"coordinate":None})
+            elif "Density error is" in line:
+                current_step()["scf_steps"] += 1
+            elif "!FINAL_ETOT_IS" in line:
+                step = current_step()
+                step["energy"] = float(line.split()[1])
+                step["cell"] = cell
+                step["coordinate"] = cartesian(coordinate,direct,cell)
+            elif "TOTAL-FORCE (eV/Angstrom)" in line:
+                current_step()["force"] = comm.ReadBlock(f1,pattern=FORCE_ROW_PATTERN,maxskip=9,columns=range(1,4))
+            elif "TOTAL-STRESS (KBAR)" in line:
+                current_step()["stress"] = comm.ReadBlock(f1,pattern=STRESS_ROW_PATTERN,maxskip=9,columns=range(3))
+            elif "Lattice vectors: (Cartesian coordinate: in unit of a_0)" in line and lattice_constant != None:
+                cell = comm.ReadBlock(f1,nrows=3,columns=range(3)) * lattice_constant
+            elif len(line.split()) >= 2 and line.split()[1] == "COORDINATES":
+                # skip the title line
+                coord = comm.ReadBlock(f1,start=1,pattern=COORD_ROW_PATTERN,columns=range(1,4))
+                if coord is not None and natom != None and len(coord) != natom:
+                    print("WARNING: %d atoms are read from %s, but natom is %d" % (len(coord),line.strip(),natom))
+                if line.split()[0] in ["DIRECT","CARTESIAN"]:
+                    # the direct coordinate is converted when the step ends, because the cell 
+                    # may be printed after the coordinate, such as in the header of log
+                    coordinate = coord
+                    direct = line.split()[0] == "DIRECT"
+                else:
+                    print("Unrecongnized coordinate type: %s" % (line))
+            elif "lattice constant (Angstrom)" in line and lattice_constant == None:
+                lattice_constant = float(line.split()[-1])
+
+    for step in steps:
+        # for the step that has no final energy, such as the job is killed during SCF
+        if step["energy"] == None:
+            step["cell"] = cell
+            step["coordinate"] = cartesian(coordinate,direct,cell)
+    return steps
+
+def StackSteps(steps,key,shape):
+    '''
+    Stack the values of key in all steps to a float64 array of shape (nstep,)+shape.
+    The steps that have no value are filled with NaN. Return None if no step has the value.
+    '''
+    if not any(step[key] is not None for step in steps):
+        return None
+    array = np.full((len(steps),) + shape,np.nan,dtype=np.float64)
+    for i,step in enumerate(steps):
+        if step[key] is not None:
+            array[i] = np.reshape(step[key],shape)
+    return array
+
+class AbacusTrajectory(ResultAbacus):
+
+    @ResultAbacus.register(depends=["natom"],sources=["LOGf"],
+                           traj_energy="numpy array of shape (nstep,), the total energy of each ION step (eV)",
+                           traj_force="numpy array of shape (nstep,natom,3), the force of each ION step (eV/Angstrom)",
+                           traj_stress="numpy array of shape (nstep,3,3), the stress of each ION step (kbar)",
+                           traj_cell="numpy array of shape (nstep,3,3), the cell of each ION step (Angstrom)",
+                           traj_coordinate="numpy array of shape (nstep,natom,3), the cartesian coordinate of each ION step (Angstrom)",
+                           traj_scf_steps="numpy array of shape (nstep,), the SCF steps of each ION step")
+    def GetTrajectory(self):
+        if not os.path.isfile(self.LOGf):
+            for key in ["traj_energy","traj_force","traj_stress","traj_cell","traj_coordinate","traj_scf_steps"]:
+                self[key] = None
+            return
+
+        # natom in the header is only used to check the coordinate blocks, the shape of the arrays
+        # is decided by the rows that are read
+        steps = ReadTrajectory(self.LOGf,self["natom"])
+        natom = 0
+        for step in steps:
+            if step["force"] is not None:
+                natom = len(step["force"])
+            elif step["coordinate"] is not None:
+                natom = len(step["coordinate"])
+
+        self["traj_energy"] = StackSteps(steps,"energy",())
+        self["traj_force"] = StackSteps(steps,"force",(natom,3))
+        self["traj_stress"] = StackSteps(steps,"stress",(3,3))
+        self["traj_cell"] = StackSteps(steps,"cell",(3,3))
+        self["traj_coordinate"] = StackSteps(steps,"coordinate",(natom,3))
+        self["traj_scf_steps"] = np.array([step["scf_steps"] for step in steps],dtype=np.int64) if len(steps) > 0 else None
@@ -0,0 +1,150 @@
+import os,json,hashlib,inspect
+import numpy as np
+
+CACHE_FILE = ".abacustest_cache.json"
+# increase it to invalidate all the caches, such as when the common parsers in comm.py are changed
+CACHE_VERSION = 2
+
+def FileFingerprint(ifile):
+    'return [size, mtime_ns, inode] of ifile, or None if ifile does not exist'
+    try:
+        st = os.stat(ifile)
+    except OSError:
+        return None
+    return [st.st_size,st.st_mtime_ns,st.st_ino]
+
+_METHOD_HASH = {}
+def MethodHash(method):
+    'return the md5 of the source code of method, which will be changed when the method is modified'
+    if method not in _METHOD_HASH:
+        try:
+            code = inspect.getsource(method).encode()
+        except:
+            code = method.__code__.co_code
+        _METHOD_HASH[method] = hashlib.md5(code).hexdigest()
+    return _METHOD_HASH[method]
+
+def MethodName(method):
+    return "%s.%s" % (method.__module__,method.__qualname__)
+
+def Encode(value):
+    'convert value to the json type, the numpy array is stored with its dtype'
+    if isinstance(value,np.ndarray):
+        return {"__ndarray__":value.tolist(),"dtype":str(value.dtype)}
+    elif isinstance(value,np.generic):
+        return value.item()
+    elif isinstance(value,(list,tuple)):
+        return [Encode(i) for i in value]
+    elif isinstance(value,dict):
+        if not all(isinstance(k,str) for k in value):
+            raise TypeError("the key of dict should be str")
+        return {k:Encode(v) for k,v in value.items()}
+    elif value is None or isinstance(value,(bool,int,float,str)):
+        return value
+    raise TypeError("Object of type %s can not be cached" % type(value).__name__)
+
+def Decode(value):
+    if isinstance(value,list):
+        return [Decode(i) for i in value]
+    elif isinstance(value,dict):
+        if "__ndarray__" in value:
+            return np.array(value["__ndarray__"],dtype=value["dtype"])
+        return {k:Decode(v) for k,v in value.items()}
+    return value
+
+class ParseCache:
+    '''
+    The cache of the key values of one job, which is stored in the job path as .abacustest_cache.json:
+        {"version": CACHE_VERSION,
+         "keys": {key: {"value": value, "methods": {method name: md5 of the method code}, "sources": [source names],
+                        "files": {file path relative to the job: [size, mtime_ns, inode]}}}}
+    The methods are all the methods used to catch the key (see Result.AllMethodUsed), such as the method
+    of natom for energy_per_atom. A cached value is valid if none of these methods is modified and all files 
+    read by them are not changed.
+    Only the keys whose sources are all files (see Result.SourceFiles) are cached, and a key is not cached
+    if any of its methods does not declare its sources by register(sources=...), since it may read the files by itself.
+    '''
+    def __init__(self,path):
+        self.path = path
+        self.cache_file = os.path.join(path,CACHE_FILE)
+        self.entries = {}
+        self.changed = False
+        if os.path.isfile(self.cache_file):
+            try:
+                with open(self.cache_file) as f1: cache = json.load(f1)
+                if cache.get("version") == CACHE_VERSION:
+                    self.entries = cache.get("keys",{})
+            except:
+                print("WARNING: can not read the cache file %s, ignore it" % self.cache_file)
+
+    def Valid(self,key,result,registered):
+        'registered is a dict of the name and the registered method of result'
+        entry = self.entries.get(key)
+        if entry == None or "methods" not in entry:
+            return False
+        # the methods declared by depends now may be not used when the entry is saved
+        if any(MethodName(i) not in entry["methods"] for i in result.Plan([key])[0]):
+            return False
+        for name,md5 in entry["methods"].items():
+            if name not in registered or MethodHash(registered[name]) != md5:
+                return False
+        for ifile,fingerprint in entry["files"].items():
+            if FileFingerprint(os.path.join(self.path,ifile)) != fingerprint:
+                return False
+        return True
+
+    def Restore(self,result,keys):
+        '''
+        Set the valid cached values of keys to result, and return the list of restored keys.
+        '''
+        restored = []
+        registered = {MethodName(i[0]):i[0] for i in result._PARAM_DIC.values()}
+        for key in keys:
+            if key in result._PARAM_VALUE or key not in result._PARAM_DIC:
+                continue
+            method = result._PARAM_DIC[key][0]
+            if self.Valid(key,result,registered):
+                result._PARAM_VALUE[key] = Decode(self.entries[key]["value"])
+                # the methods using this key will also depend on its sources and methods
+                result._SOURCE_USED.setdefault(method,set()).update(self.entries[key]["sources"])
+                result._METHOD_USED.setdefault(method,set()).update(registered[i] for i in self.entries[key]["methods"] if registered[i] is not method)
+                restored.append(key)
+        return restored
+
+    def Update(self,result):
+        'record the values of all catched keys in result'
+        for key,sources in result.AllSourceUsed().items():
+            # the key that does not read any source may read the files by itself, so is not cached
+            if len(sources) == 0:
+                continue
+            files = result.SourceFiles(sources)
+            if files == None:
+                continue
+            methods = result.AllMethodUsed(key)
+            if any(len(result._DEPENDS.get(i,([],[]))[1]) == 0 for i in methods):
+                continue
+            try:
+                entry = {"value":Encode(result[key]),
+                         "methods":{MethodName(i):MethodHash(i) for i in methods},
+                         "sources":sources,
+                         "files":{os.path.relpath(os.path.abspath(i),os.path.abspath(self.path)):FileFingerprint(i) for i in files}}
+            except TypeError:
+                continue
+            # compare the json strings, since nan != nan
+            if json.dumps(self.entries.get(key),sort_keys=True) != json.dumps(entry,sort_keys=True):
+                self.entries[key] = entry
+                self.changed = True
+
+    def Save(self):
+        if not self.changed:
+            return
+        # write to a temporary file and then rename, so that a reader will never see a broken file
+        tmp_file = self.cache_file + ".%d" % os.getpid()
+        try:
+            with open(tmp_file,"w") as f1: json.dump({"version":CACHE_VERSION,"keys":self.entries},f1)
+            os.replace(tmp_file,self.cache_file)
+            self.changed = False
+        except:
+            # the job path may be read-only
+            if os.path.isfile(tmp_file):
+                os.remove(tmp_file)
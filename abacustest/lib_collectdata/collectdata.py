@@ -18,7 +18,8 @@ def import_new_method(newmethods=[]):
     '''import the self-defined methods'''
     if newmethods == None:
         return
-    sys.path.append(os.getcwd())
+    if os.getcwd() not in sys.path:
+        sys.path.append(os.getcwd())
     for imethod in newmethods:
         try:
             importlib.import_module(imethod)
@@ -42,40 +43,30 @@ def import_modules(fmt,modules):
             traceback.print_exc()
             print("Import module %s failed, skip it!" % module)
 
-def RESULT(fmt="abacus",outparam=False,newmethods=[],modules=[],**kwargs):
-
+def ResultClass(fmt="abacus",newmethods=[],modules=[]):
+    '''
+    Import the modules and self-defined methods, and return the Result class of fmt.
+    It can be called once and then used to create the Result of many jobs.
+    '''
     if fmt == "abacus":
-        from .resultAbacus import ResultAbacus
+        from .resultAbacus import ResultAbacus as result_class
         from .abacus import abacus
-        import_modules(fmt,modules)
-        import_new_method(newmethods)
-            
-        if outparam:
-            printAllMethod(ResultAbacus.AllMethod(),fmt)
-        else:
-            return ResultAbacus(**kwargs)
-
     elif fmt == "qe":
-        from .resultQe import ResultQe
+        from .resultQe import ResultQe as result_class
         from .qe import qe
-        import_modules(fmt,modules)
-        import_new_method(newmethods)
-
-        if outparam:
-            printAllMethod(ResultQe.AllMethod(),fmt)
-        else:
-            return ResultQe(**kwargs)
-
     elif fmt == 'vasp':
-        from .resultVasp import ResultVasp
+        from .resultVasp import ResultVasp as result_class
         from .vasp import vasp
-        import_modules(fmt,modules)
-        import_new_method(newmethods)
-
-        if outparam:
-            printAllMethod(ResultVasp.AllMethod(),fmt)
-        else:
-            return ResultVasp(**kwargs)
     else:
         print("ERROR: unkonw format %s" % fmt)
         sys.exit(1)
+    import_modules(fmt,modules)
+    import_new_method(newmethods)
+    return result_class
+
+def RESULT(fmt="abacus",outparam=False,newmethods=[],modules=[],**kwargs):
+    result_class = ResultClass(fmt,newmethods,modules)
+    if outparam:
+        printAllMethod(result_class.AllMethod(),fmt)
+    else:
+        return result_class(**kwargs)
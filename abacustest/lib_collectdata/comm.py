@@ -1,4 +1,4 @@
-import os,sys,traceback
+import os,sys,traceback,re,json,mmap,itertools
 import xml.etree.ElementTree as ET
 from xml.etree.ElementTree import Element
 
@@ -22,25 +22,223 @@ def ReadFile(ifile,warn=True):
 
     return context
 
-def FindOutput(path,keyinfo):
-    'find the file that has keyinfo'
-    cwd = os.getcwd()
-    os.chdir(path)
-    allfiles = os.listdir(".")
-    for ifile in allfiles:
-        if os.path.isfile(ifile):
-            find = False
-            try:
-                with open(ifile) as f1: lines = f1.read()
-                if keyinfo in lines:
-                    find = True
-            except:
-                pass
-                
-            if find:
-                os.chdir(cwd)
-                return os.path.join(path,ifile)
-    os.chdir(cwd)
+class LineIndex:
+    '''
+    Record the line numbers of some markers in a list of lines.
+    All markers are searched in one pass, and the line numbers are stored in a dict,
+    whose key is the marker and value is a list of the line numbers (in ascending order).
+    A marker that was not given at construction will be searched when it is first queried.
+    '''
+    def __init__(self,lines,markers=[]):
+        self.lines = lines
+        self.index = {}
+        self.Scan(markers)
+
+    def Scan(self,markers):
+        markers = [i for i in set(markers) if i not in self.index]
+        if len(markers) == 0:
+            return
+        for imarker in markers:
+            self.index[imarker] = []
+        # use one regex to filter out the lines that have no marker
+        pattern = re.compile("|".join([re.escape(i) for i in markers]))
+        for i,line in enumerate(self.lines):
+            if pattern.search(line):
+                for imarker in markers:
+                    if imarker in line:
+                        self.index[imarker].append(i)
+
+    def Find(self,marker):
+        'return a list of the line numbers that have marker'
+        if marker not in self.index:
+            self.Scan([marker])
+        return self.index[marker]
+
+    def First(self,marker):
+        'return the line number of the first line that has marker, None if not found'
+        idx = self.Find(marker)
+        return idx[0] if len(idx) > 0 else None
+
+    def Last(self,marker):
+        'return the line number of the last line that has marker, None if not found'
+        idx = self.Find(marker)
+        return idx[-1] if len(idx) > 0 else None
+
+    def Lines(self,markers,reverse=False):
+        'return the sorted line numbers of lines that have any marker in markers'
+        idx = set()
+        for imarker in markers:
+            idx.update(self.Find(imarker))
+        return sorted(idx,reverse=reverse)
+
+class TailReader:
+    '''
+    Read a text file from the end by chunks, the file is memory-mapped and only the chunks that are
+    searched will be read from disk. It is used to get the last block of a large file, such as the 
+    force/stress of the last ION step, without loading the whole file.
+    '''
+    def __init__(self,ifile,chunk_size=1048576):
+        self.ifile = ifile
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.mm = None
+        if ifile != None and os.path.isfile(ifile):
+            self.size = os.path.getsize(ifile)
+            if self.size > 0:
+                with open(ifile,"rb") as f1:
+                    self.mm = mmap.mmap(f1.fileno(),0,access=mmap.ACCESS_READ)
+
+    def FindLast(self,markers,end=None):
+        '''
+        Search the markers backward from end (default is the end of file).
+        Return (offset of the line start, marker) of the last line that has any marker, 
+        or (None,None) if no marker is found.
+        '''
+        if self.mm == None or len(markers) == 0:
+            return (None,None)
+        bmarkers = [(i,i.encode()) for i in markers]
+        end = self.size if end == None else end
+        while end > 0:
+            start = max(0,end - self.chunk_size)
+            hit,hit_marker = -1,None
+            for marker,bmarker in bmarkers:
+                # only find the marker that starts before end
+                idx = self.mm.rfind(bmarker,start,min(end + len(bmarker) - 1,self.size))
+                if idx > hit:
+                    hit,hit_marker = idx,marker
+            if hit >= 0:
+                # a marker may start with the newline, the line start is after it
+                hit += len(hit_marker) - len(hit_marker.lstrip("\n"))
+                return (self.mm.rfind(b"\n",0,hit) + 1,hit_marker)
+            end = start
+        return (None,None)
+
+    def LinesFrom(self,offset):
+        'a generator of the lines from offset to the end of file'
+        if self.mm == None:
+            return
+        while offset < self.size:
+            idx = self.mm.find(b"\n",offset)
+            nextline = self.size if idx == -1 else idx + 1
+            yield self.mm[offset:nextline].decode(errors="replace")
+            offset = nextline
+
+    def Lines(self,offset,nlines):
+        'return a list of nlines lines from offset'
+        return list(itertools.islice(self.LinesFrom(offset),nlines))
+
+    def LastLines(self,nlines):
+        'return a list of the last nlines lines'
+        if self.mm == None:
+            return []
+        # the newline at the end of file does not start a new line
+        pos = self.size - 1 if self.mm[-1:] == b"\n" else self.size
+        for i in range(nlines):
+            pos = self.mm.rfind(b"\n",0,pos)
+            if pos == -1:
+                break
+        return list(self.LinesFrom(pos + 1))
+
+def ReadBlock(lines,start=0,nrows=None,columns=None,pattern=None,stop=None,maxskip=0,dtype=float):
+    '''
+    Convert a block of numbers in lines to a 2D numpy array by one call, instead of converting each token by float().
+    lines: a list of lines, or an iterator of lines (such as TailReader.LinesFrom)
+    start: the index of the first line of the block (or the line to begin the search, if pattern is used)
+    nrows: the number of rows. If it is None, the rows are decided by pattern or stop:
+           pattern: a compiled regex, the rows are the consecutive lines that match it,
+                    and the first row is searched in the maxskip lines after start
+           stop: a str, the rows end before the line starting with stop
+           if none of them is given, all the lines after start are read
+    columns: the index of columns (split by whitespace) to be read, such as range(1,4). None means all columns.
+    Return None if no row is found.
+    '''
+    import numpy as np
+    lines = itertools.islice(lines,start,None)
+    if nrows != None:
+        rows = list(itertools.islice(lines,nrows))
+    else:
+        rows = []
+        for j,line in enumerate(lines):
+            if stop != None:
+                if line.startswith(stop):
+                    break
+                rows.append(line)
+            elif pattern == None or pattern.match(line):
+                rows.append(line)
+            elif len(rows) > 0 or j >= maxskip:
+                break
+    if len(rows) == 0:
+        return None
+    return np.loadtxt(rows,usecols=None if columns == None else tuple(columns),dtype=dtype,ndmin=2)
+
+OUTPUT_MANIFEST = ".abacustest_output.json"
+
+def SniffFile(ifile,keyinfo,sniff_size=65536):
+    'check if keyinfo is in the first sniff_size bytes of ifile'
+    try:
+        with open(ifile,"rb") as f1: head = f1.read(sniff_size)
+    except:
+        return False
+    return keyinfo.encode() in head
+
+def OutputCandidates(path):
+    '''
+    return the regular files in path, and sort them by the possibility to be the screen output.
+    The files with the name like log/out/output/*.log/*.out are firstly checked, and then the smaller files.
+    '''
+    def rank(entry):
+        name = entry.name.lower()
+        if name in ["log","out","output","stdout"] or name.endswith((".log",".out",".output",".txt")):
+            priority = 0
+        else:
+            priority = 1
+        return (priority,entry.stat().st_size)
+
+    try:
+        # skip the manifest and cache files of abacustest
+        entries = [i for i in os.scandir(path) if i.is_file() and not i.name.startswith(".abacustest_")]
+    except OSError:
+        return []
+    return [i.name for i in sorted(entries,key=rank)]
+
+def ReadOutputManifest(path):
+    manifest_file = os.path.join(path,OUTPUT_MANIFEST)
+    if os.path.isfile(manifest_file):
+        try:
+            with open(manifest_file) as f1: return json.load(f1)
+        except:
+            pass
+    return {}
+
+def WriteOutputManifest(path,manifest):
+    # write to a temporary file and then rename, so that a reader will never see a broken file
+    manifest_file = os.path.join(path,OUTPUT_MANIFEST)
+    tmp_file = manifest_file + ".%d" % os.getpid()
+    try:
+        with open(tmp_file,"w") as f1: json.dump(manifest,f1,indent=4)
+        os.replace(tmp_file,manifest_file)
+    except:
+        # path may be read-only, the manifest is only a cache
+        if os.path.isfile(tmp_file):
+            os.remove(tmp_file)
+
+def FindOutput(path,keyinfo,sniff_size=65536,manifest=True):
+    '''
+    find the file that has keyinfo in its first sniff_size bytes.
+    If manifest is True, the found file is recorded in path/.abacustest_output.json, 
+    and will be directly used in the next search.
+    '''
+    records = ReadOutputManifest(path) if manifest else {}
+    ifile = records.get(keyinfo)
+    if ifile and SniffFile(os.path.join(path,ifile),keyinfo,sniff_size):
+        return os.path.join(path,ifile)
+
+    for ifile in OutputCandidates(path):
+        if SniffFile(os.path.join(path,ifile),keyinfo,sniff_size):
+            if manifest:
+                records[keyinfo] = ifile
+                WriteOutputManifest(path,records)
+            return os.path.join(path,ifile)
     return None
 
 def ReadXmlFile(ifile,warn=True):
@@ -59,6 +257,70 @@ def ReadXmlFile(ifile,warn=True):
         if warn: print("WARNING: can not find file %s" % ifile)
         return None
 
+def ReadXmlSubtrees(ifile,paths,counter=None,warn=True):
+    '''
+    Read the xml file by iterparse, and only keep the elements in paths (with all of their sub-elements),
+    all other elements are removed as soon as they are parsed, so the memory is bounded by the kept parts.
+    paths: a dict, key is the tag path relative to root, such as "kpoints", "calculation/eigenvalues",
+           and value is a bool, if True only the last element of this path is kept.
+    counter: a dict, key is the tag path and value is an int. The number of elements of each path
+           is added to the value. The counted elements are not kept if they are not in paths.
+    Return the root of the reduced tree, which can be searched by find/findall as the full tree.
+    '''
+    if ifile == None:
+        return None
+    if not os.path.isfile(ifile):
+        if warn: print("WARNING: can not find file %s" % ifile)
+        return None
+
+    ancestors = set()
+    for path in paths:
+        tags = path.split("/")
+        for i in range(1,len(tags)):
+            ancestors.add("/".join(tags[:i]))
+
+    root = None
+    stack = []      # the list of (element, path, if is in a kept element)
+    lastkept = {}   # path: the stack of the last kept element
+    try:
+        for event,elem in ET.iterparse(ifile,events=("start","end")):
+            if event == "start":
+                if root == None:
+                    root = elem
+                    stack.append((elem,"",False))
+                else:
+                    parent,ppath,pinside = stack[-1]
+                    path = elem.tag if ppath == "" else ppath + "/" + elem.tag
+                    stack.append((elem,path,pinside or ppath in paths))
+                continue
+
+            elem,path,inside = stack.pop()
+            if inside or elem is root:
+                continue
+            if counter != None and path in counter:
+                counter[path] += 1
+            if path in paths:
+                if paths[path]:
+                    # remove the former one, and also its ancestors that become empty
+                    if path in lastkept:
+                        chain = lastkept[path]
+                        for i in range(len(chain)-1,0,-1):
+                            if len(chain[i]) == 0 or i == len(chain) - 1:
+                                chain[i-1].remove(chain[i])
+                            else:
+                                break
+                    lastkept[path] = [i[0] for i in stack] + [elem]
+            elif path in ancestors and len(elem) > 0:
+                continue
+            else:
+                stack[-1][0].remove(elem)
+                elem.clear()
+    except:
+        traceback.print_exc()
+        if warn: print("WARNING: can not parse file %s" % ifile)
+        return None
+    return root
+
 def XmlFindMultiLayer(root,layerlist):
     tmp = root
     for i in layerlist:
@@ -94,6 +356,18 @@ def XmlGetText(tmp1,func=lambda x:x,idx: int=None):
               (type(tmp1),funcname))
         return None
 
+def JsonDefault(obj):
+    '''
+    Used as the default function of json.dump, to write the numpy array and numpy number.
+    Such as: json.dump(allresult,open("result.json","w"),default=comm.JsonDefault)
+    '''
+    import numpy as np
+    if isinstance(obj,np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj,np.generic):
+        return obj.item()
+    raise TypeError("Object of type %s is not JSON serializable" % type(obj).__name__)
+
 def istr(x,n=None):
     if type(x) == float and n != None:
             return "%%.%df" % n % x
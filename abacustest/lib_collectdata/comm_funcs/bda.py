@@ -3,8 +3,10 @@ from pymatgen.io.vasp.inputs import Incar, Poscar
 from pymatgen.io.vasp.outputs import Oszicar, Outcar, Vasprun
 from pymatgen.core.periodic_table import Element
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Literal, Union
+from .neighbor import neighbor_list
 
 class BasicProperty(ABC):
     def __init__(self, magnetization: tuple = None, 
@@ -59,28 +61,23 @@ class BasicProperty(ABC):
         """
         pass
 
-    def __cut(self, sortedList: List[float], num: float) -> List[List[float]]:
-        r"""Cut a sorted list into List[List] by the distance of its elements
-            e.g. [1,1,1,3,3,7] -> [[1,1,1], [3,3], [7]] if num <= 1
-            e.g. [1,1,1,3,3,7] -> [[1,1,1,3,3],[7]] if 2 < num <= 4
+    def __cluster_mean(self, values, num: float) -> np.ndarray:
+        r"""Sort the values, cut them into clusters by the distance of neighboring values, and return the mean of each cluster
+            e.g. [1,1,1,3,3,7] -> [[1,1,1], [3,3], [7]] -> [1,3,7] if num <= 1
+            e.g. [1,1,1,3,3,7] -> [[1,1,1,3,3],[7]] -> [1.8,7] if 2 < num <= 4
 
         Parameters
         ----------
-        - sortedList : (`List`) A sorted list
-        - num : (`List`) A float decide how the sorted list devided
+        - values : (`array_like`) A list of float
+        - num : (`float`) A float decide how the sorted list devided
 
         Returns
         -------
-        - argument : (`List[List[float]]`)
+        - argument : (`numpy.ndarray`) the mean of each cluster, in ascending order
         """
-        ptr = 0
-        list = []
-        for i in range(0, len(sortedList) - 1):
-            if (sortedList[i+1] - sortedList[i]) > num:
-                list.append(sortedList[ptr:i+1])
-                ptr = i + 1
-        list.append(sortedList[ptr::])
-        return list
+        values = np.sort(np.asarray(values, dtype=float))
+        starts = np.concatenate(([0], np.nonzero(np.diff(values) > num)[0] + 1))
+        return np.add.reduceat(values, starts) / np.diff(np.append(starts, len(values)))
     
     def __get_num_index(self) -> dict:
         r"""Get the number of atoms, index in structure file of all elements in structure
@@ -117,22 +114,26 @@ class BasicProperty(ABC):
         """
         structure = self.structure.structure
         num_index = self.__get_num_index()
-        TM_bonds = []
+        TM_index = []
         for ele in num_index.keys():
             if self.__is_transition(ele):
                 start_index = num_index[ele]["start_index"]
-                number = num_index[ele]["number"]
-                TM_sites = structure.sites[start_index:start_index + number]
-                neighbor = structure.get_all_neighbors(r=2.5, sites=TM_sites)
-                for ii in range(len(TM_sites)):
-                    temp_dict = {"Total_index": start_index + ii + 1, "Atomic_index": ii + 1, "Element": ele}
-                    total_length = 0
-                    for jj in range(len(neighbor[ii])):
-                        length = TM_sites[ii].distance(neighbor[ii][jj])
-                        temp_dict["bond_length_{}".format(jj + 1)] = length
-                        total_length += length
-                    temp_dict["bond_length_ave"] = total_length/(len(neighbor[ii]))
-                    TM_bonds.append(temp_dict)
+                TM_index += [(start_index + ii, ii, ele) for ii in range(num_index[ele]["number"])]
+        if len(TM_index) == 0:
+            return []
+
+        # the bond lengths of all TM atoms are calculated at once, and are sorted by length for each atom
+        center, _, _, distance = neighbor_list(structure.lattice.matrix, structure.cart_coords, r=2.5,
+                                               centers=[i[0] for i in TM_index])
+        bounds = np.searchsorted(center, [i[0] for i in TM_index] + [len(structure)])
+        TM_bonds = []
+        for ii, (total_index, atomic_index, ele) in enumerate(TM_index):
+            lengths = distance[bounds[ii]:bounds[ii + 1]].tolist()
+            temp_dict = {"Total_index": total_index + 1, "Atomic_index": atomic_index + 1, "Element": ele}
+            for jj, length in enumerate(lengths):
+                temp_dict["bond_length_{}".format(jj + 1)] = length
+            temp_dict["bond_length_ave"] = sum(lengths)/(len(lengths))
+            TM_bonds.append(temp_dict)
         #return pd.DataFrame.from_dict(TM_bonds)
         return TM_bonds
           
@@ -181,7 +182,6 @@ class BasicProperty(ABC):
             return list(mag)
 
     def inter_layer_distance(self) -> dict:
-        from statistics import mean
         r"""Calculated inter-layer distance of layered structure like LiCoO2
         Parameters
         ----------
@@ -195,24 +195,20 @@ class BasicProperty(ABC):
         start_index = num_index['O'].get("start_index")
         number = num_index['O'].get("number")
         oxy_coord = cart_coord[start_index:start_index+number]
-        oxy_coord = sorted(oxy_coord[:,-1])
-        cluster_oxy_coord = self.__cut(oxy_coord, 1)
-        height_position = []
-        for ii in cluster_oxy_coord:
-            height_position.append(mean(ii))
-        distance = []
-        for i in range(1, len(height_position)):
-            distance.append(height_position[i] - height_position[i - 1])
-        return {"d_TM": min(distance[0], distance[1]), "d_alkali": max(distance[0], distance[1])}
+        height_position = self.__cluster_mean(oxy_coord[:,-1], 1)
+        distance = np.diff(height_position)
+        return {"d_TM": float(min(distance[0], distance[1])), "d_alkali": float(max(distance[0], distance[1]))}
 
 class BasicPropertyVasp(BasicProperty):
     def __init__(self, out_file, struc_file):  
         from pymatgen.io.vasp.outputs import Outcar
         from pymatgen.io.vasp.inputs import Poscar
-        self.energy = Outcar(out_file).final_energy
-        self.volume = Poscar.from_file(struc_file).structure.volume
-        self._magnetization = Outcar(out_file).magnetization
+        # each file is parsed only once
+        outcar = Outcar(out_file)
         self.structure = Poscar.from_file(struc_file)
+        self.energy = outcar.final_energy
+        self.volume = self.structure.structure.volume
+        self._magnetization = outcar.magnetization
     
 if __name__ == "__main__":
     output = BasicPropertyVasp('OUTCAR', 'CONTCAR')
@@ -0,0 +1,82 @@
+import itertools
+import numpy as np
+
+def neighbor_list(
+        lattice,
+        coords,
+        r: float,
+        centers=None,
+        cartesian: bool = True,
+        tol: float = 1e-8
+    ):
+    r"""Find all the neighbors within r of the center atoms in a periodic structure by a cell list
+
+    The atoms and their periodic images near the cell are put into cubic bins of size r,
+    so only the atoms in the 27 bins around a center atom are checked, and all the distances
+    are calculated by numpy at once. The center atom itself (without shift) is not a neighbor.
+
+    Parameters
+    ----------
+    - lattice : (`array_like`) 3x3 lattice vectors, each row is a vector
+    - coords : (`array_like`) Nx3 coordinates of all atoms
+    - r : (`float`) the cutoff radius, in the unit of lattice
+    - centers : (`array_like`) the indexes of the center atoms, default is all atoms
+    - cartesian : (`bool`) if coords are cartesian coordinates, else are fractional coordinates
+    - tol : (`float`) the pairs with distance smaller than tol are skipped
+
+    Returns
+    -------
+    - (center, neighbor, image, distance) : (`tuple of numpy.ndarray`) each pair is (the index of center atom,
+            the index of neighbor atom, the lattice shift (3 int) of neighbor atom, the distance),
+            and the pairs are sorted by the center atom (in the order of centers) and then by the distance
+    """
+    lattice = np.asarray(lattice, dtype=float).reshape(3, 3)
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    centers = np.arange(len(coords)) if centers is None else np.asarray(centers, dtype=int).reshape(-1)
+    frac = np.linalg.solve(lattice.T, coords.T).T if cartesian else coords
+
+    # the atoms in the cell expanded by r in each direction (wrapped atoms and their images)
+    spacing = 1.0 / np.linalg.norm(np.linalg.inv(lattice).T, axis=1)  # the distance between lattice planes
+    pad = r / spacing
+    wrap = np.floor(frac)
+    nimage = np.ceil(pad).astype(int)
+    shifts = np.array(list(itertools.product(*[range(-n, n + 1) for n in nimage])), dtype=float)
+    image_frac = (frac - wrap)[None, :, :] + shifts[:, None, :]
+    inside = np.all((image_frac >= -pad - tol) & (image_frac < 1 + pad + tol), axis=2)
+    ishift, iatom = np.nonzero(inside)
+    ghost_cart = image_frac[ishift, iatom] @ lattice
+    ghost_image = (shifts[ishift] - wrap[iatom]).astype(int)
+
+    # put the ghost atoms into bins of size r
+    origin = ghost_cart.min(axis=0)
+    nbin = np.floor((ghost_cart.max(axis=0) - origin) / r).astype(int) + 1
+    ghost_bin = np.minimum(np.floor((ghost_cart - origin) / r).astype(int), nbin - 1)
+    ghost_key = np.ravel_multi_index(ghost_bin.T, nbin)
+    order = np.argsort(ghost_key, kind="stable")
+    counts = np.bincount(ghost_key, minlength=np.prod(nbin))
+    starts = np.cumsum(counts) - counts
+
+    # the centers are also wrapped into the cell, and the image is shifted back at the end
+    center_cart = ((frac - wrap) @ lattice)[centers]
+    center_bin = np.minimum(np.floor((center_cart - origin) / r).astype(int), nbin - 1)
+    pairs = []
+    for offset in itertools.product((-1, 0, 1), repeat=3):
+        nb = center_bin + np.array(offset)
+        valid = np.all((nb >= 0) & (nb < nbin), axis=1)
+        icenter = np.nonzero(valid)[0]
+        key = np.ravel_multi_index(nb[valid].T, nbin)
+        ncand = counts[key]
+        # the index of all candidate ghost atoms of each center
+        rep_center = np.repeat(icenter, ncand)
+        local = np.arange(ncand.sum()) - np.repeat(np.cumsum(ncand) - ncand, ncand)
+        ighost = order[np.repeat(starts[key], ncand) + local]
+        dist = np.linalg.norm(ghost_cart[ighost] - center_cart[rep_center], axis=1)
+        keep = (dist <= r) & (dist > tol)
+        pairs.append((rep_center[keep], ighost[keep], dist[keep]))
+
+    rep_center = np.concatenate([i[0] for i in pairs])
+    ighost = np.concatenate([i[1] for i in pairs])
+    dist = np.concatenate([i[2] for i in pairs])
+    sort = np.lexsort((dist, rep_center))
+    rep_center, ighost, dist = rep_center[sort], ighost[sort], dist[sort]
+    return centers[rep_center], iatom[ighost], ghost_image[ighost] + wrap[centers[rep_center]].astype(int), dist
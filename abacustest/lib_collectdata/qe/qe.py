@@ -1,20 +1,27 @@
 import os,sys,glob,re
 from ..resultQe import ResultQe
 from .. import comm
+import numpy as np
 import xml.etree.ElementTree as ET
 from xml.etree.ElementTree import Element
 
 xfmlt = comm.XmlFindMultiLayerText
 xfml = comm.XmlFindMultiLayer
 
+def ToArray(texts):
+    'convert a list of texts of numbers to one float64 numpy array'
+    return np.array(" ".join(texts).split(),dtype=np.float64)
+
 class Qe(ResultQe):
-    @ResultQe.register(normal_end="if the job is normal ending")
+    @ResultQe.register(sources=["XMLPART"],
+                       normal_end="if the job is normal ending")
+    @ResultQe.register_xml("exit_status")
     def GetNormalEnd(self):
-        if self.XMLROOT == None:
+        if self.XMLPART == None:
             self["normal_end"] = None
             return
         
-        exit_status = self.XMLROOT.find('exit_status')
+        exit_status = self.XMLPART.find('exit_status')
         if exit_status != None:
             if exit_status.text == '0':
                 self["normal_end"] = True
@@ -23,24 +30,28 @@ class Qe(ResultQe):
             return   
         self["normal_end"] = None
             
-    @ResultQe.register(version="the version of QE",
+    @ResultQe.register(sources=["XMLPART"],
+                       version="the version of QE",
                        ncore = "the mpi cores")
+    @ResultQe.register_xml("general_info","parallel_info")
     def GetGeneralInfo(self):
-        if self.XMLROOT != None:
-            self['version'] = self.XMLROOT.find("general_info/creator").attrib['VERSION']
-            self['ncore'] = self.XMLROOT.find("parallel_info/nprocs").text
+        if self.XMLPART != None:
+            self['version'] = self.XMLPART.find("general_info/creator").attrib['VERSION']
+            self['ncore'] = self.XMLPART.find("parallel_info/nprocs").text
     
-    @ResultQe.register(natom="total atom number",
+    @ResultQe.register(sources=["XMLPART"],
+                       natom="total atom number",
                        ecutwfc="energy cutoff in Ry",
                        ks_solver="the diagonalization method",
                        mixing_type="the charge mixing method in SCF",
                        mixing_beta="the coefficient beta of charge mixing in SCF",
                        scf_thr="the convergence threshold of SCF, unit in Ry")
+    @ResultQe.register_xml("input")
     def GetInputParamFromXml(self):
-        if self.XMLROOT == None:
+        if self.XMLPART == None:
             return
 
-        input_param = self.XMLROOT.find('input')        
+        input_param = self.XMLPART.find('input')        
 
         self['natom'] = comm.iint(input_param.find('atomic_structure').attrib['nat'])
         
@@ -57,13 +68,15 @@ class Qe(ResultQe):
         if scf_thr != None: scf_thr *= 2
         self['scf_thr'] = scf_thr
 
-    @ResultQe.register(smearing_method="smearing method",
+    @ResultQe.register(sources=["XMLPART"],
+                       smearing_method="smearing method",
                        smearing_sigma = "smearing sigma in Ry")
+    @ResultQe.register_xml("input")
     def GetSmearingFromXml(self):
-        if self.XMLROOT == None:
+        if self.XMLPART == None:
             return
 
-        input_param = self.XMLROOT.find('input')
+        input_param = self.XMLPART.find('input')
         
         smearing_method = xfmlt(input_param,['bands','occupations'])
         if smearing_method == 'fixed':
@@ -77,28 +90,30 @@ class Qe(ResultQe):
         self["smearing_method"] = smearing_method
         self["smearing_sigma"] = smearing_sigma
     
-    @ResultQe.register(converge="if SCF is converged",
+    @ResultQe.register(depends=["natom"],sources=["XMLPART"],
+                       converge="if SCF is converged",
                        scf_steps="the steps of SCF",
                        energy="total energy, unit in eV",
                        nbands="band number",
                        ibzk="irreducible K point number",
                        nkstot="the total k points",
                        kpt="list, the K POINTS setting",
-                       force="list, the force of all atoms, [atom1x,atom1y,atom1z,atom2x,atom2y,atom2z...]. Unit in eV/Angstrom",
-                       stress="list, the stress, [xx,xy,xz,yx,yy,yz,zx,zy,zz]. Unit in kbar.",
-                       virial="list, the virial, [xx,xy,xz,yx,yy,yz,zx,zy,zz]. Unit in eV.",
-                       cell = "list, the cell, [a1,a2,a3,b1,b2,b3,c1,c2,c3]. Unit in Angstrom",
+                       force="numpy array, the force of all atoms, [atom1x,atom1y,atom1z,atom2x,atom2y,atom2z...]. Unit in eV/Angstrom",
+                       stress="numpy array, the stress, [xx,xy,xz,yx,yy,yz,zx,zy,zz]. Unit in kbar.",
+                       virial="numpy array, the virial, [xx,xy,xz,yx,yy,yz,zx,zy,zz]. Unit in eV.",
+                       cell = "numpy array, the cell, [a1,a2,a3,b1,b2,b3,c1,c2,c3]. Unit in Angstrom",
                        volume = "the volume of cell, unit in Angstrom^3",
-                       coord = "list, the coordinate of all atoms, [atom1x,atom1y,atom1z,atom2x,atom2y,atom2z...]. Unit in Angstrom",
+                       coord = "numpy array of shape (natom,3), the coordinate of all atoms. Unit in Angstrom",
                        total_mag="total magnization",
                        absolute_mag="total absolute magnization",
                        nelec="total electron number",
                        energy_per_atom="total energy divided by natom, unit in eV",)
+    @ResultQe.register_xml("output",last=True)
     def GetOutputParamFromXml(self):
-        if self.XMLROOT == None:
+        if self.XMLPART == None:
             return
 
-        output = self.XMLROOT.findall('output')
+        output = self.XMLPART.findall('output')
         if len(output) == 0:
             return
         output = output[-1]
@@ -130,13 +145,10 @@ class Qe(ResultQe):
             cell_b = xfmlt(structure,['cell','a2'])
             cell_c = xfmlt(structure,['cell','a3'])
             if cell_a and cell_b and cell_c:
-                self['cell'] = cell = [float(i)* comm.BOHR2A for i in cell_a.split() + cell_b.split() + cell_c.split()]
+                self['cell'] = cell = ToArray([cell_a,cell_b,cell_c]) * comm.BOHR2A
                 # calculate the volume by cell
-                import numpy as np
-                self["volume"] = volume = np.linalg.det(np.array(cell).reshape(3,3))
-            coord = []
-            for icoord in structure.findall('atomic_positions/atom'):
-                coord.append([float(i) * comm.BOHR2A for i in icoord.text.split()])
+                self["volume"] = volume = np.linalg.det(cell.reshape(3,3))
+            coord = ToArray([i.text for i in structure.findall('atomic_positions/atom')]).reshape(-1,3) * comm.BOHR2A
             if len(coord) == self['natom']:
                 self['coord'] = coord
             else:
@@ -147,14 +159,15 @@ class Qe(ResultQe):
             self['coord'] = None
         
         if output.find('forces') != None:
-            self['force'] = [float(i) * comm.HARTREE2EV / comm.BOHR2A for i in output.find('forces').text.split()]
+            self['force'] = ToArray([output.find('forces').text]) * comm.HARTREE2EV / comm.BOHR2A
         if output.find('stress') != None:
             # the read in stress is in Hartree/Bohr^3, convert to kbar
             # 1 kbar = 1e8 Pa = 1e8 N/m^2 = 1e8 J/m^3 = 1e8 * 2.2937126583579E17 Hartree/m^3 = 2.2937126583579E25 * 5.29177E-11**3 Hartree/Bohr^3 = 3.398927420868445E-6 Hartree/Bohr^3
-            self['stress'] = [ float(i)/comm.KBAR2HARTREEPERBOHR3 for i in output.find('stress').text.split()]
+            stress = ToArray([output.find('stress').text])
+            self['stress'] = stress / comm.KBAR2HARTREEPERBOHR3
             # calculate the virial, unit in eV
             if volume != None:
-                self['virial'] = [ float(i) * volume * comm.HARTREE2EV / comm.BOHR2A ** 3   for i in output.find('stress').text.split()]
+                self['virial'] = stress * volume * comm.HARTREE2EV / comm.BOHR2A ** 3
     
         self['total_mag'] = comm.ifloat(xfmlt(output,['magnetization','total']))
         self['absolute_mag'] = comm.ifloat(xfmlt(output,['magnetization','absolute']))
@@ -163,14 +176,16 @@ class Qe(ResultQe):
         else:
             self['energy_per_atom'] = self['energy'] / self['natom']
     
-    @ResultQe.register(total_time="the total running time",
+    @ResultQe.register(sources=["XMLPART"],
+                       total_time="the total running time",
                        force_time="the time to do the calculations of force",
                        stress_time="the time to do the calculation of stress")
+    @ResultQe.register_xml("timing_info")
     def GetTimeParamFromXml(self):
-        if self.XMLROOT == None:
+        if self.XMLPART == None:
             return
 
-        timing = self.XMLROOT.find('timing_info')
+        timing = self.XMLPART.find('timing_info')
 
         self['total_time'] = comm.ifloat(xfmlt(timing,['total','wall']))
         
@@ -181,18 +196,22 @@ class Qe(ResultQe):
             elif itime.get('label') == 'stress':
                 self['stress_time'] = comm.ifloat(itime.find('wall').text)
 
-    @ResultQe.register(relax_converge="if the relax is converged")
+    @ResultQe.register(sources=["XMLPART"],
+                       relax_converge="if the relax is converged")
+    @ResultQe.register_xml("output",last=True)
     def GetRelaxConverge(self):
-        if self.XMLROOT == None:
+        if self.XMLPART == None:
             return
         
-        output = self.XMLROOT.find('output')
+        output = self.XMLPART.find('output')
         self["relax_converge"] = comm.ibool(xfmlt(output,['convergence_info','opt_conv','convergence_achieved']))
 
-    @ResultQe.register(relax_steps="the total ION steps")
+    @ResultQe.register(sources=["XMLPART"],
+                       relax_steps="the total ION steps")
+    @ResultQe.register_xml("step",count=True)
     def GetRelaxStepsFromXml(self):
-        if self.XMLROOT == None:
+        if self.XMLPART == None:
             return
 
-        self["relax_steps"] = len(self.XMLROOT.findall('step'))
+        self["relax_steps"] = self.XmlCount('step')
 
@@ -1,12 +1,75 @@
 import traceback,inspect
+import numpy as np
+
+class LazySource:
+    '''
+    A decorator to define a source (the context of a file, or some other raw data) of Result.
+    The decorated function is called to load the source when it is firstly used, and the value is cached.
+    The source used by each registered method is recorded, and can be checked by Result.AllSourceUsed().
+    The sources used to load a source (such as INPUT is used to get the name of LOG) are also recorded.
+    '''
+    def __init__(self,loader):
+        self.loader = loader
+        self.name = loader.__name__
+        self.__doc__ = loader.__doc__
+
+    def __set_name__(self,owner,name):
+        self.name = name
+
+    def __get__(self,obj,objtype=None):
+        if obj is None:
+            return self
+        if self.name not in obj._SOURCE:
+            obj._LOADING.append(self.name)
+            try:
+                obj._SOURCE[self.name] = self.loader(obj)
+            finally:
+                obj._LOADING.pop()
+        used = obj._SOURCE_DEPENDS.get(self.name,set()) | {self.name}
+        for source in obj._LOADING:
+            obj._SOURCE_DEPENDS.setdefault(source,set()).update(used)
+        for method in obj._RUNNING:
+            obj._SOURCE_USED.setdefault(method,set()).update(used)
+        return obj._SOURCE[self.name]
+
+    def __set__(self,obj,value):
+        obj._SOURCE[self.name] = value
 
 class Result:
+    _DEPENDS = {}   # key is the registered method, and value is (the keys it depends on, the sources it reads)
+    _SOURCE_FILES = {}  # key is the source name, and value is the attribute of its file name, defined by the subclass
+    _PLANS = {}     # the cache of Plan(), key is (class, keys), and is cleared when a method is registered
+    _RAW_SOURCES = []   # the large sources (the whole context of output files), which are released in the low memory mode
+
     def __init__(self):
         self._PARAM_VALUE={}
+        self._SOURCE = {}       # the loaded sources, key is the source name
+        self._SOURCE_USED = {}  # key is the registered method, and value is the set of source names used by it
+        self._METHOD_USED = {}  # key is the registered method, and value is the set of registered methods whose values are used by it
+        self._RUNNING = []      # the registered methods that are running now
+        self._LOADING = []      # the sources that are loading now
+        self._SOURCE_DEPENDS = {}   # key is the source name, and value is the set of source names used to load it
+        self._DONE = set()      # the registered methods that have been run
+        self._XML_COUNTER = {}  # the number of the elements declared by register_xml(count=True)
     
     @classmethod
-    def register(cls,**key):
+    def register(cls,depends=None,sources=None,**key):
+        '''
+        Register a method to catch the value of keys:
+            @ResultAbacus.register(depends=["natom"],sources=["LOGINDEX"],
+                                   energy="the total energy (eV)",
+                                   energy_per_atom="the total energy divided by natom, (eV)")
+            def GetLogResult(self): ...
+        depends: the keys whose values are required by this method.
+        sources: the names of sources (such as LOGINDEX, INPUT, XMLPART) read by this method.
+        They are not required, but are used by Plan() to sort the methods and load the sources in advance.
+        '''
         def aa(method):
+            Result._PLANS.clear()
+            if depends or sources:
+                info = cls._DEPENDS.setdefault(method,([],[]))
+                info[0].extend([i for i in (depends or []) if i not in info[0]])
+                info[1].extend([i for i in (sources or []) if i not in info[1]])
             
             for ikey,descript in key.items():
                 #print("register",ikey)
@@ -24,23 +87,194 @@ class Result:
             return method
         return aa
 
+    @classmethod
+    def register_xml(cls,*paths,last=False,count=False):
+        '''
+        Declare the parts of the xml file (such as vasprun.xml of VASP) that a registered method needs:
+            @ResultVasp.register(band="...")
+            @ResultVasp.register_xml("calculation/eigenvalues",last=True)
+            def GetBandInfo(self): ...
+        The path is the tag path relative to the root of xml file. If last is True, only the last
+        element of this path is kept. The declared parts can be found in self.XMLPART.
+        If count is True, the elements of this path are only counted but not kept, and the number
+        can be got by self.XmlCount(path).
+        '''
+        def aa(method):
+            for path in paths:
+                if count:
+                    if path not in cls._XML_COUNTS:
+                        cls._XML_COUNTS.append(path)
+                else:
+                    cls._XML_PATHS[path] = last and cls._XML_PATHS.get(path,True)
+            return method
+        return aa
+
+    def XmlCount(self,path):
+        '''
+        Return the number of elements of path in the xml file, and path should be declared by 
+        register_xml(path,count=True). Return None if the xml file can not be read.
+        '''
+        root = self.XMLPART
+        if root == None:
+            return None
+        if path in self._XML_COUNTER:
+            return self._XML_COUNTER[path]
+        # XMLPART is the whole tree
+        return len(root.findall(path))
+
     def __setitem__(self,key,value):
         if key not in self._PARAM_DIC:
             print("WARNING: the method to catch '%s' is not registered, but is doing the assignment" % key)
             print(inspect.currentframe().f_back)
 
+        if key not in self._PARAM_VALUE:
+            self._PARAM_VALUE[key] = value
+            return
+        value_org = self._PARAM_VALUE[key]
+        # the value may be a numpy array, whose != is elementwise
         try:
-            value_org = self._PARAM_VALUE[key]
-            if value_org != value:
-                print("WARNING: value of '%s' has been catched, but value is different:" % key,value_org,value)
+            same = np.array_equal(value_org,value) if isinstance(value_org,np.ndarray) or isinstance(value,np.ndarray) else bool(value_org == value)
         except:
-            self._PARAM_VALUE[key] = value
+            same = False
+        if not same:
+            print("WARNING: value of '%s' has been catched, but value is different:" % key,value_org,value)
 
-    def __getitem__(self,key):
+    @classmethod
+    def Plan(cls,keys):
+        '''
+        Return (methods, sources): the registered methods needed to catch the values of keys, 
+        and the sources declared by these methods. The method of a key in depends is placed before 
+        the method depending on it. The keys that are not registered are skipped.
+        '''
+        plan_key = (cls,tuple(keys))
+        if plan_key in Result._PLANS:
+            return Result._PLANS[plan_key]
+        methods = []
+        visiting = []
+        def visit(key):
+            if key not in cls._PARAM_DIC:
+                return
+            method = cls._PARAM_DIC[key][0]
+            # the recursion is reported by __getitem__ when the methods are run
+            if method in methods or method in visiting:
+                return
+            visiting.append(method)
+            for ikey in cls._DEPENDS.get(method,([],[]))[0]:
+                visit(ikey)
+            visiting.pop()
+            methods.append(method)
+
+        for key in keys:
+            visit(key)
+
+        sources = []
+        for method in methods:
+            sources += [i for i in cls._DEPENDS.get(method,([],[]))[1] if i not in sources]
+        Result._PLANS[plan_key] = (methods,sources)
+        return methods,sources
+
+    def Evaluate(self,keys,low_memory=False):
+        '''
+        Catch the values of keys by the order of Plan(keys), and return a dict of key: value.
+        The declared sources are read firstly, and then only the planned methods are run.
+        If low_memory is True, the sources are read when they are used, and each raw source is released
+        once the remaining planned methods do not need it. All raw sources are released at the end.
+        '''
+        methods,sources = self.Plan([i for i in keys if i not in self._PARAM_VALUE])
+        if low_memory:
+            methods = self._GroupBySource(methods)
+        else:
+            for source in sources:
+                try:
+                    getattr(self,source)
+                except:
+                    print("ERROR: read source %s failed!" % source)
+                    traceback.print_exc()
+        for i,method in enumerate(methods):
+            if method not in self._DONE:
+                self._Run(method)
+            if low_memory:
+                needed = self._NeededSources(methods[i+1:])
+                if needed != None:
+                    self.ReleaseSources(keep=needed)
+        values = {key:self[key] for key in keys}
+        if low_memory:
+            self.ReleaseSources()
+        return values
+
+    def _GroupBySource(self,methods):
+        '''
+        Reorder the planned methods so that the methods reading the same file are run one after another,
+        and each file can be released earlier. A method is still placed after the methods it depends on.
+        '''
+        def files(method):
+            return {self._SOURCE_FILES.get(i) or i for i in self._DEPENDS.get(method,([],[]))[1]}
+        def depends(method):
+            return {self._PARAM_DIC[i][0] for i in self._DEPENDS.get(method,([],[]))[0] if i in self._PARAM_DIC}
+
+        remaining = list(methods)
+        ordered = []
+        last_files = set()
+        while remaining:
+            ready = [i for i in remaining if not (depends(i) & set(remaining))]
+            if len(ready) == 0:
+                # the recursion is reported by __getitem__ when the methods are run
+                ready = remaining
+            method = next((i for i in ready if files(i) & last_files),ready[0])
+            remaining.remove(method)
+            ordered.append(method)
+            last_files = files(method)
+        return ordered
+
+    def _NeededSources(self,methods):
+        '''
+        Return the set of sources declared by methods, and the sources used to load them. 
+        Return None if any method does not declare its sources, then all sources should be kept.
+        '''
+        needed = set()
+        for method in methods:
+            if method in self._DONE:
+                continue
+            if method not in self._DEPENDS:
+                return None
+            for source in self._DEPENDS[method][1]:
+                needed.add(source)
+                needed.update(self._SOURCE_DEPENDS.get(source,set()))
+        return needed
+
+    def ReleaseSources(self,keep=()):
+        '''
+        Release the loaded raw sources (see _RAW_SOURCES) except those in keep, to reduce the memory.
+        A released source will be read again if it is used later. The caught values are not affected.
+        '''
+        for source in self._RAW_SOURCES:
+            if source in self._SOURCE and source not in keep:
+                del self._SOURCE[source]
+
+    def _Run(self,func):
+        self._RUNNING.append(func)
         try:
-            return self._PARAM_VALUE[key]
+            func(self)
         except:
-            pass
+            print("ERROR: excecute function %s() failed, skip it!" % func.__qualname__)
+            traceback.print_exc()
+        self._RUNNING.pop()
+        self._DONE.add(func)
+
+    def __getitem__(self,key):
+        if key in self._PARAM_VALUE:
+            if self._RUNNING and key in self._PARAM_DIC:
+                # the running methods use the value of key, so also depend on the sources read for it, 
+                # and the methods to catch it
+                func = self._PARAM_DIC[key][0]
+                sources = self._SOURCE_USED.get(func)
+                used = self._METHOD_USED.get(func,set()) | {func}
+                for method in self._RUNNING:
+                    if sources:
+                        self._SOURCE_USED.setdefault(method,set()).update(sources)
+                    if method is not func:
+                        self._METHOD_USED.setdefault(method,set()).update(used)
+            return self._PARAM_VALUE[key]
 
         try:
             func = self._PARAM_DIC[key][0]
@@ -48,21 +282,22 @@ class Result:
             print("ERROR: no method to catch value of '%s', or the method is not registered!" % key)
             return None
         
-        func_source_file = inspect.getsource(func)
-        fback_source_file = inspect.getsource(inspect.currentframe().f_back)
-        if func_source_file == fback_source_file:
+        # func is running now, so the value is required by itself directly or by the methods it calls
+        if func in self._RUNNING:
             framinfo = inspect.getframeinfo(inspect.currentframe().f_back)
             print("WARNING: try to catch the value of '%s' by %s()" % (key,func.__qualname__))
+            if self._RUNNING[-1] is not func:
+                print("  Calling chain: %s" % " -> ".join(["%s()" % i.__qualname__ for i in self._RUNNING[self._RUNNING.index(func):]]))
             print("  This is a recursion call, and should be avoid!")
             print("  File:'%s', line %d, %s()" % framinfo[0:3])
-            print("%s" % framinfo[3][0])
+            if framinfo[3]: print("%s" % framinfo[3][0])
             return None
 
-        try:
-            func(self)
-        except:
-            print("ERROR: excecute function %s() failed, skip it!" % func.__qualname__)
-            traceback.print_exc()
+        if func not in self._DONE:
+            self._Run(func)
+        used = self._METHOD_USED.get(func,set()) | {func}
+        for method in self._RUNNING:
+            self._METHOD_USED.setdefault(method,set()).update(used)
         
         try:
             return self._PARAM_VALUE[key]
@@ -85,3 +320,38 @@ class Result:
     def AllParamValue(self):
         return self._PARAM_VALUE
 
+    def SourceFiles(self,sources):
+        '''
+        Return the list of the files of sources, the file of each source is defined by _SOURCE_FILES.
+        Return None if the file of any source is unknown.
+        '''
+        files = []
+        for source in sources:
+            if source not in self._SOURCE_FILES:
+                return None
+            if self._SOURCE_FILES[source] == None:
+                continue
+            ifile = getattr(self,self._SOURCE_FILES[source])
+            if ifile == None:
+                return None
+            if ifile not in files:
+                files.append(ifile)
+        return files
+
+    def AllSourceUsed(self):
+        #return a dict, whose key is the parameter name that has been catched,
+        #and value is a list of the sources read by its method
+        sourcedic = {}
+        for key in self._PARAM_VALUE:
+            if key in self._PARAM_DIC:
+                sourcedic[key] = sorted(self._SOURCE_USED.get(self._PARAM_DIC[key][0],[]))
+        return sourcedic
+
+    def AllMethodUsed(self,key):
+        'return the list of the registered methods used to catch the value of key, including its own method'
+        if key not in self._PARAM_DIC:
+            return []
+        func = self._PARAM_DIC[key][0]
+        methods = [func] + [i for i in self.Plan([key])[0] if i is not func]
+        methods += [i for i in self._METHOD_USED.get(func,[]) if i not in methods]
+        return methods
@@ -1,10 +1,29 @@
 import os,sys,json
 import traceback
-from .result import Result
+from .result import Result,LazySource
 from . import comm
 
 class ResultAbacus(Result):
     _PARAM_DIC = {}
+    # the attribute of the file name of each source, None means the source is not read from a file
+    _SOURCE_FILES = {"INPUT":"INPUTf","STRU":"STRUf","KPT":"KPTf","OUTPUTf":None,"OUTPUT":"OUTPUTf",
+                     "LOGf":"LOGf","LOG":"LOGf","LOGTAIL":"LOGf","MULLIKEN":"MULLIKENf",
+                     "resultREF":"resultREFf","TIME":"TIMEf","TIMETABLE":None,"LOGINDEX":"LOGf",
+                     "OUTINPUT":"OUTINPUTf"}
+    _RAW_SOURCES = ["OUTPUT","LOG","LOGINDEX","LOGTAIL","MULLIKEN"]
+
+    # the markers in running_xxx.log, the line numbers of all markers are recorded by one pass
+    # when LOGINDEX is firstly used. Markers not in this list can also be queried from LOGINDEX, 
+    # but each of them will cost an extra pass.
+    LOG_MARKERS = ["WELCOME TO ABACUS", "ABACUS", "Commit:", "DSIZE =",
+                   "NBANDS =", "nkstot =", "nkstot_ibz =", "number of atom for this type =",
+                   "total electron number of element", "[fft grid for charge/potential] =",
+                   "POINT GROUP =", "POINT GROUP IN SPACE GROUP =",
+                   "charge density convergence is achieved", "convergence has NOT been achieved!",
+                   "convergence has not been achieved", "total magnetism (Bohr mag/cell)",
+                   "absolute magnetism", "!FINAL_ETOT_IS", "Volume (A^3) =", "E_Fermi",
+                   "Largest gradient is", "Density error is", "lattice constant (Angstrom)",
+                   "atom label =", "STATE ENERGY(eV) AND OCCUPATIONS"]
 
     def __init__(self,path = ".",output = None,resultREF="resultREF.json"):
         super().__init__()
@@ -13,34 +32,109 @@ class ResultAbacus(Result):
         self.INPUTf = os.path.join(self.PATH,'INPUT')
         self.STRUf  = os.path.join(self.PATH,'STRU')
         self.KPTf   = os.path.join(self.PATH,'KPT')
-        
-        self.INPUT  = comm.ReadFile(self.INPUTf,warn=True)
-        self.STRU   = comm.ReadFile(self.STRUf,warn=True)
-        self.KPT    = comm.ReadFile(self.KPTf,warn=False)
-        
+        self._OUTPUTf = output
+
+        #resultREF is a json file of a dict, where key is the param name, and value is the value of the param
+        #such as : {"energy": -10000.1111111, "force": [[0.1,0.1,0.1],[0.1,0.1,0.1],[0.1,0.1,0.1]]}
+        self.resultREFf = resultREF
+
+    # All files are read when they are firstly used by the registered methods
+    @LazySource
+    def INPUT(self):
+        return comm.ReadFile(self.INPUTf,warn=True)
+
+    @LazySource
+    def STRU(self):
+        return comm.ReadFile(self.STRUf,warn=True)
+
+    @LazySource
+    def KPT(self):
+        return comm.ReadFile(self.KPTf,warn=False)
+
+    @LazySource
+    def OUTPUTf(self):
         #screen output
-        self.OUTPUTf = output if output != None else comm.FindOutput(self.PATH,keyinfo="Atomic-orbital Based Ab-initio")
-        if self.OUTPUTf == None:
+        if self._OUTPUTf != None:
+            return self._OUTPUTf
+        outputf = comm.FindOutput(self.PATH,keyinfo="Atomic-orbital Based Ab-initio")
+        if outputf == None:
             print("WARNING: can not find the output of ABACUS in %s" % self.PATH)
-            self.OUTPUT = []
-        else:
-            self.OUTPUT = comm.ReadFile(self.OUTPUTf,warn=False)
-        
-        self.SUFFIX,self.CALCULATION = self.SuffixCalculation(self.INPUT) 
+        return outputf
 
+    @LazySource
+    def OUTPUT(self):
+        return comm.ReadFile(self.OUTPUTf,warn=False)
+
+    @property
+    def SUFFIX(self):
+        return self.SuffixCalculation(self.INPUT)[0]
+
+    @property
+    def CALCULATION(self):
+        return self.SuffixCalculation(self.INPUT)[1]
+
+    @LazySource
+    def LOGf(self):
         #OUT.XXX/running_xxx.log
-        self.LOGf   = os.path.join(self.PATH,"OUT.%s/running_%s.log"%(self.SUFFIX,self.CALCULATION))
-        self.LOG    = comm.ReadFile(self.LOGf,warn=True)
-        
+        return os.path.join(self.PATH,"OUT.%s/running_%s.log"%(self.SUFFIX,self.CALCULATION))
 
-        #resultREF is a json file of a dict, where key is the param name, and value is the value of the param
-        #such as : {"energy": -10000.1111111, "force": [[0.1,0.1,0.1],[0.1,0.1,0.1],[0.1,0.1,0.1]]}
-        self.resultREF = {}
-        if resultREF and os.path.isfile(resultREF):
-            self.resultREF = json.load(open(resultREF))
-        
+    @property
+    def OUTINPUTf(self):
+        #OUT.XXX/INPUT, the INPUT written by ABACUS, including the default values
+        return os.path.join(self.PATH,"OUT.%s/INPUT" % self.SUFFIX)
+
+    @LazySource
+    def OUTINPUT(self):
+        return comm.ReadFile(self.OUTINPUTf,warn=False)
+
+    @property
+    def MULLIKENf(self):
+        return os.path.join(os.path.split(self.LOGf)[0],"mulliken.txt")
+
+    @LazySource
+    def MULLIKEN(self):
+        return comm.ReadFile(self.MULLIKENf,warn=False)
+
+    @property
+    def TIMEf(self):
+        # time.json is in the job path or OUT.XXX
+        for time_file in [os.path.join(self.PATH,"time.json"),os.path.join(self.PATH,f"OUT.{self.SUFFIX}","time.json")]:
+            if os.path.isfile(time_file):
+                return time_file
+        return None
+
+    @LazySource
+    def LOG(self):
+        return comm.ReadFile(self.LOGf,warn=True)
+
+    @LazySource
+    def LOGTAIL(self):
+        # read running_xxx.log from the end, is used to get the last block without loading the whole file
+        return comm.TailReader(self.LOGf)
+
+    @LazySource
+    def resultREF(self):
+        if self.resultREFf and os.path.isfile(self.resultREFf):
+            return json.load(open(self.resultREFf))
+        return {}
+
+    @LazySource
+    def TIME(self):
         # time.json
-        self.TIME = self.ReadTime()
+        return self.ReadTime()
+
+    @LazySource
+    def TIMETABLE(self):
+        # the flat table of time, {(class_name, function_name): (cpu_second, calls)}, 
+        # read from time.json, or the timing table in the output if time.json does not exist
+        if self.TIME != None:
+            return self.TimeTableFromJson(self.TIME)
+        return self.TimeTableFromOutput(self.OUTPUT)
+
+    @LazySource
+    def LOGINDEX(self):
+        # the index of markers in self.LOG, built once when it is firstly used
+        return comm.LineIndex(self.LOG,self.LOG_MARKERS)
 
     def SuffixCalculation(self,INPUT):
         suffix = "ABACUS"
@@ -55,13 +149,7 @@ class ResultAbacus(Result):
         return suffix,calculation
     
     def ReadTime(self): 
-        if os.path.isfile(os.path.join(self.PATH,"time.json")):
-            time_file = os.path.join(self.PATH,"time.json")
-        elif os.path.isfile(os.path.join(self.PATH,f"OUT.{self.SUFFIX}","time.json")):
-            time_file = os.path.join(self.PATH,f"OUT.{self.SUFFIX}","time.json")
-        else:
-            time_file = None
-        
+        time_file = self.TIMEf
         if time_file:
             import json
             try:
@@ -72,6 +160,74 @@ class ResultAbacus(Result):
         else:
             return None
 
+    @staticmethod
+    def TimeTableFromJson(time_json):
+        '''
+        Transfer the dict of time.json to {(class_name, function_name): (cpu_second, calls)}.
+        The key (class_name, None) is the total cpu_second of the class and the number of its functions,
+        and ("total", None) is the total time. If there are two classes with the same name, only the first one is used.
+        '''
+        table = {}
+        if "total" in time_json:
+            table[("total",None)] = (time_json["total"],1)
+        for sub in time_json.get("sub",[]):
+            class_name = sub.get("class_name",None)
+            if (class_name,None) in table or "sub" not in sub:
+                table.setdefault((class_name,None),(None,None))
+                continue
+            total_time = 0.0
+            for subsub in sub["sub"]:
+                total_time += subsub.get("cpu_second",0.0)
+                table.setdefault((class_name,subsub.get("name",None)),(subsub.get("cpu_second",None),subsub.get("calls",None)))
+            table[(class_name,None)] = (total_time,len(sub["sub"]))
+        return table
+
+    @staticmethod
+    def TimeTableFromOutput(lines):
+        '''
+        Read the last timing table in the output of ABACUS, and return a dict same as TimeTableFromJson.
+        The table is like:
+            |CLASS_NAME---------|NAME---------------|TIME(Sec)-----|CALLS----|AVG------|PER%-------
+                                 total               1.03          9         0.11      100%
+             Driver              reading             0.01          1         0.01      1.1%
+                                 driver_line         1.01          1         1.01      98%
+        The class name is omitted for the following functions of the same class.
+        '''
+        start = None
+        for i,line in enumerate(lines):
+            if "CLASS_NAME" in line and "TIME" in line:
+                start = i + 1
+        if start == None:
+            return {}
+
+        table = {}
+        class_time = {}
+        class_name = None
+        for line in lines[start:]:
+            sline = line.replace("|"," ").split()
+            numbers = []
+            while len(sline) > 0 and comm.ifloat(sline[-1].rstrip("%")) != None:
+                numbers.insert(0,float(sline.pop().rstrip("%")))
+            if len(numbers) < 2 or len(sline) not in [1,2]:
+                # the separator line before the table, or the end of table
+                if len(table) > 0:
+                    break
+                continue
+            if len(sline) == 2:
+                class_name = sline[0]
+            name = sline[-1]
+            if len(sline) == 1 and name == "total":
+                table[("total",None)] = (numbers[0],1)
+                continue
+            if (class_name,name) not in table:
+                table[(class_name,name)] = (numbers[0],int(numbers[1]))
+                class_time.setdefault(class_name,[0.0,0])
+                class_time[class_name][0] += numbers[0]
+                class_time[class_name][1] += 1
+        for k,v in class_time.items():
+            table[(k,None)] = tuple(v)
+        return table
+
     def GetTime(self,class_name,func_name):
         # return the cpu_second of the function, and the calls of the function
         # if tunc_name is None, return the cpu_second of the class and the number of functions in the class
@@ -99,20 +255,4 @@ class ResultAbacus(Result):
             return (None,None)
         if class_name == "total":
             return (self.TIME.get("total",None),1)
-        if "sub" not in self.TIME:
-            return (None,None)
-        for sub in self.TIME["sub"]:
-            if sub.get("class_name",None) == class_name:
-                if "sub" not in sub:
-                    return (None,None)
-                if func_name == None:
-                    total_time = 0.0
-                    for subsub in sub["sub"]:
-                        total_time += subsub.get("cpu_second",0.0)
-                    return (total_time,len(sub["sub"]))
-                else:
-                    for subsub in sub["sub"]:
-                        if subsub.get("name",None) == func_name:
-                            return (subsub.get("cpu_second",None),subsub.get("calls",None))
-                break
-        return (None,None)
+        return self.TIMETABLE.get((class_name,func_name),(None,None))
@@ -1,20 +1,48 @@
 import os,sys,json
-from .result import Result
+from .result import Result,LazySource
 from . import comm
 
 class ResultQe(Result):
     _PARAM_DIC = {}
+    _XML_PATHS = {}  # the parts of pwscf.xml used by registered methods, see Result.register_xml
+    _XML_COUNTS = []
+    # the attribute of the file name of each source, None means the source is not read from a file
+    _SOURCE_FILES = {"OUTPUTf":None,"OUTPUT":"OUTPUTf","XMLROOT":"XMLf","XMLPART":"XMLf","resultREF":"resultREFf"}
+    _RAW_SOURCES = ["OUTPUT","XMLROOT","XMLPART"]
 
     def __init__(self,path = ".",output = None,resultREF="resultREF.json"):
         super().__init__()
         self.PATH = path   #the path of QE job
 
         self.XMLf = os.path.join(self.PATH,"pwscf.xml")
-        self.OUTPUTf = output if output != None else comm.FindOutput(self.PATH,keyinfo='Program PWSCF')
+        self._OUTPUTf = output
+        self.resultREFf = resultREF
 
-        self.OUTPUT = comm.ReadFile(self.OUTPUTf,warn=False)
-        self.XMLROOT = comm.ReadXmlFile(self.XMLf,warn=True)
+    # All files are read when they are firstly used by the registered methods
+    @LazySource
+    def OUTPUTf(self):
+        return self._OUTPUTf if self._OUTPUTf != None else comm.FindOutput(self.PATH,keyinfo='Program PWSCF')
 
-        self.resultREF = {}
-        if resultREF and os.path.isfile(resultREF):
-            self.resultREF = json.load(open(resultREF))
+    @LazySource
+    def OUTPUT(self):
+        return comm.ReadFile(self.OUTPUTf,warn=False)
+
+    @LazySource
+    def XMLROOT(self):
+        # the whole tree of pwscf.xml
+        return comm.ReadXmlFile(self.XMLf,warn=True)
+
+    @LazySource
+    def XMLPART(self):
+        # the tree of pwscf.xml that only has the parts declared by register_xml, 
+        # pwscf.xml is read by streaming and other parts are dropped during reading
+        if "XMLROOT" in self._SOURCE:
+            return self.XMLROOT
+        self._XML_COUNTER = {i:0 for i in self._XML_COUNTS}
+        return comm.ReadXmlSubtrees(self.XMLf,self._XML_PATHS,counter=self._XML_COUNTER,warn=True)
+
+    @LazySource
+    def resultREF(self):
+        if self.resultREFf and os.path.isfile(self.resultREFf):
+            return json.load(open(self.resultREFf))
+        return {}
@@ -1,9 +1,29 @@
 import os,sys,json
-from .result import Result
+from .result import Result,LazySource
 from . import comm
 
 class ResultVasp(Result):
     _PARAM_DIC = {}
+    _XML_PATHS = {}  # the parts of vasprun.xml used by registered methods, see Result.register_xml
+    _XML_COUNTS = []
+    # the attribute of the file name of each source, None means the source is not read from a file
+    _SOURCE_FILES = {"INCAR":"INCARf","KPOINTS":"KPOINTSf","POSCAR":"POSCARf","OUTCAR":"OUTCARf","OUTCARTAIL":"OUTCARf","OUTCARINDEX":"OUTCARf",
+                     "OSZICAR":"OSZICARf","XMLROOT":"XMLf","XMLPART":"XMLf","resultREF":"resultREFf"}
+    _RAW_SOURCES = ["OUTCAR","OUTCARINDEX","OUTCARTAIL","OSZICAR","XMLROOT","XMLPART"]
+
+    # the markers of the events in OUTCAR, the line numbers of all markers are recorded by one pass
+    # when OUTCARINDEX is firstly used, Find(marker) returns the lines of all ION steps and Last(marker)
+    # returns the last one. Markers not in this list can also be queried, but each of them will cost an extra pass.
+    OUTCAR_MARKERS = [# header info
+                      "total cores", "number of bands    NBANDS", "number of ions     NIONS =", "ISPIN  =",
+                      "ENCUT  =  ", "NELECT =", "ISMEAR =", "NELM   =", "volume of cell", "LDA+U is selected,",
+                      # symmetry
+                      "The dynamic configuration has the point symmetry",
+                      " The point group associated with its full space group is",
+                      # each ION step
+                      "Iteration", "energy  without entropy=", "TOTAL-FORCE (eV/Angst)", "  in kB",
+                      # timing
+                      "STRESS:  cpu time", "LOOP:  cpu time", "Total CPU time used (sec):"]
 
     def __init__(self,path = ".",resultREF="resultREF.json"):
         super().__init__()
@@ -15,16 +35,56 @@ class ResultVasp(Result):
         self.OUTCARf = os.path.join(self.PATH,'OUTCAR')
         self.OSZICARf = os.path.join(self.PATH,'OSZICAR')
         self.XMLf = os.path.join(self.PATH,'vasprun.xml')
+        self.resultREFf = resultREF
+
+    # All files are read when they are firstly used by the registered methods
+    @LazySource
+    def INCAR(self):
+        return comm.ReadFile(self.INCARf,warn=False)
+
+    @LazySource
+    def KPOINTS(self):
+        return comm.ReadFile(self.KPOINTSf,warn=False)
+
+    @LazySource
+    def POSCAR(self):
+        return comm.ReadFile(self.POSCARf,warn=False)
+
+    @LazySource
+    def OUTCAR(self):
+        return comm.ReadFile(self.OUTCARf,warn=True)
+
+    @LazySource
+    def OUTCARTAIL(self):
+        # read OUTCAR from the end, is used to get the last block without loading the whole file
+        return comm.TailReader(self.OUTCARf)
+
+    @LazySource
+    def OUTCARINDEX(self):
+        # the index of markers in self.OUTCAR. The blocks after the markers (such as forces) are read from
+        # the following lines, so the whole OUTCAR is kept, and both are released in the low memory mode
+        return comm.LineIndex(self.OUTCAR,self.OUTCAR_MARKERS)
 
-        self.INCAR      = comm.ReadFile(self.INCARf,warn=False)
-        self.KPOINTS    = comm.ReadFile(self.KPOINTSf,warn=False)
-        self.POSCAR     = comm.ReadFile(self.POSCARf,warn=False)
-        self.OUTCAR     = comm.ReadFile(self.OUTCARf,warn=True)
-        self.OSZICAR    = comm.ReadFile(self.OSZICARf,warn=False)
-        self.XMLROOT    = comm.ReadXmlFile(self.XMLf,warn=True)
+    @LazySource
+    def OSZICAR(self):
+        return comm.ReadFile(self.OSZICARf,warn=False)
 
-        self.resultREF = {}
-        if resultREF and os.path.isfile(resultREF):
-            self.resultREF = json.load(open(resultREF))
+    @LazySource
+    def XMLROOT(self):
+        # the whole tree of vasprun.xml
+        return comm.ReadXmlFile(self.XMLf,warn=True)
 
+    @LazySource
+    def XMLPART(self):
+        # the tree of vasprun.xml that only has the parts declared by register_xml, 
+        # vasprun.xml is read by streaming and other parts are dropped during reading
+        if "XMLROOT" in self._SOURCE:
+            return self.XMLROOT
+        self._XML_COUNTER = {i:0 for i in self._XML_COUNTS}
+        return comm.ReadXmlSubtrees(self.XMLf,self._XML_PATHS,counter=self._XML_COUNTER,warn=True)
 
+    @LazySource
+    def resultREF(self):
+        if self.resultREFf and os.path.isfile(self.resultREFf):
+            return json.load(open(self.resultREFf))
+        return {}
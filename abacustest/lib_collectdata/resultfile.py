@@ -0,0 +1,339 @@
+'''
+Write and read the result file of collectdata, which is a dict of {example: {key: value}}.
+The format is decided by the extension of file name:
+    .json: the json file, each example is a dict of key: value.
+    .jsonl: one line for each example, is written when the example is collected, see JsonlWriter.
+    .npz: the numpy npz file, and .parquet: the parquet file (requires pyarrow).
+          Both are columnar, each key is a column, and the examples are the rows.
+          The column of int/float/bool/str values is stored as a typed array, None is marked by a mask.
+          The column of numeric lists (such as force, band) is stored as one flat array of all examples with
+          the offset and the shape of each example. Other values (such as dict) are stored as json strings.
+          The int values in a column that also has float values are read back as float.
+'''
+import os,json
+import numpy as np
+from . import comm
+
+COLUMNAR_VERSION = 1
+
+def FileFormat(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in [".npz",".parquet"]:
+        return ext[1:]
+    return "json"
+
+def _ArrayOf(value):
+    'return the numeric numpy array of value, or None if value is not a regular list of numbers'
+    if not isinstance(value,(list,tuple,np.ndarray)):
+        return None
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        # the ragged list
+        return None
+    if array.dtype.kind not in "biuf":
+        return None
+    return array
+
+def _ColumnKind(values):
+    '''
+    Return (kind, dtype) of a column, kind is one of bool/int/float/str/array/json.
+    If kind is array, dtype is the dtype of the flat data.
+    '''
+    kinds = set()
+    dtypes = []
+    for value in values:
+        if value is None:
+            continue
+        elif isinstance(value,(bool,np.bool_)):
+            kinds.add("bool")
+        elif isinstance(value,(int,np.integer)):
+            kinds.add("int" if -2**63 <= value < 2**63 else "json")
+        elif isinstance(value,(float,np.floating)):
+            kinds.add("float")
+        elif isinstance(value,str):
+            kinds.add("str")
+        else:
+            array = _ArrayOf(value)
+            if array is None:
+                kinds.add("json")
+            else:
+                kinds.add("array")
+                dtypes.append(array.dtype)
+    if len(kinds) == 0:
+        return "float",None
+    elif kinds == {"int","float"}:
+        return "float",None
+    elif len(kinds) == 1:
+        kind = kinds.pop()
+        if kind == "array":
+            return kind,np.result_type(*dtypes).str
+        return kind,None
+    return "json",None
+
+def ToColumns(allresult):
+    '''
+    Transfer allresult {example: {key: value}} to (examples, columns).
+    columns is a list of (key, kind, dtype, values), and values is the list of the value of each example.
+    The key that is missing in an example is set to None.
+    '''
+    examples = list(allresult.keys())
+    keys = []
+    keyset = set()
+    for example in examples:
+        for key in allresult[example]:
+            if key not in keyset:
+                keyset.add(key)
+                keys.append(key)
+    columns = []
+    for key in keys:
+        values = [allresult[example].get(key) for example in examples]
+        kind,dtype = _ColumnKind(values)
+        columns.append((key,kind,dtype,values))
+    return examples,columns
+
+def FromColumns(examples,columns):
+    'the reverse of ToColumns'
+    allresult = {example:{} for example in examples}
+    for key,values in columns:
+        for example,value in zip(examples,values):
+            allresult[example][key] = value
+    return allresult
+
+def _Scalar(kind,values):
+    mask = np.array([i is not None for i in values],dtype=bool)
+    dtype = {"bool":np.bool_,"int":np.int64,"float":np.float64}[kind]
+    data = np.array([i if i is not None else 0 for i in values],dtype=dtype)
+    return data,mask
+
+def _Flatten(dtype,values):
+    'return (data, offsets, ndim, dims) of a column of numeric lists, ndim of None is -1'
+    arrays = [None if i is None else np.asarray(i) for i in values]
+    ndim = np.array([-1 if i is None else i.ndim for i in arrays],dtype=np.int64)
+    dims = np.array([d for i in arrays if i is not None for d in i.shape],dtype=np.int64)
+    sizes = [0 if i is None else i.size for i in arrays]
+    offsets = np.zeros(len(arrays) + 1,dtype=np.int64)
+    offsets[1:] = np.cumsum(sizes)
+    data = np.empty(offsets[-1],dtype=dtype)
+    for i,array in enumerate(arrays):
+        if array is not None:
+            data[offsets[i]:offsets[i+1]] = array.ravel()
+    return data,offsets,ndim,dims
+
+def _Unflatten(data,offsets,ndim,dims):
+    values = []
+    idim = 0
+    for i,n in enumerate(ndim):
+        if n < 0:
+            values.append(None)
+            continue
+        shape = tuple(dims[idim:idim+n])
+        idim += n
+        values.append(data[offsets[i]:offsets[i+1]].reshape(shape).tolist())
+    return values
+
+def _JsonString(value):
+    return json.dumps(value,default=comm.JsonDefault)
+
+def WriteNpz(allresult,filename):
+    examples,columns = ToColumns(allresult)
+    arrays = {"__examples__":np.array(examples,dtype=str)}
+    schema = []
+    for i,(key,kind,dtype,values) in enumerate(columns):
+        name = "c%d" % i
+        schema.append({"key":key,"kind":kind,"name":name})
+        if kind in ["bool","int","float"]:
+            arrays[name+"_values"],arrays[name+"_mask"] = _Scalar(kind,values)
+        elif kind == "str":
+            arrays[name+"_values"] = np.array(["" if v is None else v for v in values],dtype=str)
+            arrays[name+"_mask"] = np.array([v is not None for v in values],dtype=bool)
+        elif kind == "array":
+            data,offsets,ndim,dims = _Flatten(dtype,values)
+            arrays[name+"_data"],arrays[name+"_offsets"],arrays[name+"_ndim"],arrays[name+"_dims"] = data,offsets,ndim,dims
+        else:
+            arrays[name+"_values"] = np.array([_JsonString(v) for v in values],dtype=str)
+    arrays["__schema__"] = np.array(json.dumps({"version":COLUMNAR_VERSION,"columns":schema}))
+    # np.savez will add the extension .npz if filename has no extension
+    with open(filename,"wb") as f1:
+        np.savez(f1,**arrays)
+
+def ReadNpz(filename):
+    with np.load(filename,allow_pickle=False) as npz:
+        schema = json.loads(str(npz["__schema__"]))
+        examples = npz["__examples__"].tolist()
+        columns = []
+        for column in schema["columns"]:
+            name,kind = column["name"],column["kind"]
+            if kind in ["bool","int","float","str"]:
+                values = [v if m else None for v,m in zip(npz[name+"_values"].tolist(),npz[name+"_mask"].tolist())]
+            elif kind == "array":
+                values = _Unflatten(npz[name+"_data"],npz[name+"_offsets"],npz[name+"_ndim"],npz[name+"_dims"])
+            else:
+                values = [json.loads(v) for v in npz[name+"_values"].tolist()]
+            columns.append((column["key"],values))
+    return FromColumns(examples,columns)
+
+def _ImportPyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("pyarrow is required to write/read the parquet file, please install it by: pip install pyarrow")
+    return pyarrow
+
+def WriteParquet(allresult,filename):
+    pa = _ImportPyarrow()
+    examples,columns = ToColumns(allresult)
+    arrays = {"__example__":pa.array(examples,type=pa.string())}
+    schema = []
+    for i,(key,kind,dtype,values) in enumerate(columns):
+        name = "c%d" % i
+        schema.append({"key":key,"kind":kind,"name":name})
+        if kind in ["bool","int","float"]:
+            data,mask = _Scalar(kind,values)
+            arrays[name] = pa.array(data,mask=~mask)
+        elif kind == "str":
+            arrays[name] = pa.array(values,type=pa.string())
+        elif kind == "array":
+            # the list column of arrow is stored as a flat buffer and the offsets
+            data,offsets,ndim,dims = _Flatten(dtype,values)
+            valid = ndim >= 0
+            arrays[name] = pa.LargeListArray.from_arrays(pa.array(offsets),pa.array(data),mask=pa.array(~valid))
+            dims_offsets = np.zeros(len(ndim) + 1,dtype=np.int64)
+            dims_offsets[1:] = np.cumsum(np.where(valid,ndim,0))
+            arrays[name+"_dims"] = pa.LargeListArray.from_arrays(pa.array(dims_offsets),pa.array(dims,type=pa.int64()),mask=pa.array(~valid))
+        else:
+            arrays[name] = pa.array([_JsonString(v) for v in values],type=pa.string())
+    table = pa.table(arrays)
+    table = table.replace_schema_metadata({"abacustest":json.dumps({"version":COLUMNAR_VERSION,"columns":schema})})
+    pa.parquet.write_table(table,filename)
+
+def ReadParquet(filename):
+    pa = _ImportPyarrow()
+    table = pa.parquet.read_table(filename)
+    schema = json.loads(table.schema.metadata[b"abacustest"])
+    examples = table.column("__example__").to_pylist()
+    columns = []
+    for column in schema["columns"]:
+        name,kind = column["name"],column["kind"]
+        if kind in ["bool","int","float","str"]:
+            values = table.column(name).to_pylist()
+        elif kind == "array":
+            values = []
+            for value,dims in zip(table.column(name).to_pylist(),table.column(name+"_dims").to_pylist()):
+                values.append(None if value is None else np.array(value).reshape(dims).tolist())
+        else:
+            values = [json.loads(v) for v in table.column(name).to_pylist()]
+        columns.append((column["key"],values))
+    return FromColumns(examples,columns)
+
+def WriteResults(allresult,filename,sort_keys=False):
+    'write allresult {example: {key: value}} to filename, the format is decided by the extension'
+    fmt = FileFormat(filename)
+    if fmt == "npz":
+        WriteNpz(allresult,filename)
+    elif fmt == "parquet":
+        WriteParquet(allresult,filename)
+    else:
+        with open(filename,"w") as f1:
+            json.dump(allresult,f1,indent=4,sort_keys=sort_keys,default=comm.JsonDefault)
+
+def ReadResults(filename):
+    'read the result file written by WriteResults, and return a dict of {example: {key: value}}'
+    fmt = FileFormat(filename)
+    if fmt == "npz":
+        return ReadNpz(filename)
+    elif fmt == "parquet":
+        return ReadParquet(filename)
+    else:
+        with open(filename) as f1:
+            return json.load(f1)
+
+def ConvertResults(infile,outfile):
+    'convert the result file infile to outfile, such as result.json to result.npz, or result.npz to result.json'
+    WriteResults(ReadResults(infile),outfile)
+
+class JsonlWriter:
+    '''
+    Append the values of each job to a jsonl file as one line: {"path": path, "values": {key: value}}.
+    The file is flushed and fsynced after every sync_every records, and when it is closed.
+    If append is False, the existing file is overwritten, otherwise the new records are appended,
+    and the broken line at the end (the former collection was killed when writing it) is removed.
+    '''
+    def __init__(self,filename,append=False,sync_every=50):
+        self.filename = filename
+        self.sync_every = max(1,sync_every)
+        self.nunsync = 0
+        if append:
+            JsonlIndex(filename,repair=True)
+        self.file = open(filename,"a" if append else "w")
+
+    def Write(self,path,values):
+        self.file.write(json.dumps({"path":path,"values":values},default=comm.JsonDefault) + "\n")
+        self.nunsync += 1
+        if self.nunsync >= self.sync_every:
+            self.Sync()
+
+    def Sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.nunsync = 0
+
+    def Close(self):
+        if not self.file.closed:
+            self.Sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.Close()
+
+def JsonlIndex(filename,repair=False):
+    '''
+    Return a dict of {path: the offset of its last record} of the jsonl file written by JsonlWriter.
+    The broken lines are skipped, and if repair is True, the broken line at the end of file is removed.
+    '''
+    index = {}
+    if not os.path.isfile(filename):
+        return index
+    offset = 0
+    good_end = 0
+    with open(filename,"rb") as f1:
+        for line in f1:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                index[json.loads(line)["path"]] = offset
+                good_end = offset + len(line)
+            except:
+                print("WARNING: skip the broken line at byte %d of %s" % (offset,filename))
+            offset += len(line)
+    if repair and good_end < offset:
+        with open(filename,"r+b") as f1:
+            f1.truncate(good_end)
+    return index
+
+def CompactJsonl(jsonlfile,filename,paths=None):
+    '''
+    Write the records in jsonlfile to the result file filename by the order of paths (default is the order in jsonlfile).
+    If filename is a json file, it is written record by record and is the same as that written by WriteResults.
+    '''
+    index = JsonlIndex(jsonlfile)
+    paths = list(index.keys()) if paths == None else [i for i in paths if i in index]
+    with open(jsonlfile,"rb") as fin:
+        def records():
+            for path in paths:
+                fin.seek(index[path])
+                yield path,json.loads(fin.readline())["values"]
+
+        if FileFormat(filename) != "json":
+            WriteResults(dict(records()),filename)
+            return
+        with open(filename,"w") as f1:
+            # same as json.dump(allresult,f1,indent=4)
+            f1.write("{")
+            for i,(path,values) in enumerate(records()):
+                f1.write(("," if i > 0 else "") + "\n    " + json.dumps(path) + ": " + json.dumps(values,indent=4).replace("\n","\n    "))
+            f1.write("\n}" if len(paths) > 0 else "}")
@@ -1,6 +1,7 @@
-import os,sys,glob,re
+import os,sys,glob,re,itertools
 from ..resultVasp import ResultVasp
 from .. import comm
+import numpy as np
 import xml.etree.ElementTree as ET
 from xml.etree.ElementTree import Element
 
@@ -9,40 +10,45 @@ xfml = comm.XmlFindMultiLayer
 
 class Vasp(ResultVasp):
     
-    @ResultVasp.register(version="the vasp version",
+    @ResultVasp.register(sources=["OUTCARINDEX","XMLPART"],
+                         version="the vasp version",
                          ncore = "mpi cores")
+    @ResultVasp.register_xml("generator")
     def GetGeneralInfo(self):
-        if self.XMLROOT != None:
-            self['version'] = self.XMLROOT.find("./generator/i[@name='version']").text
+        if self.XMLPART != None:
+            self['version'] = self.XMLPART.find("./generator/i[@name='version']").text
         
-        for line in self.OUTCAR:
-            if "running on" in line and "total cores" in line:
+        for i in self.OUTCARINDEX.Find("total cores"):
+            line = self.OUTCAR[i]
+            if "running on" in line:
                 self['ncore'] = int(line.split()[2])
+                break
     
-    @ResultVasp.register(normal_end="if the job is normal ending")
+    @ResultVasp.register(sources=["OUTCARTAIL"],
+                         normal_end="if the job is normal ending")
     def GetNormalEnd(self):
-        if len(self.OUTCAR) == 0:
+        lastlines = self.OUTCARTAIL.LastLines(10)
+        if len(lastlines) == 0:
             self['normal_end'] = None
             return
-        elif len(self.OUTCAR) > 0 and "Voluntary context switches:" in self.OUTCAR[-1]:
+        elif "Voluntary context switches:" in lastlines[-1]:
             self['normal_end'] = True
             return
         else:
             self['normal_end'] = False
 
             print("Job is not normal ending!!! The latest 10 lines is:")
-            if len(self.OUTCAR) < 10:
-                print(''.join(self.OUTCAR))
-            else:
-                print(''.join(self.OUTCAR[-10:]))
+            print(''.join(lastlines))
 
-    @ResultVasp.register(kpt="list, the K POINTS setting",
+    @ResultVasp.register(sources=["XMLPART"],
+                         kpt="list, the K POINTS setting",
                          nkstot = "total K point number",
                          ibzk = "irreducible K point number")
+    @ResultVasp.register_xml("kpoints")
     def GetKPT(self):
-        if self.XMLROOT != None:
+        if self.XMLPART != None:
             tree = "./kpoints/generation/v[@name='divisions']"
-            kpts = self.XMLROOT.find(tree)
+            kpts = self.XMLPART.find(tree)
             if kpts != None:
                 nkstot = 1
                 kpt = []
@@ -56,13 +62,14 @@ class Vasp(ResultVasp):
                 self['nkstot'] = None
 
             tree = "./kpoints/varray[@name='kpointlist']/v"
-            ibzk = self.XMLROOT.findall(tree)
+            ibzk = self.XMLPART.findall(tree)
             if ibzk != None:
                 self['ibzk'] = len(ibzk)
             else:
                 self['ibzk'] = None
 
-    @ResultVasp.register(nbands="number of bands",
+    @ResultVasp.register(sources=["OUTCARINDEX","XMLPART"],
+                         nbands="number of bands",
                          nelec = "total electron number",
                          spin = "the spin number",
                          encut = "eV, the energy cutoff",
@@ -71,37 +78,40 @@ class Vasp(ResultVasp):
                          nelm = "value of NELM, the setted maximum SCF steps",
                          natom = "total atom number",
                          volume = "volume(A^3). if is relax or md, will return the volume of last ION step")
+    @ResultVasp.register_xml("parameters","atominfo","structure")
     def GetInputSetting(self):
-        if self.XMLROOT != None:
+        if self.XMLPART != None:
             tree = ".//separator[@name='electronic']/i[@name='NBANDS']"
-            self['nbands'] = comm.iint(comm.XmlGetText(self.XMLROOT.find(tree)))
+            self['nbands'] = comm.iint(comm.XmlGetText(self.XMLPART.find(tree)))
 
             tree = ".//separator[@name='electronic']/i[@name='NELECT']"
-            self['nelec'] = comm.ifloat(comm.XmlGetText(self.XMLROOT.find(tree)))
+            self['nelec'] = comm.ifloat(comm.XmlGetText(self.XMLPART.find(tree)))
 
             tree = ".//separator[@name='electronic spin']/i[@name='ISPIN']"
-            self['spin'] = comm.iint(comm.XmlGetText(self.XMLROOT.find(tree)))
+            self['spin'] = comm.iint(comm.XmlGetText(self.XMLPART.find(tree)))
             
             tree = ".//separator[@name='electronic']/i[@name='ENMAX']"
-            self['encut'] = comm.ifloat(comm.XmlGetText(self.XMLROOT.find(tree)))
+            self['encut'] = comm.ifloat(comm.XmlGetText(self.XMLPART.find(tree)))
 
             tree = ".//separator[@name='electronic smearing']/i[@name='ISMEAR']"
-            self['ismear'] = comm.iint(comm.XmlGetText(self.XMLROOT.find(tree)))
+            self['ismear'] = comm.iint(comm.XmlGetText(self.XMLPART.find(tree)))
 
             tree = ".//separator[@name='electronic smearing']/i[@name='SIGMA']"
-            self['sigma'] = comm.ifloat(comm.XmlGetText(self.XMLROOT.find(tree)))
+            self['sigma'] = comm.ifloat(comm.XmlGetText(self.XMLPART.find(tree)))
             
             tree = ".//separator[@name='electronic convergence']/i[@name='NELM']"
-            self['nelm'] = comm.iint(comm.XmlGetText(self.XMLROOT.find(tree)))
+            self['nelm'] = comm.iint(comm.XmlGetText(self.XMLPART.find(tree)))
 
             tree = "./atominfo/atoms"
-            self['natom'] = comm.iint(comm.XmlGetText(self.XMLROOT.find(tree)))
+            self['natom'] = comm.iint(comm.XmlGetText(self.XMLPART.find(tree)))
             
             tree = "./structure/crystal/i[@name='volume']"
-            self['volume'] = comm.ifloat(comm.XmlGetText(self.XMLROOT.findall(tree),idx=-1))
+            self['volume'] = comm.ifloat(comm.XmlGetText(self.XMLPART.findall(tree),idx=-1))
             
         else:
-            for line in self.OUTCAR:
+            for i in self.OUTCARINDEX.Lines(["number of bands    NBANDS","number of ions     NIONS =","ISPIN  =","ENCUT  =  ",
+                                             "NELECT =","ISMEAR =","NELM   =","volume of cell"]):
+                line = self.OUTCAR[i]
                 sline = line.split()
                 if "number of bands    NBANDS" in line:
                     self['nbands'] = int(sline[-1])
@@ -121,78 +131,76 @@ class Vasp(ResultVasp):
                 elif "volume of cell" in line:
                     self["volume"] = float(sline[-1])
 
-    @ResultVasp.register(ldautype = "value of LDAUTYPE, the type of plus U",
+    @ResultVasp.register(sources=["OUTCARINDEX"],
+                         ldautype = "value of LDAUTYPE, the type of plus U",
                          ldaul = "list, value of LDAUL, the l-quantum number of each element",
                          ldauu = "list, value of LDAUU, the U setting",
                          ldauj = "list, value of LDAUJ, the J setting")
     def GetLdaUSetting(self):
-        for i,line in enumerate(self.OUTCAR):
-            sline = line.split()
-            if "LDA+U is selected," in line:
-                self['ldautype'] = int(sline[-1])
-                self['ldaul'] = [int(j) for j in self.OUTCAR[i+1].split("=")[-1].split()]
-                self['ldauu'] = [float(j) for j in self.OUTCAR[i+2].split("=")[-1].split()]
-                self['ldauj'] = [float(j) for j in self.OUTCAR[i+3].split("=")[-1].split()]
-                break
+        i = self.OUTCARINDEX.First("LDA+U is selected,")
+        if i != None:
+            self['ldautype'] = int(self.OUTCAR[i].split()[-1])
+            self['ldaul'] = [int(j) for j in self.OUTCAR[i+1].split("=")[-1].split()]
+            self['ldauu'] = [float(j) for j in self.OUTCAR[i+2].split("=")[-1].split()]
+            self['ldauj'] = [float(j) for j in self.OUTCAR[i+3].split("=")[-1].split()]
 
 
-    @ResultVasp.register(scf_steps = 'the steps of SCF, if is relax or md job, only last ION step is read',
+    @ResultVasp.register(depends=["nelm"],sources=["OUTCARINDEX"],
+                         scf_steps = 'the steps of SCF, if is relax or md job, only last ION step is read',
                          converge = "if the SCF is converged. If scf_steps is smaller than NELM, will be converged, else is not converged")
     def GetSCFInfo(self):
-        for i in range(len(self.OUTCAR)):
-            j = -1*i - 1
-            line = self.OUTCAR[j]
-            if 'Iteration' in line:
-                self['scf_steps'] = int(line.split('(')[1].split(')')[0])
-                if self['scf_steps'] < self['nelm']:
-                    self['converge'] = True
-                else:
-                    self['converge'] = False
-                break
+        i = self.OUTCARINDEX.Last('Iteration')
+        if i != None:
+            self['scf_steps'] = int(self.OUTCAR[i].split('(')[1].split(')')[0])
+            if self['scf_steps'] < self['nelm']:
+                self['converge'] = True
+            else:
+                self['converge'] = False
     
-    @ResultVasp.register(energy = 'eV,the total energy, if is relax or md job, will return the energy of last ION step',
+    @ResultVasp.register(depends=["natom"],sources=["OUTCARINDEX"],
+                         energy = 'eV,the total energy, if is relax or md job, will return the energy of last ION step',
                          energy_per_atom = 'eV, the energy divided by natom, if is relax or md job, will return the energy of last ION step')
     def GetEnergy(self):
-        for i in range(len(self.OUTCAR)):
-            line = self.OUTCAR[-i-1]
-            if "energy  without entropy=" in line:
-                self['energy'] = float(line.split()[-4])
-                if self['natom'] != None:
-                    self['energy_per_atom'] = self['energy'] / self['natom']
-                else:
-                    self['energy_per_atom'] = None
-                return
+        i = self.OUTCARINDEX.Last("energy  without entropy=")
+        if i != None:
+            self['energy'] = float(self.OUTCAR[i].split()[-4])
+            if self['natom'] != None:
+                self['energy_per_atom'] = self['energy'] / self['natom']
+            else:
+                self['energy_per_atom'] = None
     
-    @ResultVasp.register(force = 'list, eV/angstrom, the force of all atoms, [atom1x,atom1y,atom1z,atom2x,atom2y,atom2z...]',
+    @ResultVasp.register(sources=["OUTCARINDEX"],
+                         force = 'list, eV/angstrom, the force of all atoms, [atom1x,atom1y,atom1z,atom2x,atom2y,atom2z...]',
                          stress = 'list, kBar, the stress, [xx,xy,xz,yx,yy,yz,zx,zy,zz]',
                          virial='list, eV, the virial, [xx,xy,xz,yx,yy,yz,zx,zy,zz]',)
     def GetForceStress(self):
         force = None
         stress = None
         virial = None
-        for i,line in enumerate(self.OUTCAR):
-            if 'TOTAL-FORCE (eV/Angst)' in line:
-                j = i+2
-                force = []
-                while self.OUTCAR[j][:3] != " --":
-                    force += [float(k) for k in self.OUTCAR[j].split()[3:6]]
-                    j += 1
-            elif '  in kB' in line:
-                s = [float(i) for i in line.split()[2:8]]
-                stress = [s[0],s[3],s[5],s[3],s[1],s[4],s[5],s[4],s[2]]
-                v = [float(i) for i in self.OUTCAR[i-1].split()[1:7]]
-                virial = [v[0],v[3],v[5],v[3],v[1],v[4],v[5],v[4],v[2]]
+        # only the force/stress of the last ION step is converted
+        iforce = self.OUTCARINDEX.Last('TOTAL-FORCE (eV/Angst)')
+        istress = self.OUTCARINDEX.Last('  in kB')
+        if iforce != None:
+            force = comm.ReadBlock(self.OUTCAR,start=iforce+2,stop=" --",columns=range(3,6))
+            force = [] if force is None else force.flatten().tolist()
+        if istress != None:
+            s = [float(i) for i in self.OUTCAR[istress].split()[2:8]]
+            stress = [s[0],s[3],s[5],s[3],s[1],s[4],s[5],s[4],s[2]]
+            v = [float(i) for i in self.OUTCAR[istress-1].split()[1:7]]
+            virial = [v[0],v[3],v[5],v[3],v[1],v[4],v[5],v[4],v[2]]
         self['force'] = force
         self['stress']  = stress
         self['virial'] = virial
         
-    @ResultVasp.register(total_time = 'Total CPU time (s)',
+    @ResultVasp.register(sources=["OUTCARINDEX"],
+                         total_time = 'Total CPU time (s)',
                          scf_time = 'the total SCF times, s',
                          stress_time = 'the time of calculating stress')                         
     def GetTimeInfo(self):
         stresst = None
         scft = 0
-        for line in self.OUTCAR:
+        for i in self.OUTCARINDEX.Lines(['STRESS:  cpu time','LOOP:  cpu time','Total CPU time used (sec):']):
+            line = self.OUTCAR[i]
             if 'STRESS:  cpu time' in line:
                 stresst = float(line.split()[-1])
             elif 'LOOP:  cpu time' in line:
@@ -205,52 +213,55 @@ class Vasp(ResultVasp):
         if scft > 0:
             self['scf_time'] = scft
 
-    @ResultVasp.register(total_mag = 'total magnization',
+    @ResultVasp.register(sources=["OUTCARTAIL"],
+                         total_mag = 'total magnization',
                          atom_mag = 'list, the magnization of each atom')
     def GetMagInfo(self):
-        getatommag = False
-        for i in range(len(self.OUTCAR)):
-            i = -i-1
-            line = self.OUTCAR[i]
-            if line[:19] == " number of electron":
-                self['total_mag'] = float(line.split()[-1])
-                break
-            elif not getatommag and line[:18] == ' magnetization (x)':
-                j = i + 4
-                atommag = []
-                while self.OUTCAR[j][:3] != "---":
-                    atommag.append(float(self.OUTCAR[j].split()[-1]))
-                    j += 1
-                self['atom_mag'] = atommag
-                getatommag = True
+        # only the atom magnetization after the last "number of electron" line is read
+        pos_nelec,_ = self.OUTCARTAIL.FindLast(["\n number of electron"])
+        pos_mag,_ = self.OUTCARTAIL.FindLast(["\n magnetization (x)"])
+        if pos_mag != None and (pos_nelec == None or pos_mag > pos_nelec):
+            atommag = []
+            for line in itertools.islice(self.OUTCARTAIL.LinesFrom(pos_mag),4,None):
+                if line[:3] == "---":
+                    break
+                atommag.append(float(line.split()[-1]))
+            self['atom_mag'] = atommag
+        if pos_nelec != None:
+            self['total_mag'] = float(self.OUTCARTAIL.Lines(pos_nelec,1)[0].split()[-1])
                 
     
-    @ResultVasp.register(atom_name = 'list, the element name of each atom' ,
+    @ResultVasp.register(sources=["XMLPART"],
+                         atom_name = 'list, the element name of each atom' ,
                          atom_type = 'list, the element name of each atomtype',
                          efermi     = 'the fermi energy, eV')
+    @ResultVasp.register_xml("atominfo","calculation/dos/i")
     def GetXMLInfo(self):
-        if self.XMLROOT == None:
+        if self.XMLPART == None:
             return
-        self['atom_name'] = comm.XmlGetText(self.XMLROOT.findall("./atominfo/array[@name='atoms']/set/rc/c[1]"))
-        self['atom_type'] = comm.XmlGetText(self.XMLROOT.findall("./atominfo/array[@name='atomtypes']/set/rc/c[2]"))
-        self['efermi'] = comm.XmlGetText(self.XMLROOT.findall("./calculation/dos/i[@name='efermi'][last()]"),func=float,idx = -1)
+        self['atom_name'] = comm.XmlGetText(self.XMLPART.findall("./atominfo/array[@name='atoms']/set/rc/c[1]"))
+        self['atom_type'] = comm.XmlGetText(self.XMLPART.findall("./atominfo/array[@name='atomtypes']/set/rc/c[2]"))
+        self['efermi'] = comm.XmlGetText(self.XMLPART.findall("./calculation/dos/i[@name='efermi'][last()]"),func=float,idx = -1)
 
-    @ResultVasp.register(band = '[[[]]], list with three dimension spin*kpoint*band')
+    @ResultVasp.register(sources=["XMLPART"],
+                         band = 'numpy array of shape (nspin,nkpoint,nband), the eigenvalues of the last ION step, eV',
+                         band_occupation = 'numpy array of shape (nspin,nkpoint,nband), the occupations of the last ION step')
+    @ResultVasp.register_xml("calculation/eigenvalues",last=True)
     def GetBandInfo(self):
-        if self.XMLROOT != None:
-            band = []
-            eigen = self.XMLROOT.findall('./calculation/eigenvalues/array')
-            if eigen == None:
-                self['band'] = None
-            else:
-                array = eigen[-1]
-                for spin in array.find('set').findall('set'):
-                    band.append([])
-                    for kpoint in spin.findall('set'):
-                        band[-1].append([])
-                        for iband in kpoint.findall('r'):
-                            band[-1][-1].append(float(iband.text.split()[0]))
-                self['band'] = band
+        eigen = [] if self.XMLPART == None else self.XMLPART.findall('./calculation/eigenvalues/array')
+        array = None if len(eigen) == 0 else eigen[-1].find('set')
+        rows = [] if array == None else [i.text for i in array.iter('r')]
+        if len(rows) == 0:
+            self['band'] = None
+            self['band_occupation'] = None
+            return
+        nspin = len(array.findall('set'))
+        nkpt = len(array.find('set').findall('set'))
+        ncol = len(rows[0].split())
+        # convert all values at once, each row is "eigenvalue occupation"
+        values = np.array(" ".join(rows).split(),dtype=np.float64).reshape(nspin,nkpt,-1,ncol)
+        self['band'] = np.ascontiguousarray(values[...,0])
+        self['band_occupation'] = np.ascontiguousarray(values[...,1]) if ncol > 1 else None
 
     '''
     @ResultVasp.register(band_gap = 'eV, the band gap')
@@ -271,47 +282,46 @@ class Vasp(ResultVasp):
             #print("cb=%.5f, vb=%.5f" % (cb,vb))
             self['band_gap'] = None if vb == None or cb == None else vb - cb
     '''
-    @ResultVasp.register(band_gap = 'eV, the band gap')
+    @ResultVasp.register(depends=["band","nelec"],
+                         band_gap = 'eV, the band gap',
+                         vbm = 'eV, the valence band maximum',
+                         cbm = 'eV, the conduction band minimum',
+                         vbm_kpoint = 'the index (start from 0) of the k point of vbm',
+                         cbm_kpoint = 'the index (start from 0) of the k point of cbm',
+                         direct_band_gap = 'eV, the smallest gap at the same k point',
+                         is_direct_gap = 'if vbm and cbm are at the same k point of the same spin',
+                         band_gap_spin = 'list, eV, the band gap of each spin')
     def GetBandGap(self):
-        if self['band'] == None or self['nelec'] == None:
-            self['band_gap'] = None
-        else:
-            occu_band = int(self['nelec'] / 2)
-            band_num = len(self['band'][0][0])
-            if occu_band <= 0:
-                self['band_gap'] = None
-                return
-            if occu_band >= band_num:
-                self['band_gap'] = None
-                return
-             
-            vb = None
-            cb = None
-            for ispin in self['band']:
-                for ik in ispin:
-                    eband1 = ik[occu_band-1]
-                    eband2 = ik[occu_band]
-                    if cb == None or cb < eband1:
-                        cb = eband1
-                    if vb == None or vb > eband2:
-                        vb = eband2 
-            #print("cb=%.5f, vb=%.5f" % (cb,vb))
-            if vb == None or cb == None:
-                self['band_gap'] = None
-                return
-            else:
-                band_gap = vb - cb
-                if band_gap < 0:
-                    band_gap = 0
-                self['band_gap'] = band_gap
-                return
+        band = self['band']
+        occu_band = None if self['nelec'] == None else int(self['nelec'] / 2)
+        if band is None or occu_band == None or occu_band <= 0 or occu_band >= band.shape[2]:
+            for key in ['band_gap','vbm','cbm','vbm_kpoint','cbm_kpoint','direct_band_gap','is_direct_gap','band_gap_spin']:
+                self[key] = None
+            return
+
+        vb = band[:,:,occu_band-1]  # the highest occupied band, shape (nspin,nkpoint)
+        cb = band[:,:,occu_band]    # the lowest unoccupied band
+        ivbm = np.unravel_index(np.argmax(vb),vb.shape)
+        icbm = np.unravel_index(np.argmin(cb),cb.shape)
+        self['vbm'] = float(vb[ivbm])
+        self['cbm'] = float(cb[icbm])
+        self['vbm_kpoint'] = int(ivbm[1])
+        self['cbm_kpoint'] = int(icbm[1])
+        self['band_gap'] = max(float(cb[icbm] - vb[ivbm]),0)
+        self['direct_band_gap'] = max(float((cb - vb).min()),0)
+        # compare both the spin and k point, vbm of spin up and cbm of spin down at the same k point is not a direct gap
+        self['is_direct_gap'] = bool(ivbm == icbm)
+        self['band_gap_spin'] = np.maximum(cb.min(axis=1) - vb.max(axis=1),0).tolist()
     
-    @ResultVasp.register(point_group = 'point group',
+    @ResultVasp.register(sources=["OUTCARINDEX"],
+                         point_group = 'point group',
                          point_group_in_space_group = "point group in space group")
     def GetPointGroup(self):
         pg = None
         pgsg = None
-        for i in self.OUTCAR:
+        for iline in self.OUTCARINDEX.Lines(["The dynamic configuration has the point symmetry",
+                                             " The point group associated with its full space group is"]):
+            i = self.OUTCAR[iline]
             if pg != None and pgsg != None:
                 break
             
@@ -23,7 +23,19 @@ def json2table(jsonfile):
     if not os.path.exists(jsonfile):
         print(f"Error: {jsonfile} does not exist!")
         return []
-    values = json.load(open(jsonfile))
+    return dict2table(json.load(open(jsonfile)))
+
+def columnar2table(resultfile):
+    '''
+    Transform a .npz/.parquet result file of collectdata to a table, same as json2table
+    '''
+    if not os.path.exists(resultfile):
+        print(f"Error: {resultfile} does not exist!")
+        return []
+    from abacustest.lib_collectdata.resultfile import ReadResults
+    return dict2table(ReadResults(resultfile))
+
+def dict2table(values):
     table = []
     metrics = []
     for k,v in values.items():
@@ -76,6 +88,13 @@ def file2table(metricfile):
             traceback.print_exc()
             print(f"Error: transfer {metricfile} to table failed!")
             return None
+    elif filetype in [".npz",".parquet"]:
+        try:
+            table = columnar2table(metricfile)
+        except:
+            traceback.print_exc()
+            print(f"Error: transfer {metricfile} to table failed!")
+            return None
     else:
         print(f"Error: file '{filetype}' of table is not supported!")
         return None
@@ -1,5 +1,5 @@
 import argparse
-from . import abacustest,collectdata,outresult,prepare,report
+from . import abacustest,collectdata,outresult,prepare,report,timediff
 
 def parser():
     my_parser = argparse.ArgumentParser(description="abacustest")
@@ -12,6 +12,7 @@ def parser():
     outresult.OutResultArgs(subparser.add_parser("outresult"))
     prepare.PrepareArgs(subparser.add_parser("prepare"))
     report.ReportArgs(subparser.add_parser("report"))
+    timediff.TimeDiffArgs(subparser.add_parser("timediff"))
     
     return my_parser
     
@@ -30,6 +31,8 @@ def main():
         prepare.PrepareInput(param)
     elif param.command == "report":
         report.Report(param)
+    elif param.command == "timediff":
+        timediff.timediff(param)
     else:
         print(my_parser.parse_args(['-h']))
     
@@ -20,6 +20,15 @@ def GetBakFile(sfile):
         bk = sfile + ".bak%d" % n
     return bk
 
+def FileHash(sfile):
+    '''return the sha1 of the content of sfile'''
+    import hashlib
+    sha1 = hashlib.sha1()
+    with open(sfile,'rb') as f1:
+        for chunk in iter(lambda: f1.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
 def CopyFiles(path1,path2,move = False):
     '''copy the files in path1 to path2'''
     abspath1 = os.path.abspath(path1)
@@ -1,6 +1,6 @@
 import os,glob,json,traceback,sys
-from abacustest.lib_collectdata.collectdata import RESULT
-from abacustest.collectdata import parse_value
+from abacustest.collectdata import Collector,parse_value
+from abacustest.lib_collectdata.resultfile import WriteResults
 
 class Metrics:
     def __init__(self,dft_type="abacus",metrics_name=[],newmethods=[],path=["."],modules=[]):
@@ -15,14 +15,16 @@ class Metrics:
         allvalue = {}
         print("metrics setting (getcwd(), path=, newmethods=, dft_type=, modules=):",os.getcwd(),self.path,self.newmethods,self.dft_type,self.modules)
         print("os.listdir:",os.listdir("."))
+        collector = Collector(fmt=self.dft_type,newmethods=self.newmethods,modules=self.modules,ref="resultREF.json")
+        if len(self.metrics_name) == 0:
+            self.metrics_name = collector.allkeys
         for ipath in self.path:
             for iipath in glob.glob(ipath):
                 try:
                     print("get metrics from:",iipath)
-                    result = RESULT(fmt=self.dft_type,newmethods=self.newmethods,path=iipath,modules=self.modules)
-                    if len(self.metrics_name) == 0:
-                        self.metrics_name = result.AllMethod().keys()
-                    allvalue[iipath] = parse_value(result,self.metrics_name) 
+                    result = collector.result(iipath)
+                    # the context of output files is released once the metrics are collected
+                    allvalue[iipath] = parse_value(result,self.metrics_name,low_memory=True)
                     
                     #write version.dat, this file is used by report section
                     if not os.path.isfile("version.dat"):
@@ -33,7 +35,7 @@ class Metrics:
                 except:
                     traceback.print_exc()
         if save_file != None:
-            json.dump(allvalue,open(save_file,'w'),sort_keys=True,indent=4) 
+            WriteResults(allvalue,save_file,sort_keys=True)
         return allvalue
     
     @staticmethod
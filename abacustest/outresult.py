@@ -1,5 +1,6 @@
 import os,sys,argparse,glob,json,traceback
 import numpy as np
+from .lib_collectdata.resultfile import ReadResults,WriteResults
 
 def CheckFile(ifile):
     if os.path.isfile(ifile):
@@ -519,7 +520,7 @@ def GetAllResults(result_setting):
     result = []
     example_name = []
     for i,iresultf in enumerate(resultf):
-        results = json.load(open(iresultf))
+        results = ReadResults(iresultf)
         result.append([])
         if i==0:
             for k,v in results.items():
@@ -617,6 +618,10 @@ def pandas_out(allresult,savefile = None, report_sample_max = 2,print_result=Tru
                 if len(allresult[i][ikey]) > 0 and isinstance(allresult[i][ikey][0],(list,dict)):
                     allkeys_seperate[-1] = True
                     break
+            elif getattr(allresult[i].get(ikey,None),"ndim",0) > 1:
+                # numpy array with more than one dimension
+                allkeys_seperate[-1] = True
+                break
     nsample = 0    
     for isample in allsamples:
         nsample += 1
@@ -643,7 +648,7 @@ def pandas_out(allresult,savefile = None, report_sample_max = 2,print_result=Tru
                                     savefile_names.append(fname_final)
                             
                 else:
-                    if allresult[isample].get(ikey,None) != None:
+                    if allresult[isample].get(ikey,None) is not None:
                         list_result.append("%s\t%s:\n" % (isample,ikey) + str(allresult[isample].get(ikey,None)))
                         if savefile:
                             fname_final = check_file(sfname+".txt")
@@ -675,9 +680,10 @@ def pandas_out(allresult,savefile = None, report_sample_max = 2,print_result=Tru
 
 def OutResultArgs(parser):  
     parser.description = "This script is used to output the summary of results"
-    parser.add_argument('-r', '--result', type=str, help='the result file from collectdata, should be .json type',action="extend",nargs="*")
+    parser.add_argument('-r', '--result', type=str, help='the result file from collectdata, can be .json/.npz/.parquet type',action="extend",nargs="*")
     parser.add_argument('-p', '--param', type=str, help='the parameter file, should be .json type')
     parser.add_argument('-o', '--output', type=str, help='output the metrics')
+    parser.add_argument('-c', '--convert', type=str, help='write the results read by -r to this file, the format is decided by the extension (.json/.npz/.parquet), such as: -r result.json -c result.npz')
     return parser
 
 def outresult(param):
@@ -689,11 +695,14 @@ def outresult(param):
             for iif in glob.glob(ifile):
                 allfiles.append(iif) 
         for ifile in allfiles:
-            result = json.load(open(ifile))
+            result = ReadResults(ifile)
             for k,v in result.items():
                 key = "%s:%s" % (ifile,k) if len(allfiles) > 1 else k
                 allresult[key] = v
         pandas_out(allresult)
+        if param.convert != None:
+            print("Write the results to %s" % param.convert)
+            WriteResults(allresult,param.convert)
     
     if param.param!= None:
         if not CheckFile(param.param):
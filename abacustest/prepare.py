@@ -1,4 +1,4 @@
-import os,sys,argparse,glob,json,traceback,re,shutil
+import os,sys,argparse,glob,json,traceback,re,shutil,itertools
 import numpy as np
 from typing import Dict, List, Optional, Union
 import copy
@@ -19,7 +19,8 @@ class AbacusStru:
                  lattice_constant:float = 1,
                  magmom: List[float] = None,
                  dpks:str = None,
-                 cartesian: bool = False):    
+                 cartesian: bool = False,
+                 move: List[str] = None):    
         """ABACUS STRU class, the unit is Bohr
 
         Parameters
@@ -48,6 +49,9 @@ class AbacusStru:
             the deepks descriptor file name, by default None
         cartesian : bool, optional
             if the coordinate is cartesian type, default is direct type, by default False
+        move : List[str], optional
+            the settings after the coordinate of each atom, such as the move flags "0 0 1" 
+            or "m 1 1 0 mag 1.0", by default None, and "1 1 1" is written for all atoms
         """        
         #check if label number is equal to pp number and orb number
         assert(len(label) == len(pp))
@@ -55,17 +59,24 @@ class AbacusStru:
             assert(len(label) == len(orb))
         total_atom = np.array(atom_number).sum()
         assert(total_atom == len(coord))
+        if move != None:
+            assert(total_atom == len(move))
         
         self._label = label
         self._atom_number = atom_number
-        self._cell = cell
-        self._coord = coord
+        # cell and coord are stored as contiguous float arrays, and the type index of each atom is
+        # kept, so that the per-atom quantities are got by indexing instead of building lists.
+        self._cell = np.array(cell,dtype=float)
+        self._coord = np.array(coord,dtype=float).reshape(-1,3)
+        self._type_index = np.repeat(np.arange(len(atom_number)),atom_number)
+        self._cache = {}  # the derived arrays, such as the inverse cell and the cartesian coordinates
         self._pp = pp
         self._orb = orb if orb else []
         self._lattice_constant = lattice_constant
         self._dpks = dpks if dpks else None
         self._cartesian = cartesian
         self._magmom = magmom if magmom else []
+        self._move = list(move) if move != None else None
         
         if element != None:
             self._element = element
@@ -86,52 +97,78 @@ class AbacusStru:
     def get_orb(self):
         return self._orb    
 
-    def get_label(self):
+    def get_label(self,array=False):
         '''return the label name of each atom'''
-        label = []
-        for idx,i in enumerate(self._atom_number):
-            label += [self._label[idx]] * i
-        return label
+        label = np.array(self._label)[self._type_index]
+        return label if array else label.tolist()
+    
+    def get_type_index(self):
+        '''return the type index of each atom, which is the index in the label list'''
+        return self._readonly(self._type_index)
     
     def get_dpks(self):
         return self._dpks
     
+    def get_move(self):
+        '''return the settings after the coordinate of each atom, such as the move flags'''
+        return self._move if self._move != None else ["1 1 1"] * len(self._coord)
+    
     def get_mass(self):
         return self._mass
     
-    def get_element(self,number=True):
+    def get_element(self,number=True,array=False):
         '''return the element name of each atom'''
-        element = []
-        for idx,i in enumerate(self._atom_number):
-            element += [self._element[idx]] * i
         if not number:
-            return element
+            element = np.array(self._element)[self._type_index]
         else:
-            return [constant.PERIOD_DICT_NUMBER[i] for i in element]
+            element = np.array([constant.PERIOD_DICT_NUMBER[i] for i in self._element],dtype=int)[self._type_index]
+        return element if array else element.tolist()
     
-    def get_cell(self,bohr = False):
-        "return the cell matrix, in unit of Angstrom"
-        transfer_unit = 1 if bohr else constant.BOHR2A
-        cell = np.array(self._cell) * self._lattice_constant * transfer_unit
-        return cell.tolist()
+    def _readonly(self,value):
+        # return a read-only view, so the stored and cached arrays can not be changed by the caller
+        view = value.view()
+        view.flags.writeable = False
+        return view
     
-    def get_coord(self,bohr = False, direct=False):
-        '''return the coordinate matrix, in cartesian or direct type, in unit of Angstrom or Bohr.
-        If direct is True, then return the direct type coordinate, and bohr will be ignored.'''
-        transfer_unit = 1 if bohr else constant.BOHR2A
+    def _cached(self,key,func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._readonly(self._cache[key])
+    
+    def _inv_cell(self):
+        return self._cached("inv_cell",lambda: np.linalg.inv(self._cell))
+    
+    def _cart_coord(self):
+        # the cartesian coordinates in unit of Bohr
         if self._cartesian:
-            if not direct:
-                coord = np.array(self._coord) * transfer_unit * self._lattice_constant
-                return coord.tolist()
-            else:
-                coord = np.array(self._coord)
-                return coord.dot(np.linalg.inv(np.array(self._cell))).tolist()
+            return self._cached("cart",lambda: self._coord * self._lattice_constant)
+        return self._cached("cart",lambda: self._coord.dot(self._cell) * self._lattice_constant)
+    
+    def _direct_coord(self):
+        if self._cartesian:
+            return self._cached("direct",lambda: self._coord.dot(self._inv_cell()))
+        return self._readonly(self._coord)
+    
+    def get_cell(self,bohr = False,array=False):
+        '''return the cell matrix, in unit of Angstrom.
+        If array is True, return a read-only numpy array, else return a list'''
+        if bohr:
+            cell = self._cached("cell_bohr",lambda: self._cell * self._lattice_constant)
         else:
-            if not direct:
-                coord = np.array(self._coord) * transfer_unit * self._lattice_constant
-                return coord.dot(np.array(self._cell)).tolist()
-            else:
-                return self._coord
+            cell = self._cached("cell_angstrom",lambda: self._cell * self._lattice_constant * constant.BOHR2A)
+        return cell if array else cell.tolist()
+    
+    def get_coord(self,bohr = False, direct=False, array=False):
+        '''return the coordinate matrix, in cartesian or direct type, in unit of Angstrom or Bohr.
+        If direct is True, then return the direct type coordinate, and bohr will be ignored.
+        If array is True, return a read-only numpy array, else return a list'''
+        if direct:
+            coord = self._direct_coord()
+        elif bohr:
+            coord = self._cart_coord()
+        else:
+            coord = self._cached("cart_angstrom",lambda: self._cart_coord() * constant.BOHR2A)
+        return coord if array else coord.tolist()
     
     def set_pp(self,pplist):
         self._pp = pplist
@@ -175,50 +212,66 @@ class AbacusStru:
             cc += "Cartesian\n"
         else:
             cc += "Direct\n"
+        # the coordinates of each type are formatted by one operation, and all parts are joined at the end
+        ccs = [cc]
+        coord = self._coord
         icoord = 0
         for i,ilabel in enumerate(self._label):
-            cc += "\n%s\n%f\n%d\n" % (ilabel,self._magmom[i],self._atom_number[i])
-            for j in range(self._atom_number[i]):
-                cc += "%17.11f %17.11f %17.11f 1 1 1\n" % tuple(self._coord[icoord + j])
-            icoord += self._atom_number[i]
+            natom = self._atom_number[i]
+            ccs.append("\n%s\n%f\n%d\n" % (ilabel,self._magmom[i],natom))
+            if self._move == None:
+                ccs.append("%17.11f %17.11f %17.11f 1 1 1\n" * natom % tuple(coord[icoord:icoord + natom].ravel().tolist()))
+            else:
+                # the setting of each atom is formatted as the 4th column
+                values = np.empty((natom,4),dtype=object)
+                values[:,:3] = coord[icoord:icoord + natom]
+                values[:,3] = self._move[icoord:icoord + natom]
+                ccs.append("%17.11f %17.11f %17.11f %s\n" * natom % tuple(values.ravel().tolist()))
+            icoord += natom
         
         #write dpks
         if self._dpks:
-            cc += "\nNUMERICAL_DESCRIPTOR\n"
-            cc += self._dpks    
+            ccs.append("\nNUMERICAL_DESCRIPTOR\n")
+            ccs.append(self._dpks)
 
-        Path(struf).write_text(cc)
+        Path(struf).write_text("".join(ccs))
 
     @staticmethod
     def ReadStru(stru:str = "STRU"):
         "read the label, pp, orb, cell, coord, deepks-descriptor"
-        def get_block(keyname):
-            block = []
-            for i,line in enumerate(lines):
-                if line.strip() == "": continue
-                elif line.split('#')[0].strip() == keyname:
-                    for ij in range(i+1,len(lines)):
-                        if lines[ij].strip() == "" or \
-                            lines[ij].strip()[0] in ["#"] or\
-                            ("//" in lines[ij] and lines[ij].strip()[:2] in ["//"]): continue
-                        elif lines[ij].strip() in constant.ABACUS_STRU_KEY_WORD:
-                            return block
-                        else:
-                            block.append(lines[ij].split("#")[0].split("//")[0].strip())
-                    return block
-            return None
+        def get_blocks(lines):
+            # read all blocks by one pass, return a dict of keyname: the lines of the block.
+            # A block starts after the first line of its keyname, and ends before the next line of keyword.
+            blocks = {}
+            opened = []
+            keywords = set(constant.ABACUS_STRU_KEY_WORD)
+            for line in lines:
+                sline = line.strip()
+                if sline == "" or sline[0] == "#" or sline[:2] == "//":
+                    continue
+                keyname = sline.split("#")[0].rstrip() if "#" in sline else sline
+                if sline in keywords:
+                    opened = []
+                else:
+                    value = keyname.split("//")[0].strip() if "//" in keyname else keyname
+                    for block in opened:
+                        block.append(value)
+                if keyname in keywords and keyname not in blocks:
+                    blocks[keyname] = []
+                    opened.append(blocks[keyname])
+            return blocks
         
         if not os.path.isfile(stru):
             return None
 
-        with open(stru) as f1: lines = f1.readlines()  
+        with open(stru) as f1: blocks = get_blocks(f1)
 
-        atomic_species = get_block("ATOMIC_SPECIES")
-        numerical_orbital = get_block("NUMERICAL_ORBITAL")
-        lattice_constant = get_block("LATTICE_CONSTANT")
-        lattice_vector = get_block("LATTICE_VECTORS")
-        atom_positions = get_block("ATOMIC_POSITIONS")
-        dpks = get_block("NUMERICAL_DESCRIPTOR")
+        atomic_species = blocks.get("ATOMIC_SPECIES")
+        numerical_orbital = blocks.get("NUMERICAL_ORBITAL")
+        lattice_constant = blocks.get("LATTICE_CONSTANT")
+        lattice_vector = blocks.get("LATTICE_VECTORS")
+        atom_positions = blocks.get("ATOMIC_POSITIONS")
+        dpks = blocks.get("NUMERICAL_DESCRIPTOR")
         lattice_constant = 1.0 if lattice_constant == None else float(lattice_constant[0].split()[0]) 
         dpks = None if dpks == None else dpks[0].strip()
         
@@ -251,7 +304,7 @@ class AbacusStru:
 
         #read coordinate and coordinate type and atom number of each type
         atom_number = []
-        coords = []
+        coord_lines = []
         magmom = []
         coord_type = atom_positions[0].split("#")[0].strip().lower()
         if coord_type.startswith("dire"):
@@ -270,9 +323,13 @@ class AbacusStru:
             magmom.append(float(atom_positions[i+1].split()[0]))
             atom_number.append(int(atom_positions[i+2].split()[0]))
             i += 3
-            for j in range(atom_number[-1]):
-                coords.append([float(k) for k in atom_positions[i+j].split()[:3]])
+            coord_lines += atom_positions[i:i+atom_number[-1]]
             i += atom_number[-1]
+        # all coordinates are converted at once, and the move flags and other settings after x y z are kept
+        coords = np.loadtxt(coord_lines,usecols=(0,1,2),ndmin=2) if coord_lines else np.zeros((0,3))
+        move = [" ".join(line.split()[3:]) or "1 1 1" for line in coord_lines]
+        if all(i == "1 1 1" for i in move):
+            move = None
         
         return AbacusStru(label=labels,
                           atom_number=atom_number,
@@ -283,9 +340,47 @@ class AbacusStru:
                           lattice_constant=lattice_constant,
                           magmom=magmom,
                           dpks=dpks,
-                          cartesian=cartesian)
+                          cartesian=cartesian,
+                          move=move)
     
         
+class InputSweep:
+    """The combinations of INPUT settings, which are generated on demand instead of stored.
+
+    Each combination is a dict of the invariant settings plus one value of each swept parameter.
+    The first swept parameter changes fastest, which is the order of the former full list, so the
+    i-th combination can be calculated directly by len(sweep) and sweep[i].
+    """
+    def __init__(self, input_constant: Dict[str,any], list_param: Dict[str,List[any]]):
+        self.input_constant = input_constant
+        self.list_param = list_param
+        
+    def keys(self):
+        "the names of the swept parameters"
+        return list(self.list_param.keys())
+
+    def __len__(self):
+        n = 1
+        for v in self.list_param.values():
+            n *= len(v)
+        return n
+    
+    def __getitem__(self, index: int) -> Dict[str,any]:
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("InputSweep index out of range")
+        iinput = copy.deepcopy(self.input_constant)
+        for k,v in self.list_param.items():
+            iinput[k] = copy.deepcopy(v[index % len(v)])
+            index //= len(v)
+        return iinput
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
 class PrepareAbacus:
     def __init__(self,
                  save_path: str = Path("."),
@@ -400,6 +495,7 @@ class PrepareAbacus:
         
         self.bak_file = bak_file
         self.no_link = no_link
+        self._file_size = {}  # the size of the source files, is used in the summary of staging
         
         # when read the template file, will check if the template file folder is same with save_path
         # if same and final structures only one, then will not bak the template folder
@@ -492,7 +588,6 @@ class PrepareAbacus:
             print("Not find orb dir: %s" % self.orb_path)
 
     def Construct_input_list(self):
-        all_inputs = []
         inputf = None
         if self.example_template != None:
             if os.path.isfile(os.path.join(self.example_template,"INPUT")):
@@ -509,6 +604,7 @@ class PrepareAbacus:
             input_constant = PrepareAbacus.ReadInput(inputf)
         
         list_param = {}
+        empty_param = []  # the parameters with an empty list, are removed from INPUT
         input_constant_common = {}
         for k,v in self.mix_input.items():
             #if value is list type, then we need prepare INPUT for each value
@@ -518,7 +614,12 @@ class PrepareAbacus:
                 input_constant[k] = v
                 input_constant_common[k] = v
             elif isinstance(v,list):
-                if len(v) == 1:
+                if len(v) == 0:
+                    print("WARNING: value of '%s' is an empty list, will not add to INPUT" % k)
+                    empty_param.append(k)
+                    if k in input_constant:
+                        del input_constant[k]
+                elif len(v) == 1:
                     input_constant[k] = v[0]
                     input_constant_common[k] = v[0]
                 else:    
@@ -530,22 +631,10 @@ class PrepareAbacus:
                 input_constant[k] = v
         print("Invariant INPUT setting:",str(input_constant))
 
-        all_inputs.append(input_constant)
-        for k,v in list_param.items():
-            for i,iv in enumerate(v):
-                if i == 0:
-                    #if v only one value, add in all_inputs directly
-                    for iinput in all_inputs:
-                        iinput[k] = iv   
-                else:
-                    #if v has more than two values, deepcopy all_inputs and modify v, and then add to all_inputs
-                    if i == 1:  
-                        tmp_inputs = copy.deepcopy(all_inputs)
-                    for iinput in tmp_inputs:
-                        iinput[k] = iv
-                    all_inputs += copy.deepcopy(tmp_inputs)
-        
-        return all_inputs,[i for i in list_param.keys()]
+        # the combinations are not created here, but generated when they are used
+        all_inputs = InputSweep(input_constant,list_param)
+        print("Number of INPUT settings: %d" % len(all_inputs))
+        return all_inputs,all_inputs.keys() + empty_param
 
     def Construct_kpt_list(self):
         """
@@ -622,197 +711,282 @@ class PrepareAbacus:
         print(f"STRU: {template_file}")
         return all_stru
     
-    def prepare(self):
-        "Return a dict, and the key is the path of inputs,"
-        "and the value is list of structure, kpt, and input setting information."
-        "The input setting information is a dict of param name and value"
+    def CheckStru(self,istru):
+        """Read the STRU file, and find the pp/orb/dpks files of it.
+        Return (stru_data, linkstru, manifest), or None if the structure should be skipped.
+        stru_data has been set with the new pp/orb/dpks file names, linkstru is True if the 
+        STRU file can be linked directly, and manifest is the files that will be linked, see FileManifest.
+        The files defined in STRU are relative to the folder of STRU, and the current path is not changed."""
+        stru_data = AbacusStru.ReadStru(istru)
+        stru_path = os.path.split(istru)[0]
+        if stru_path == "": stru_path = os.getcwd()
+        # the labels of the types that have atoms, and the type index of atoms is in the order of types
+        first_atom = np.unique(stru_data.get_type_index(),return_index=True)[1]
+        labels = stru_data.get_label(array=True)[first_atom].tolist()
+        linkstru = True
+        skipstru = False
+        allfiles = list(self.extra_files)  #files that will be linked, only for this structure
+        pp_list = []   #pp file name
+        orb_list = []  #orb file name
+        dpks = None    #dpks file name
+        for i,ilabel in enumerate(labels):
+            #check pp file 
+            if ilabel not in self.pp_dict:
+                #print("label '%s' is found in '%s', but not defined in pp_dict." % (ilabel,istru))
+                pp_in_stru = stru_data.get_pp()[i]
+                if os.path.isfile(os.path.join(stru_path,pp_in_stru)):
+                    print("label '%s': link the pseudopotential file '%s' defined in %s" % (ilabel,pp_in_stru,istru))
+                    pp_list.append(os.path.split(pp_in_stru)[1])
+                    allfiles.append(os.path.abspath(os.path.join(stru_path,pp_in_stru)))
+                else:
+                    print("label '%s': the pseudopotential file '%s' defined in %s is not found, skip this structure" % (ilabel,pp_in_stru,istru))
+                    skipstru = True
+                    break
+            else:
+                pp_list.append(os.path.split(self.pp_dict[ilabel])[1])  #only store the file name to pp_list
+                allfiles.append(self.pp_dict[ilabel]) #store the whole pp file to allfiles                    
+            if not stru_data.get_pp() or pp_list[-1] != stru_data.get_pp()[i]:
+                linkstru = False
 
-        if not self.stru_list:
-            print("No stru files, skip!!!")
+            #check orbital file    
+            if ilabel not in self.orb_dict:
+                if stru_data.get_orb():
+                    #print("label '%s' is found in '%s', but not defined in orb_dict." % (ilabel,istru))
+                    orb_in_stru = stru_data.get_orb()[i]
+                    if os.path.isfile(os.path.join(stru_path,orb_in_stru)):
+                        print("label '%s': link the orb file '%s' defined in %s" % (ilabel,orb_in_stru,istru))
+                        orb_list.append(os.path.split(orb_in_stru)[1])
+                        allfiles.append(os.path.abspath(os.path.join(stru_path,orb_in_stru)))
+                        if orb_list[-1] != stru_data.get_orb()[i]:  
+                            linkstru = False
+                    else:
+                        print("label '%s': the orbital file '%s' defined in %s is not found." % (ilabel,orb_in_stru,istru))
+            else:
+                orb_list.append(os.path.split(self.orb_dict[ilabel])[1]) 
+                allfiles.append(self.orb_dict[ilabel])
+                if not stru_data.get_orb() or orb_list[-1] != stru_data.get_orb()[i]:  
+                    linkstru = False
+
+        if skipstru:
             return None
-        
+
+        #check dpks 
+        if self.dpks_descriptor:
+            if os.path.isfile(self.dpks_descriptor):
+                dpks = os.path.split(self.dpks_descriptor)[1]
+                allfiles.append(self.dpks_descriptor)
+            else:
+                print("Error: Can not find file %s, skip the prepare of dpks_descriptor" % self.dpks_descriptor)
+                dpks = None
+        else:
+            dpks = stru_data.get_dpks()
+            if dpks:
+                if os.path.isfile(os.path.join(stru_path,dpks)):
+                    allfiles.append(os.path.abspath(os.path.join(stru_path,dpks)))
+                    dpks = os.path.split(dpks)[1]
+                else:
+                    print("Error: deepks descriptor is defined in %s/STRU, but can not find the file, skip the prepare" % stru_path)
+                    dpks = None
+            else:
+                dpks = None
+        if dpks != stru_data.get_dpks():
+            linkstru = False
+
+        #stru_data will be writen in new folder
+        stru_data.set_pp(pp_list)
+        stru_data.set_orb(orb_list)
+        stru_data.set_dpks(dpks)
+
+        return stru_data,linkstru,self.FileManifest(allfiles)
+    
+    def FileManifest(self,files):
+        """Return {file name in the job folder: absolute path of the source file} of the files.
+        A file listed several times is staged once. If different files have the same name, 
+        the latter one is used, and a warning is printed if their contents are different.
+        Files with different names are always staged, even if their contents are same, since 
+        each name may be used by STRU or INPUT."""
+        manifest = {}
+        for ifile in files:
+            ifile = os.path.abspath(ifile)
+            filename = os.path.split(ifile)[1]
+            if filename in manifest and manifest[filename] != ifile:
+                if os.path.realpath(manifest[filename]) == os.path.realpath(ifile) or \
+                    comm.FileHash(manifest[filename]) == comm.FileHash(ifile):
+                    continue
+                print("WARNING: %s and %s have the same name, use the latter one" % (manifest[filename],ifile))
+            manifest[filename] = ifile
+        return manifest
+    
+    def FileSize(self,filename):
+        "the size of a source file, each file is only checked once"
+        if filename not in self._file_size:
+            self._file_size[filename] = os.path.getsize(filename)
+        return self._file_size[filename]
+    
+    def Jobs(self):
+        """A generator of all the inputs to be prepared, in the order of STRU, KPT and INPUT.
+        Yield (save_path, istru, stru_setting, ikpt, input_index), where stru_setting is the return of CheckStru,
+        and input_index is the index in self.input_list. The INPUT settings are not created here,
+        so that the jobs can be listed and selected without creating all of them."""
         if not self.kpt_list:
             print("WARNING: not set KPT")
             kpt_list = [None]
         else:
             kpt_list = self.kpt_list
         
-        if not self.input_list:
-            input_list = [None]
-        else:
-            input_list = self.input_list 
-                   
+        ninput = len(self.input_list) if self.input_list else 0
+        input_index = list(range(ninput)) if ninput > 0 else [None]
+        
         ipath = -1
-        param_setting = {}
-        cwd = os.getcwd()
-        stru_num = len(self.stru_list) * len(kpt_list) * len(input_list)
+        stru_num = len(self.stru_list) * len(kpt_list) * len(input_index)
         for istru in self.stru_list:  #iteration of STRU
-            stru_data = AbacusStru.ReadStru(istru)
-            stru_path = os.path.split(istru)[0]
-            if stru_path == "": stru_path = os.getcwd()
-            labels = []
-            for ilabel in stru_data.get_label():
-                if ilabel not in labels:
-                    labels.append(ilabel)
-            linkstru = True
-            skipstru = False
-            allfiles = self.extra_files  #files that will be linked
-            pp_list = []   #pp file name
-            orb_list = []  #orb file name
-            dpks = None    #dpks file name
-            for i,ilabel in enumerate(labels):
-                #check pp file 
-                if ilabel not in self.pp_dict:
-                    #print("label '%s' is found in '%s', but not defined in pp_dict." % (ilabel,istru))
-                    os.chdir(stru_path)
-                    pp_in_stru = stru_data.get_pp()[i]
-                    if os.path.isfile(pp_in_stru):
-                        print("label '%s': link the pseudopotential file '%s' defined in %s" % (ilabel,pp_in_stru,istru))
-                        pp_list.append(os.path.split(pp_in_stru)[1])
-                        allfiles.append(os.path.abspath(pp_in_stru))
-                    else:
-                        print("label '%s': the pseudopotential file '%s' defined in %s is not found, skip this structure" % (ilabel,pp_in_stru,istru))
-                        skipstru = True
-                        os.chdir(cwd)
-                        break
-                    os.chdir(cwd)
-                else:
-                    pp_list.append(os.path.split(self.pp_dict[ilabel])[1])  #only store the file name to pp_list
-                    allfiles.append(self.pp_dict[ilabel]) #store the whole pp file to allfiles                    
-                if not stru_data.get_pp() or pp_list[-1] != stru_data.get_pp()[i]:
-                    linkstru = False
-
-                #check orbital file    
-                if ilabel not in self.orb_dict:
-                    if stru_data.get_orb():
-                        #print("label '%s' is found in '%s', but not defined in orb_dict." % (ilabel,istru))
-                        os.chdir(stru_path)
-                        orb_in_stru = stru_data.get_orb()[i]
-                        if os.path.isfile(orb_in_stru):
-                            print("label '%s': link the orb file '%s' defined in %s" % (ilabel,orb_in_stru,istru))
-                            orb_list.append(os.path.split(orb_in_stru)[1])
-                            allfiles.append(os.path.abspath(orb_in_stru))
-                            if orb_list[-1] != stru_data.get_orb()[i]:  
-                                linkstru = False
-                        else:
-                            print("label '%s': the orbital file '%s' defined in %s is not found." % (ilabel,orb_in_stru,istru))
-                        os.chdir(cwd)
-                else:
-                    orb_list.append(os.path.split(self.orb_dict[ilabel])[1]) 
-                    allfiles.append(self.orb_dict[ilabel])
-                    if not stru_data.get_orb() or orb_list[-1] != stru_data.get_orb()[i]:  
-                        linkstru = False
-
-            if skipstru:
+            stru_setting = self.CheckStru(istru)
+            if stru_setting == None:
                 continue
-            
-            #check dpks 
-            if self.dpks_descriptor:
-                if os.path.isfile(self.dpks_descriptor):
-                    dpks = os.path.split(self.dpks_descriptor)[1]
-                    allfiles.append(self.dpks_descriptor)
-                else:
-                    print("Error: Can not find file %s, skip the prepare of dpks_descriptor" % self.dpks_descriptor)
-                    dpks = None
-            else:
-                os.chdir(stru_path)
-                dpks = stru_data.get_dpks()
-                if dpks:
-                    if os.path.isfile(dpks):
-                        allfiles.append(os.path.abspath(dpks))
-                        dpks = os.path.split(dpks)[1]
-                    else:
-                        print("Error: deepks descriptor is defined in %s/STRU, but can not find the file, skip the prepare" % stru_path)
-                        dpks = None
-                else:
-                    dpks = None
-                os.chdir(cwd)
-            if dpks != stru_data.get_dpks():
-                linkstru = False
-
-            #stru_data will be writen in new folder
-            stru_data.set_pp(pp_list)
-            stru_data.set_orb(orb_list)
-            stru_data.set_dpks(dpks)
-            
             for ikpt in kpt_list:  #iteration of KPT 
-                for iinput in input_list: #iteration of INPUT
+                for iinput in input_index: #iteration of INPUT
                     ipath += 1
-                    #create folder
-                    #if not has_create_savepath:
-                    #    if os.path.isdir(self.save_path):
-                    #        bk = comm.GetBakFile(self.save_path)
-                    #        shutil.move(self.save_path,bk)
-                    #    has_create_savepath = True
-                    
                     # if only one stru, then do not create subfolder
                     if stru_num > 1:
                         save_path = os.path.join(self.save_path,str(ipath).zfill(5))
                     else:
                         save_path = self.save_path
-                    
-                    if os.path.isdir(save_path) and \
-                        (not Path(save_path).samefile(cwd)) and \
-                        (self.bak_file) and \
-                        (not self.template_is_save_path):
-                            bk = comm.GetBakFile(save_path)
-                            shutil.move(save_path,bk)
-                            
-                    if not os.path.isdir(save_path):
-                        os.makedirs(save_path)   
-
-                    #store the param setting and path
-                    param_setting[save_path] = [os.path.relpath(istru, cwd),ikpt,{}]
-                    for input_param in self.input_mix_param:
-                        param_setting[save_path][-1][input_param] = iinput.get(input_param)
-                    
-                    #create INPUT   
-                    if iinput != None: 
-                        PrepareAbacus.WriteInput(iinput,os.path.join(save_path,"INPUT"))
-                    
-                    #create KPT
-                    if ikpt != None:
-                        kptf = os.path.join(save_path,"KPT")
-                        if isinstance(ikpt,str):
-                            if os.path.isfile(kptf) and (not Path(ikpt).samefile(Path(kptf))):
-                                os.unlink(kptf)
-                            
-                            if not os.path.isfile(kptf):
-                                if self.no_link:
-                                    shutil.copy(os.path.abspath(ikpt),kptf)
-                                else:
-                                    os.symlink(os.path.abspath(ikpt),kptf)
-                        elif isinstance(ikpt,list):
-                            PrepareAbacus.WriteKpt(ikpt,kptf)
-                    
-                    #create STRU
-                    struf = os.path.join(os.path.join(save_path,"STRU"))
-                    if linkstru:
-                        if os.path.isfile(struf) and (not Path(istru).samefile(Path(struf))):
-                            os.unlink(struf)
-                                
-                        if not os.path.isfile(struf):
-                            if self.no_link:
-                                shutil.copy(os.path.abspath(istru),struf)
-                            else:
-                                os.symlink(os.path.abspath(istru),struf)
-                    else:
-                        stru_data.write(struf)
-                    
-                    #link other files
-                    for ifile in allfiles:
-                        ifile = os.path.abspath(ifile)
-                        filename = os.path.split(ifile)[1]
-                        target_file = os.path.join(save_path,filename)
-                        if os.path.isfile(target_file) and not Path(ifile).samefile(Path(target_file)):
-                            os.unlink(target_file)
-                        if not os.path.isfile(target_file):
-                            if self.no_link:
-                                shutil.copy(ifile,target_file)
-                            else:
-                                os.symlink(ifile,target_file)         
-        
+                    yield save_path,istru,stru_setting,ikpt,iinput
+    
+    def Tasks(self,shard=None,counter=None):
+        """Return the list of jobs to be prepared, each is a tuple yielded by Jobs.
+        shard = (i, n) means only the i-th (start from 0) of n parts are returned, where the j-th input 
+        belongs to the part j % n. counter is an iterator of the global index of inputs, 
+        which can be shared by several PrepareAbacus to split the inputs of all of them."""
+        if counter == None:
+            counter = itertools.count()
+        tasks = []
+        for task in self.Jobs():
+            if shard != None and next(counter) % shard[1] != shard[0]:
+                continue
+            tasks.append(task)
+        return tasks
+    
+    def ParamSetting(self,tasks):
+        """Return a dict, and the key is the path of inputs,
+        and the value is list of structure, kpt, and input setting information.
+        The input setting information is a dict of param name and value"""
+        param_setting = {}
+        cwd = os.getcwd()
+        for save_path,istru,stru_setting,ikpt,input_index in tasks:
+            param_setting[save_path] = [os.path.relpath(istru, cwd),ikpt,{}]
+            if input_index != None:
+                iinput = self.input_list[input_index]
+                for input_param in self.input_mix_param:
+                    param_setting[save_path][-1][input_param] = iinput.get(input_param)
         return param_setting
+    
+    def PrepareTask(self,task):
+        "prepare one job of Tasks, and return the summary of staging, see PrepareJob"
+        save_path,istru,stru_setting,ikpt,input_index = task
+        iinput = None if input_index == None else self.input_list[input_index]
+        return self.PrepareJob(save_path,istru,stru_setting,ikpt,iinput)
+    
+    def prepare(self,plan=False,shard=None,counter=None,nproc=1,tasks=None):
+        """Return a dict, and the key is the path of inputs,
+        and the value is list of structure, kpt, and input setting information.
+        The input setting information is a dict of param name and value.
+        
+        If plan is True, only return the dict and do not create any file.
+        shard and counter are used to select the inputs, see Tasks. 
+        nproc is the number of threads to create the inputs.
+        If tasks is a list, (self, task) of each selected input is appended to it, which can be 
+        prepared later by RunPrepareTasks together with the inputs of other PrepareAbacus."""
+        if not self.stru_list:
+            print("No stru files, skip!!!")
+            return None
+        
+        my_tasks = self.Tasks(shard,counter)
+        if tasks != None:
+            tasks += [(self,task) for task in my_tasks]
+        if not plan:
+            RunPrepareTasks([(self,task) for task in my_tasks],nproc)
+        return self.ParamSetting(my_tasks)
+    
+    def PrepareJob(self,save_path,istru,stru_setting,ikpt,iinput):
+        """Create the INPUT, KPT, STRU and link the other files in save_path.
+        Return a summary of the staging: {"path", "written", "links", "copies", "written_bytes", "linked_bytes", "copied_bytes"},
+        where written are the files created by abacustest, and the bytes of links are the size of the source files."""
+        stru_data,linkstru,stru_manifest = stru_setting
+        cwd = os.getcwd()
+        if os.path.isdir(save_path) and \
+            (not Path(save_path).samefile(cwd)) and \
+            (self.bak_file) and \
+            (not self.template_is_save_path):
+                bk = comm.GetBakFile(save_path)
+                shutil.move(save_path,bk)
+
+        if not os.path.isdir(save_path):
+            os.makedirs(save_path)   
+
+        # the files to be linked (or copied) in this job, the files of structure can replace KPT and STRU as before
+        manifest = {}
+        written = []
+        
+        #create INPUT   
+        if iinput != None: 
+            PrepareAbacus.WriteInput(iinput,os.path.join(save_path,"INPUT"))
+            written.append("INPUT")
+
+        #create KPT
+        if ikpt != None:
+            if isinstance(ikpt,str):
+                manifest["KPT"] = os.path.abspath(ikpt)
+            elif isinstance(ikpt,list):
+                PrepareAbacus.WriteKpt(ikpt,os.path.join(save_path,"KPT"))
+                written.append("KPT")
+
+        #create STRU
+        if linkstru:
+            manifest["STRU"] = os.path.abspath(istru)
+        else:
+            stru_data.write(os.path.join(save_path,"STRU"))
+            written.append("STRU")
+        
+        #link other files
+        manifest.update(stru_manifest)
+        links,copies = self.StageFiles(manifest,save_path)
+        
+        return {"path": save_path,
+                "written": len(written),
+                "links": len(links),
+                "copies": len(copies),
+                "written_bytes": sum([os.path.getsize(os.path.join(save_path,i)) for i in written]),
+                "linked_bytes": sum([self.FileSize(manifest[i]) for i in links]),
+                "copied_bytes": sum([self.FileSize(manifest[i]) for i in copies])}
+    
+    def StageFiles(self,manifest,save_path):
+        """Link (or copy if no_link) the files in manifest to save_path by one pass.
+        The existing entries of save_path are listed once, and the target that is already the source file is kept.
+        Return the file names that are linked and copied."""
+        existing = {}
+        with os.scandir(save_path) as entries:
+            for entry in entries:
+                existing[entry.name] = entry
+        links = []
+        copies = []
+        for filename,ifile in manifest.items():
+            target_file = os.path.join(save_path,filename)
+            if filename in existing:
+                entry = existing[filename]
+                if not (entry.is_file() or entry.is_symlink()):
+                    print("WARNING: %s exists and is not a file, skip it" % target_file)
+                    continue
+                if entry.is_file() and os.path.samefile(ifile,target_file):
+                    continue
+                os.unlink(target_file)
+            if self.no_link:
+                shutil.copy(ifile,target_file)
+                copies.append(filename)
+            else:
+                os.symlink(ifile,target_file)
+                links.append(filename)
+        return links,copies
 
     @staticmethod
     def WriteKpt(kpoint_list:List = [1,1,1,0,0,0],file_name:str = "KPT"):
@@ -947,6 +1121,31 @@ def CheckExample(example_path,description:str=""):
     os.chdir(cwd)
     return allpass 
 
+def _prepare_task(args):
+    prepareabacus,task = args
+    return prepareabacus.PrepareTask(task)
+
+def RunPrepareTasks(tasks,nproc=1):
+    """Prepare the tasks, which is a list of (PrepareAbacus, task), and task is an element of PrepareAbacus.Tasks.
+    If nproc > 1, the tasks are prepared by a pool of nproc threads. Each task only writes files in its own folder,
+    and the current path is not changed, so the result is same as preparing them one by one.
+    Return the list of the staging summary of each task, see PrepareAbacus.PrepareJob."""
+    if nproc > 1 and len(tasks) > 1:
+        from multiprocessing.pool import ThreadPool
+        chunksize = max(1,len(tasks) // (nproc * 4))
+        print("Prepare %d inputs by %d threads" % (len(tasks),nproc))
+        with ThreadPool(nproc) as pool:
+            return list(pool.imap(_prepare_task,tasks,chunksize=chunksize))
+    else:
+        return [_prepare_task(task) for task in tasks]
+
+def StagingSummary(summaries):
+    "sum up the staging summary of all jobs"
+    total = {"jobs": len(summaries)}
+    for key in ["written","links","copies","written_bytes","linked_bytes","copied_bytes"]:
+        total[key] = sum([i[key] for i in summaries])
+    return total
+
 def CommPath(pathlist):
     "return (commpath pathlist_without_commpath)"
     if len(pathlist) == 0:
@@ -958,7 +1157,8 @@ def CommPath(pathlist):
         length = 0
     return commpath,[i[length:] for i in pathlist]
 
-def DoPrepare(param_setting: Dict[str, any], save_folder: str, no_link: bool = False) -> List[Dict[str, dict]]:  
+def DoPrepare(param_setting: Dict[str, any], save_folder: str, no_link: bool = False, plan: bool = False, shard = None, nproc: int = 1,
+              summary_file: str = None) -> List[Dict[str, dict]]:  
     """
     param_setting is a dictionary like:
     {
@@ -987,6 +1187,13 @@ def DoPrepare(param_setting: Dict[str, any], save_folder: str, no_link: bool = F
 
     Return a list of dict, which is related to each example_template element. The key of the dict is the newcreated example path, and the value
     is the STRU/KPT/INPUT settings. 
+
+    If plan is True, only return the settings and do not create any file.
+    shard = (i, n) means only prepare the i-th (start from 0) of n parts of all the examples, which can be
+    used to prepare a large sweep by several processes or machines.
+    nproc is the number of threads to create the examples, the examples of all templates are created by one pool,
+    and the paths and the returned settings are same as nproc = 1.
+    summary_file is a json file to write the number of files and bytes that are written, linked or copied of each example.
     """
     example_template = param_setting.get("example_template",None)
     if isinstance(example_template,str):
@@ -1003,6 +1210,8 @@ def DoPrepare(param_setting: Dict[str, any], save_folder: str, no_link: bool = F
         example_template = [example_template]
     
     all_path_setting = []
+    all_tasks = []
+    counter = itertools.count()  # the global index of examples, is used to split examples of all templates to shards
     commpath,example_template_nocomm = CommPath(example_template)
     print(commpath,example_template_nocomm)
     for idx,iexample in enumerate(example_template):
@@ -1031,7 +1240,17 @@ def DoPrepare(param_setting: Dict[str, any], save_folder: str, no_link: bool = F
                                   bak_file = param_setting.get("bak_file",True),
                                   no_link=no_link
                                   )
-        all_path_setting.append(prepareabacus.prepare())
+        # only collect the tasks here, and the tasks of all templates are prepared by one pool
+        all_path_setting.append(prepareabacus.prepare(plan=True,shard=shard,counter=counter,tasks=all_tasks))
+    
+    if not plan:
+        summaries = RunPrepareTasks(all_tasks,nproc)
+        total = StagingSummary(summaries)
+        print("Staging of %d inputs: %d files written (%d bytes), %d links (%d bytes), %d copies (%d bytes)" % 
+              (total["jobs"],total["written"],total["written_bytes"],total["links"],total["linked_bytes"],total["copies"],total["copied_bytes"]))
+        if summary_file:
+            with open(summary_file,"w") as f1:
+                json.dump({"total":total,"jobs":summaries},f1,indent=4)
 
     return all_path_setting
 
@@ -1046,17 +1265,36 @@ def PrepareInput(param):
     if "prepare" in param_setting:
         param_setting = param_setting["prepare"]
     
-    all_path_setting = DoPrepare(param_setting,save_folder,param.nolink)
+    all_path_setting = DoPrepare(param_setting,save_folder,param.nolink,plan=param.plan,shard=param.shard,nproc=param.nproc,
+                                 summary_file=param.summary)
+    npath = 0
     for path_setting in all_path_setting:
         if path_setting:
+            npath += len(path_setting)
             for k,v in path_setting.items():
                 print("%s:%s" % (k,str(v)))
+    if param.plan:
+        print("%d inputs will be prepared" % npath)
+
+def ShardType(value):
+    "parse the value of --shard, i/n, to a tuple (i, n)"
+    try:
+        shard = tuple(int(i) for i in value.split("/"))
+    except ValueError:
+        shard = ()
+    if len(shard) != 2 or not 0 <= shard[0] < shard[1]:
+        raise argparse.ArgumentTypeError("should be i/n, and 0 <= i < n, but not %s" % value)
+    return shard
 
 def PrepareArgs(parser):  
     parser.description = "This script is used to prepare the INPUTS OF ABACUS JOB"
     parser.add_argument('-p', '--param', type=str, help='the parameter file, should be .json type',required=True)
     parser.add_argument('-s', '--save', type=str,  default="abacustest",help='where to store the inputs, default is abacustest ')
     parser.add_argument('--nolink', type=int,  default=0,help='if link the files in the example folder, default is 0')
+    parser.add_argument('--plan', action="store_true", help='only list the inputs that will be prepared, and do not create any file')
+    parser.add_argument('--shard', type=ShardType, default=None, help='i/n, only prepare the i-th (start from 0) of n parts of the inputs, such as 0/4')
+    parser.add_argument('--nproc', type=int, default=1, help='the number of threads to create the inputs, default is 1')
+    parser.add_argument('--summary', type=str, default=None, help='write the number of files and bytes that are written, linked or copied of each input to this json file')
     return parser
 
 def main():
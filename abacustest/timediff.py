@@ -0,0 +1,97 @@
+import os,sys,argparse,json
+from .lib_collectdata.resultAbacus import ResultAbacus
+from .lib_collectdata import comm
+from .outresult import TableOutput
+
+def ReadTimeTable(ipath):
+    '''
+    Read the time table of ABACUS, ipath can be a job path, a time.json file, or the screen output of ABACUS.
+    Return {(class_name, function_name): (cpu_second, calls)}
+    '''
+    if os.path.isdir(ipath):
+        return ResultAbacus(path=ipath).TIMETABLE
+    elif not os.path.isfile(ipath):
+        print("WARNING: can not find %s" % ipath)
+        return {}
+    elif ipath.endswith(".json"):
+        try:
+            return ResultAbacus.TimeTableFromJson(json.load(open(ipath)))
+        except:
+            print("WARNING: can not read %s as time.json" % ipath)
+            return {}
+    return ResultAbacus.TimeTableFromOutput(comm.ReadFile(ipath))
+
+def TimeDiff(table1,table2):
+    '''
+    Align the functions of two time tables, and sort them by the growth of time, from the largest to the smallest.
+    The growth is normalised by calls: (time2/calls2 - time1/calls1) * calls2, which is the extra time
+    caused by that each call becomes slower, so a function called more times will not be regarded as a hotspot.
+    For the function only in one table, the growth is the time in table2 or minus the time in table1.
+    Return a list of dict, each dict has keys: function, time1, calls1, time2, calls2, per_call1, per_call2, growth
+    '''
+    def per_call(value):
+        if value == None or value[0] == None or not value[1]:
+            return None
+        return value[0] / value[1]
+
+    functions = [k for k in table1 if k[1] != None] + [k for k in table2 if k[1] != None and k not in table1]
+    diff = []
+    for ifunc in functions:
+        value1 = table1.get(ifunc,(None,None))
+        value2 = table2.get(ifunc,(None,None))
+        per_call1 = per_call(value1)
+        per_call2 = per_call(value2)
+        if per_call1 != None and per_call2 != None:
+            growth = (per_call2 - per_call1) * value2[1]
+        elif per_call2 != None:
+            growth = value2[0]
+        elif per_call1 != None:
+            growth = -value1[0]
+        else:
+            growth = 0.0
+        diff.append({"function":"%s/%s" % ifunc,
+                     "time1":value1[0],"calls1":value1[1],
+                     "time2":value2[0],"calls2":value2[1],
+                     "per_call1":per_call1,"per_call2":per_call2,
+                     "growth":growth})
+    diff.sort(key=lambda x:x["growth"],reverse=True)
+    return diff
+
+def TimeDiffArgs(parser):
+    parser.description = "Compare the time of each function in two ABACUS runs, and list the functions whose time grew the most"
+    parser.add_argument('-j', '--job', type=str, nargs=2, required=True, help='two jobs to be compared, each can be a job path, a time.json file, or the screen output of ABACUS')
+    parser.add_argument('-n', '--number', type=int, default=20, help='the number of functions to be printed, default is 20. -1 means all functions')
+    parser.add_argument('-o', '--output', type=str, help='write all the aligned functions to this json file')
+    return parser
+
+def timediff(param):
+    job1,job2 = param.job
+    table1 = ReadTimeTable(job1)
+    table2 = ReadTimeTable(job2)
+    if len(table1) == 0 or len(table2) == 0:
+        print("ERROR: can not read the time of %s" % (job1 if len(table1) == 0 else job2))
+        sys.exit(1)
+
+    diff = TimeDiff(table1,table2)
+    total1 = table1.get(("total",None),(None,None))[0]
+    total2 = table2.get(("total",None),(None,None))[0]
+    print("total time: %s -> %s" % (total1,total2))
+
+    number = len(diff) if param.number < 0 else param.number
+    table = [["function","time1","calls1","time2","calls2","per_call1","per_call2","growth"]]
+    for i in diff[:number]:
+        table.append([i["function"]] + ["-" if i[k] == None else i[k]
+                     for k in ["time1","calls1","time2","calls2","per_call1","per_call2","growth"]])
+    print(TableOutput(table,maxlen=40,digit=[-1,3,-1,3,-1,5,5,3],left=[True]+[False]*7))
+
+    if param.output != None:
+        with open(param.output,"w") as f1:
+            json.dump({"job1":job1,"job2":job2,"total1":total1,"total2":total2,"diff":diff},f1,indent=4)
+
+def main():
+    parser = argparse.ArgumentParser()
+    param = TimeDiffArgs(parser).parse_args()
+    timediff(param)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+'''
+Benchmark the overhead of Result.__getitem__ on the cache miss.
+
+Each job registers some keys, and some keys are required inside other methods (like natom and volume),
+the keys are catched on many jobs with the current __getitem__ and with the former one, which checks the 
+recursion by inspect.getsource.
+
+    python benchmark_getitem.py [njob]
+'''
+import os,sys,time,inspect,traceback
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from abacustest.lib_collectdata.result import Result
+
+class BenchResult(Result):
+    _PARAM_DIC = {}
+
+    def __init__(self,natom=8):
+        super().__init__()
+        self.NATOM = natom
+
+@BenchResult.register(natom="the atom number")
+def GetNatom(self):
+    self["natom"] = self.NATOM
+
+@BenchResult.register(volume="the volume")
+def GetVolume(self):
+    self["volume"] = 10.0 * self["natom"]
+
+@BenchResult.register(energy="the energy",energy_per_atom="energy divided by natom")
+def GetEnergy(self):
+    self["energy"] = -5.0 * self["natom"]
+    self["energy_per_atom"] = self["energy"] / self["natom"]
+
+@BenchResult.register(density="natom divided by volume")
+def GetDensity(self):
+    self["density"] = self["natom"] / self["volume"]
+
+@BenchResult.register(pressure="a key depends on energy and volume")
+def GetPressure(self):
+    self["pressure"] = self["energy"] / self["volume"]
+
+class LegacyResult(BenchResult):
+    # __getitem__ before the reentrancy guard
+    def __getitem__(self,key):
+        try:
+            return self._PARAM_VALUE[key]
+        except:
+            pass
+        func = self._PARAM_DIC[key][0]
+        func_source_file = inspect.getsource(func)
+        fback_source_file = inspect.getsource(inspect.currentframe().f_back)
+        if func_source_file == fback_source_file:
+            return None
+        self._RUNNING.append(func)
+        try:
+            func(self)
+        except:
+            traceback.print_exc()
+        self._RUNNING.pop()
+        return self._PARAM_VALUE.get(key)
+
+def run(cls,njob):
+    keys = list(cls._PARAM_DIC.keys())
+    nlookup = 0
+    t0 = time.perf_counter()
+    for i in range(njob):
+        job = cls(natom=i % 50 + 1)
+        for key in keys:
+            job[key]
+        nlookup += len(keys)
+    return time.perf_counter() - t0, nlookup
+
+if __name__ == "__main__":
+    njob = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("%-10s %8s %10s %12s %16s" % ("getitem","njob","nkey","time(s)","us/key"))
+    for name,cls in [("legacy",LegacyResult),("current",BenchResult)]:
+        t,nlookup = run(cls,njob)
+        print("%-10s %8d %10d %12.3f %16.2f" % (name,njob,nlookup,t,t/nlookup*1e6))
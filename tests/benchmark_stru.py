@@ -0,0 +1,88 @@
+'''
+Benchmark reading and writing a large STRU by AbacusStru.
+
+A STRU of natom atoms (two types) is written by AbacusStru.write and read back by AbacusStru.ReadStru,
+and the time is compared with the former implementation, which searches the whole file once for each
+block and formats the coordinates line by line. write_move is the time to write the STRU with the move
+flags of each atom.
+
+    python benchmark_stru.py [natom1 natom2 ...]
+'''
+import os,sys,time,tempfile
+import numpy as np
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from abacustest import constant
+from abacustest.prepare import AbacusStru
+
+def make_stru(natom,move=False):
+    rng = np.random.default_rng(0)
+    n1 = natom // 2
+    return AbacusStru(label=["Ga","As"],
+                      atom_number=[n1,natom-n1],
+                      cell=[[20.0,0,0],[0,20.0,0],[0,0,20.0]],
+                      coord=rng.random((natom,3)).tolist(),
+                      pp=["Ga.upf","As.upf"],
+                      orb=["Ga.orb","As.orb"],
+                      mass=[69.723,74.922],
+                      magmom=[0.0,0.0],
+                      lattice_constant=1.8897,
+                      move=["0 0 1"] * natom if move else None)
+
+def legacy_write(stru,struf):
+    # the coordinates are formatted and concatenated line by line
+    cc = "ATOMIC_POSITIONS\nDirect\n"
+    icoord = 0
+    for i,ilabel in enumerate(stru._label):
+        cc += "\n%s\n%f\n%d\n" % (ilabel,stru._magmom[i],stru._atom_number[i])
+        for j in range(stru._atom_number[i]):
+            cc += "%17.11f %17.11f %17.11f 1 1 1\n" % tuple(stru._coord[icoord + j])
+        icoord += stru._atom_number[i]
+    with open(struf,"w") as f: f.write(cc)
+
+def legacy_read(struf):
+    # each block is searched from the beginning of the file, and coordinates are converted line by line
+    with open(struf) as f1: lines = f1.readlines()
+    def get_block(keyname):
+        block = []
+        for i,line in enumerate(lines):
+            if line.strip() == "": continue
+            elif line.split('#')[0].strip() == keyname:
+                for ij in range(i+1,len(lines)):
+                    if lines[ij].strip() == "" or lines[ij].strip()[0] in ["#"]: continue
+                    elif lines[ij].strip() in constant.ABACUS_STRU_KEY_WORD:
+                        return block
+                    else:
+                        block.append(lines[ij].split("#")[0].split("//")[0].strip())
+                return block
+        return None
+    for key in ["ATOMIC_SPECIES","NUMERICAL_ORBITAL","LATTICE_CONSTANT","LATTICE_VECTORS","NUMERICAL_DESCRIPTOR"]:
+        get_block(key)
+    atom_positions = get_block("ATOMIC_POSITIONS")
+    coords = []
+    i = 1
+    while i < len(atom_positions):
+        natom = int(atom_positions[i+2].split()[0])
+        i += 3
+        for j in range(natom):
+            coords.append([float(k) for k in atom_positions[i+j].split()[:3]])
+        i += natom
+    return coords
+
+def timeit(func,*args):
+    t0 = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - t0
+
+if __name__ == "__main__":
+    natoms = [int(i) for i in sys.argv[1:]] or [1000,10000,100000]
+    tmpdir = tempfile.mkdtemp()
+    struf = os.path.join(tmpdir,"STRU")
+    print("%10s %14s %14s %14s %14s %14s" % ("natom","legacy_write","write","write_move","legacy_read","ReadStru"))
+    for natom in natoms:
+        stru = make_stru(natom)
+        t_legacy_write = timeit(legacy_write,stru,struf)
+        t_write = timeit(stru.write,struf)
+        t_write_move = timeit(make_stru(natom,move=True).write,struf)
+        t_legacy_read = timeit(legacy_read,struf)
+        t_read = timeit(AbacusStru.ReadStru,struf)
+        print("%10d %14.4f %14.4f %14.4f %14.4f %14.4f" % (natom,t_legacy_write,t_write,t_write_move,t_legacy_read,t_read))
@@ -0,0 +1,588 @@
+import unittest,os,shutil,tempfile,importlib.util,json,argparse,itertools
+import numpy as np
+
+from abacustest.lib_collectdata.collectdata import RESULT
+from abacustest.lib_collectdata.resultAbacus import ResultAbacus
+from abacustest.lib_collectdata.comm_funcs.neighbor import neighbor_list
+from abacustest.lib_collectdata import cache,comm,resultfile
+from abacustest import timediff
+from abacustest.collectdata import Collector,collect_jobs
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),"data")
+
+class TestLineIndex(unittest.TestCase):
+    def setUp(self):
+        self.lines = ["WELCOME TO ABACUS v3.4.0\n",
+                      " ELEC ITER 1 Density error is 0.1\n",
+                      " Density error is 0.01\n",
+                      "!FINAL_ETOT_IS -100.0 eV\n",
+                      " Density error is 0.001 !FINAL_ETOT_IS -101.0 eV\n",
+                      " Total  Time  : 10\n"]
+        self.index = comm.LineIndex(self.lines,["Density error is","!FINAL_ETOT_IS","not in the log"])
+
+    def test_find(self):
+        self.assertEqual(self.index.Find("Density error is"), [1,2,4])
+        self.assertEqual(self.index.First("!FINAL_ETOT_IS"), 3)
+        self.assertEqual(self.index.Last("!FINAL_ETOT_IS"), 4)
+        # a line with two markers is in the lines of both
+        self.assertEqual(self.index.Lines(["Density error is","!FINAL_ETOT_IS"]), [1,2,3,4])
+        self.assertEqual(self.index.Lines(["Density error is","!FINAL_ETOT_IS"],reverse=True), [4,3,2,1])
+
+    def test_marker_absent(self):
+        self.assertEqual(self.index.Find("not in the log"), [])
+        self.assertEqual(self.index.First("not in the log"), None)
+        self.assertEqual(self.index.Last("not in the log"), None)
+        self.assertEqual(comm.LineIndex([],["Density error is"]).Last("Density error is"), None)
+
+    def test_marker_not_listed(self):
+        # the marker that is not given at construction is searched when it is queried
+        self.assertEqual(self.index.First("Total  Time"), 5)
+        self.assertEqual(self.index.First("WELCOME TO ABACUS"), 0)
+        self.assertEqual(self.index.Find("ABACUS"), [0])
+
+class TestTailReader(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.ifile = os.path.join(self.work_path,"log")
+        self.lines = []
+        for i in range(50):
+            self.lines += [" ION STEP %d\n" % i," TOTAL-FORCE (eV/Angstrom)\n"," atom %d 0.1 0.2 0.3\n" % i]
+        self.lines.append(" Total  Time  : 10")  # no newline at the end of file
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def write(self,lines):
+        with open(self.ifile,"w") as f1: f1.writelines(lines)
+
+    def test_find_last(self):
+        self.write(self.lines)
+        text = "".join(self.lines)
+        # the chunk boundary is at different positions, including inside a marker
+        for chunk_size in [1,7,16,33,100,len(text),1048576]:
+            reader = comm.TailReader(self.ifile,chunk_size=chunk_size)
+            offset,marker = reader.FindLast(["TOTAL-FORCE","ION STEP"])
+            self.assertEqual(marker, "TOTAL-FORCE")
+            self.assertEqual(offset, text.rfind(" TOTAL-FORCE"))
+            self.assertEqual(reader.Lines(offset,2), self.lines[-3:-1])
+            # search backward from an offset
+            offset,marker = reader.FindLast(["ION STEP"],end=offset)
+            self.assertEqual(reader.Lines(offset,1), [" ION STEP 49\n"])
+            self.assertEqual(reader.FindLast(["not in the file"]), (None,None))
+
+    def test_marker_at_file_start(self):
+        self.write(self.lines)
+        reader = comm.TailReader(self.ifile,chunk_size=5)
+        self.assertEqual(reader.FindLast(["ION STEP 0\n"]), (0,"ION STEP 0\n"))
+        self.assertEqual(reader.FindLast(["ION STEP"],end=0), (None,None))
+        # the marker starting with a newline, the offset is the start of the next line
+        self.assertEqual(reader.FindLast(["\n ION STEP 1\n"])[0], "".join(self.lines).find(" ION STEP 1\n"))
+
+    def test_last_lines(self):
+        self.write(self.lines)
+        reader = comm.TailReader(self.ifile,chunk_size=5)
+        self.assertEqual(reader.LastLines(2), self.lines[-2:])
+        self.assertEqual(reader.LastLines(1000), self.lines)
+        self.assertEqual(list(reader.LinesFrom(0)), self.lines)
+        self.write(self.lines[:-1])
+        self.assertEqual(comm.TailReader(self.ifile).LastLines(1), self.lines[-2:-1])
+
+    def test_empty_file(self):
+        self.write([])
+        for reader in [comm.TailReader(self.ifile),comm.TailReader(os.path.join(self.work_path,"not_exist")),comm.TailReader(None)]:
+            self.assertEqual(reader.FindLast(["ION STEP"]), (None,None))
+            self.assertEqual(reader.LastLines(3), [])
+            self.assertEqual(list(reader.LinesFrom(0)), [])
+
+class TestFindOutput(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.keyinfo = "Atomic-orbital Based Ab-initio"
+        with open(os.path.join(self.work_path,"INPUT"),"w") as f1: f1.write("INPUT_PARAMETERS\n")
+        # the keyinfo is after the sniffed header
+        with open(os.path.join(self.work_path,"big.out"),"w") as f1: f1.write("x" * 100 + self.keyinfo)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def test_find_output(self):
+        self.assertEqual(comm.FindOutput(self.work_path,self.keyinfo,sniff_size=100), None)
+        outf = os.path.join(self.work_path,"slurm-1.txt")
+        with open(outf,"w") as f1: f1.write(" " + self.keyinfo + "\n")
+        self.assertEqual(comm.FindOutput(self.work_path,self.keyinfo,sniff_size=100), outf)
+        # the found file is recorded in the manifest
+        self.assertEqual(comm.ReadOutputManifest(self.work_path), {self.keyinfo: "slurm-1.txt"})
+        self.assertEqual(comm.FindOutput(self.work_path,self.keyinfo,sniff_size=100), outf)
+
+    def test_stale_manifest(self):
+        # the recorded file is no longer the output, then all files are checked again
+        comm.WriteOutputManifest(self.work_path,{self.keyinfo: "INPUT"})
+        self.assertEqual(comm.FindOutput(self.work_path,self.keyinfo), os.path.join(self.work_path,"big.out"))
+        self.assertEqual(comm.ReadOutputManifest(self.work_path), {self.keyinfo: "big.out"})
+        self.assertEqual(comm.FindOutput(self.work_path,"not in any file",manifest=False), None)
+
+class TestAbacusTrajectory(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.job = os.path.join(self.work_path,"abacus_relax")
+        shutil.copytree(os.path.join(DATA_PATH,"abacus_relax"),self.job)
+        self.logf = os.path.join(self.job,"OUT.ABACUS","running_relax.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def result(self):
+        return RESULT(fmt="abacus",path=self.job,modules=["trajectory"])
+
+    def test_relax_trajectory(self):
+        result = self.result()
+        self.assertEqual(result["relax_steps"], 3)
+        np.testing.assert_allclose(result["traj_energy"], [-215.5703926,-215.5812733,-215.5837120])
+        self.assertEqual(result["traj_force"].shape, (3,2,3))
+        np.testing.assert_allclose(result["traj_force"][:,0,0], [-0.0723,-0.0312,-0.0051])
+        np.testing.assert_allclose(result["traj_stress"][:,0,0], [-12.31,-8.52,-3.11])
+        np.testing.assert_array_equal(result["traj_scf_steps"], [4,3,3])
+
+        # the first coordinate is printed before the cell in the header
+        self.assertEqual(result["traj_coordinate"].shape, (3,2,3))
+        self.assertFalse(np.isnan(result["traj_coordinate"]).any())
+        cell = np.array([[0.5,0.5,0],[0.5,0,0.5],[0,0.5,0.5]]) * 5.39761
+        np.testing.assert_allclose(result["traj_cell"][0], cell)
+        np.testing.assert_allclose(result["traj_coordinate"][0,1], np.dot([0.26,0.25,0.25],cell))
+
+        # the last step is same as the keys of the last one
+        np.testing.assert_allclose(result["traj_force"][-1].flatten(), result["force"])
+        np.testing.assert_allclose(result["traj_stress"][-1].flatten(), result["stress"])
+        np.testing.assert_allclose(result["traj_coordinate"][-1], result["coordinate"])
+
+    def test_no_atom_number_in_header(self):
+        # the coordinates do not depend on the atom number in the header
+        with open(self.logf) as f1: lines = f1.readlines()
+        with open(self.logf,"w") as f1:
+            f1.writelines([i for i in lines if "number of atom for this type" not in i])
+        result = self.result()
+        self.assertEqual(result["natom"], None)
+        self.assertEqual(result["traj_coordinate"].shape, (3,2,3))
+        self.assertFalse(np.isnan(result["traj_coordinate"]).any())
+
+    def test_restarted_log(self):
+        # a log that is appended by a restarted job, the header is printed twice
+        with open(self.logf) as f1: text = f1.read()
+        with open(self.logf,"w") as f1: f1.write(text + text)
+        result = self.result()
+        self.assertEqual(result["traj_energy"].shape, (6,))
+        self.assertEqual(result["traj_coordinate"].shape, (6,2,3))
+        self.assertFalse(np.isnan(result["traj_coordinate"]).any())
+        np.testing.assert_allclose(result["traj_coordinate"][3], result["traj_coordinate"][0])
+
+class TestCollectJobs(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.jobs = []
+        for i in range(4):
+            job = os.path.join(self.work_path,"job%d" % i)
+            shutil.copytree(os.path.join(DATA_PATH,"abacus_relax"),job)
+            self.jobs.append(job)
+        # job1 has only 2 ION steps, and the log of job2 is lost
+        logf = os.path.join(self.jobs[1],"OUT.ABACUS","running_relax.log")
+        with open(logf) as f1: lines = f1.readlines()
+        istep = [i for i,line in enumerate(lines) if "STEP OF ION RELAXATION : 3" in line][0]
+        with open(logf,"w") as f1: f1.writelines(lines[:istep])
+        os.remove(os.path.join(self.jobs[2],"OUT.ABACUS","running_relax.log"))
+        self.keys = ["natom","energy","relax_steps","force","traj_energy"]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def test_parallel_same_as_serial(self):
+        serial = list(collect_jobs("abacus",self.jobs,self.keys,modules=["trajectory"]))
+        parallel = list(collect_jobs("abacus",self.jobs,self.keys,modules=["trajectory"],nproc=2,chunksize=1))
+        self.assertEqual([i[0] for i in parallel], self.jobs)
+        self.assertEqual([i[1]["relax_steps"] for i in serial], [3,2,None,3])
+        for (path1,values1,_),(path2,values2,_) in zip(serial,parallel):
+            self.assertEqual(path1, path2)
+            self.assertEqual(values1.keys(), values2.keys())
+            for key in self.keys:
+                np.testing.assert_equal(values1[key], values2[key])
+
+    def test_collector_session(self):
+        collector = Collector("abacus",modules=["trajectory"])
+        values = collector.collect(self.jobs,["energy","relax_steps"])
+        self.assertEqual(list(values.keys()), self.jobs)
+        self.assertEqual(values[self.jobs[0]], values[self.jobs[3]])
+        self.assertEqual(values[self.jobs[2]], {"energy": None, "relax_steps": None})
+
+class TestVaspBandGap(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def band_gap(self,band,nelec):
+        result = RESULT(fmt="vasp",path=self.work_path)
+        result["band"] = np.array(band,dtype=float)
+        result["nelec"] = nelec
+        return result
+
+    def test_spin_polarized_gap(self):
+        # vbm is in spin up and cbm is in spin down, both at the first k point
+        band = [[[-1.0, 2.0], [-1.5, 2.5]],
+                [[-2.0, 1.0], [-2.5, 1.5]]]
+        result = self.band_gap(band,2)
+        self.assertEqual(result["vbm_kpoint"], result["cbm_kpoint"])
+        self.assertAlmostEqual(result["band_gap"], 2.0)
+        self.assertAlmostEqual(result["direct_band_gap"], 3.0)
+        self.assertFalse(result["is_direct_gap"])
+        np.testing.assert_allclose(result["band_gap_spin"], [3.0,3.0])
+
+    def test_direct_gap(self):
+        band = [[[-1.0, 2.0], [-1.5, 2.5]]]
+        result = self.band_gap(band,2)
+        self.assertTrue(result["is_direct_gap"])
+        self.assertAlmostEqual(result["band_gap"], result["direct_band_gap"])
+
+class TestResultAssignment(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.result = RESULT(fmt="qe",path=self.work_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def test_assign_array_twice(self):
+        force = np.array([0.1,0.2,0.3])
+        self.result["force"] = force
+        self.result["force"] = force.copy()
+        # the value catched firstly is kept
+        self.result["force"] = np.array([0.4,0.5,0.6])
+        np.testing.assert_array_equal(self.result["force"], force)
+
+    def test_assign_array_after_list(self):
+        self.result["stress"] = [1.0,2.0]
+        self.result["stress"] = np.array([1.0,2.0,3.0])
+        self.assertEqual(self.result["stress"], [1.0,2.0])
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.job = os.path.join(self.work_path,"abacus_relax")
+        shutil.copytree(os.path.join(DATA_PATH,"abacus_relax"),self.job)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def collect(self,keys):
+        # return the restored keys and the values of keys, and save the cache
+        result = RESULT(fmt="abacus",path=self.job)
+        parse_cache = cache.ParseCache(self.job)
+        restored = parse_cache.Restore(result,keys)
+        values = result.Evaluate(keys)
+        parse_cache.Update(result)
+        parse_cache.Save()
+        return restored,values
+
+    def test_restore(self):
+        _,values = self.collect(["energy","energy_per_atom","natom","INPUT"])
+        restored,values2 = self.collect(["energy","energy_per_atom","natom","INPUT"])
+        self.assertEqual(sorted(restored), ["INPUT","energy","energy_per_atom","natom"])
+        self.assertEqual(values2, values)
+
+    def test_upstream_method_changed(self):
+        self.collect(["energy_per_atom"])
+        # the method of natom is modified, and energy_per_atom depends on natom
+        natom_method = RESULT(fmt="abacus",path=self.job)._PARAM_DIC["natom"][0]
+        hash_org = cache.MethodHash(natom_method)
+        cache._METHOD_HASH[natom_method] = "modified"
+        try:
+            restored,_ = self.collect(["energy_per_atom"])
+        finally:
+            cache._METHOD_HASH[natom_method] = hash_org
+        self.assertNotIn("energy_per_atom", restored)
+
+    def test_output_input_written(self):
+        _,values = self.collect(["INPUT"])
+        self.assertEqual(values["INPUT"]["calculation"], "relax")
+        # OUT.ABACUS/INPUT is written after the value is cached
+        with open(os.path.join(self.job,"OUT.ABACUS","INPUT"),"w") as f1:
+            f1.write("INPUT_PARAMETERS\ncalculation relax\necutwfc 100\n")
+        restored,values = self.collect(["INPUT"])
+        self.assertEqual(restored, [])
+        self.assertEqual(values["INPUT"]["ecutwfc"], 100)
+
+    def test_method_without_sources(self):
+        result = RESULT(fmt="abacus",path=self.job)
+        @result.register(energy_twice="the energy multiplied by 2, read without declared sources")
+        def GetEnergyTwice(self):
+            self["energy_twice"] = self["energy"] * 2
+        try:
+            self.collect(["energy_twice"])
+            restored,values = self.collect(["energy_twice","energy"])
+        finally:
+            del type(result)._PARAM_DIC["energy_twice"]
+            type(result)._PLANS.clear()
+        self.assertEqual(restored, ["energy"])
+        self.assertAlmostEqual(values["energy_twice"], values["energy"] * 2)
+
+class TestVaspLowMemory(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.job = os.path.join(self.work_path,"vasp_relax")
+        shutil.copytree(os.path.join(DATA_PATH,"vasp_relax"),self.job)
+        self.keys = ["natom","nbands","spin","energy","force","stress","scf_steps","total_time","point_group","atom_mag"]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def test_outcar_keys(self):
+        values = RESULT(fmt="vasp",path=self.job).Evaluate(self.keys)
+        self.assertEqual(values["natom"], 2)
+        self.assertAlmostEqual(values["energy"], -10.21)
+        np.testing.assert_allclose(values["force"], [0.111111,0.122222,-0.133333,-0.111111,-0.122222,0.133333])
+        np.testing.assert_allclose(values["stress"], [21.0,0.7,0.9,0.7,22.0,0.8,0.9,0.8,23.0])
+        self.assertEqual(values["point_group"], "O_h")
+        self.assertEqual(values["atom_mag"], [0.5,0.7])
+
+    def test_release_outcar(self):
+        values = RESULT(fmt="vasp",path=self.job).Evaluate(self.keys)
+        result = RESULT(fmt="vasp",path=self.job)
+        self.assertEqual(result.Evaluate(self.keys,low_memory=True), values)
+        # the whole context of OUTCAR is released after the evaluation
+        for source in ["OUTCAR","OUTCARINDEX","OUTCARTAIL"]:
+            self.assertNotIn(source, result._SOURCE)
+
+class TestResultFile(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.allresult = {
+            "job1": {"natom": 2, "energy": -10.5, "normal_end": True, "version": "v3.4.0",
+                     "force": [[0.1,0.2,0.3],[-0.1,-0.2,-0.3]], "kpt": [2,2,2],
+                     "INPUT": {"ecutwfc": 50, "calculation": "relax"}, "drho": [0.1,0.01,0.001],
+                     "scf_steps": 10},
+            "job2": {"natom": 3, "energy": None, "normal_end": False, "version": None,
+                     "force": None, "kpt": [3,3,3], "INPUT": {"ecutwfc": 60},
+                     "drho": [[0.1,0.01],[0.1]], "scf_steps": 12.5, "band_gap": 1.2},
+            "job3": {}}
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def expected(self):
+        # the missing key is None, and the int values in a column with float values are float
+        expected = {}
+        keys = ["natom","energy","normal_end","version","force","kpt","INPUT","drho","scf_steps","band_gap"]
+        for example,values in self.allresult.items():
+            expected[example] = {key:values.get(key) for key in keys}
+        expected["job1"]["scf_steps"] = 10.0
+        return expected
+
+    def test_npz_round_trip(self):
+        npzfile = os.path.join(self.work_path,"result.npz")
+        resultfile.WriteResults(self.allresult,npzfile)
+        result = resultfile.ReadResults(npzfile)
+        self.assertEqual(result, self.expected())
+        self.assertEqual(list(result.keys()), ["job1","job2","job3"])
+        self.assertIsInstance(result["job1"]["natom"], int)
+        self.assertIsInstance(result["job1"]["normal_end"], bool)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet_round_trip(self):
+        parquetfile = os.path.join(self.work_path,"result.parquet")
+        resultfile.WriteResults(self.allresult,parquetfile)
+        self.assertEqual(resultfile.ReadResults(parquetfile), self.expected())
+
+    def test_json_npz_convert(self):
+        jsonfile = os.path.join(self.work_path,"result.json")
+        npzfile = os.path.join(self.work_path,"result.npz")
+        newjsonfile = os.path.join(self.work_path,"result2.json")
+        resultfile.WriteResults(self.allresult,jsonfile)
+        resultfile.ConvertResults(jsonfile,npzfile)
+        resultfile.ConvertResults(npzfile,newjsonfile)
+        self.assertEqual(resultfile.ReadResults(newjsonfile), self.expected())
+
+    def test_numpy_values(self):
+        # the values catched as numpy arrays and numpy scalars
+        allresult = {"job1": {"force": np.array([[0.1,0.2,0.3]]), "natom": np.int64(1), "energy": np.float64(-1.5)},
+                     "job2": {"force": np.zeros((2,3)), "natom": np.int64(2), "energy": np.float64(-2.5)}}
+        npzfile = os.path.join(self.work_path,"result.npz")
+        resultfile.WriteResults(allresult,npzfile)
+        result = resultfile.ReadResults(npzfile)
+        self.assertEqual(result["job1"], {"force": [[0.1,0.2,0.3]], "natom": 1, "energy": -1.5})
+        self.assertEqual(result["job2"]["force"], [[0.0]*3]*2)
+
+    def test_empty_result(self):
+        npzfile = os.path.join(self.work_path,"result.npz")
+        resultfile.WriteResults({},npzfile)
+        self.assertEqual(resultfile.ReadResults(npzfile), {})
+
+TIME_OUTPUT = """ Total  Time  : 0 h 0 mins 10 secs 
+
+ |CLASS_NAME---------|NAME---------------|TIME(Sec)-----|CALLS----|AVG------|PER%-------
+                      total               10.00         9         1.11      100%
+  Driver              driver_line         9.00          1         9.00      90%
+  Hamilt              h_psi               4.00          100       0.04      40%
+                      vnl_psi             2.00          100       0.02      20%
+ ----------------------------------------------------------------------------------------
+"""
+
+class TestJsonl(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.jsonlfile = os.path.join(self.work_path,"result.jsonl")
+        self.allresult = {"job%d" % i: {"energy": -1.5 * i, "force": [0.1 * i,0.0,0.0], "INPUT": {"ecutwfc": 50 + i}} for i in range(5)}
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def write(self,paths,append=False):
+        with resultfile.JsonlWriter(self.jsonlfile,append=append,sync_every=2) as writer:
+            for path in paths:
+                writer.Write(path,self.allresult[path])
+
+    def test_compact_same_as_json(self):
+        self.write(list(self.allresult))
+        jsonfile = os.path.join(self.work_path,"result.json")
+        resultfile.WriteResults(self.allresult,jsonfile)
+        compactfile = os.path.join(self.work_path,"compact.json")
+        resultfile.CompactJsonl(self.jsonlfile,compactfile)
+        with open(jsonfile) as f1, open(compactfile) as f2:
+            self.assertEqual(f1.read(), f2.read())
+        # the order of paths, and the paths not in the jsonl file are skipped
+        resultfile.CompactJsonl(self.jsonlfile,compactfile,paths=["job3","job1","job9"])
+        self.assertEqual(list(resultfile.ReadResults(compactfile).keys()), ["job3","job1"])
+
+    def test_resume_after_broken_line(self):
+        self.write(["job0","job1","job2"])
+        # the collection was killed when writing the record of job3
+        with open(self.jsonlfile,"a") as f1: f1.write('{"path": "job3", "val')
+        self.assertEqual(list(resultfile.JsonlIndex(self.jsonlfile)), ["job0","job1","job2"])
+        self.write(["job3","job4"],append=True)
+        self.assertEqual(list(resultfile.JsonlIndex(self.jsonlfile)), ["job0","job1","job2","job3","job4"])
+        npzfile = os.path.join(self.work_path,"result.npz")
+        resultfile.CompactJsonl(self.jsonlfile,npzfile)
+        self.assertEqual(resultfile.ReadResults(npzfile), self.allresult)
+
+    def test_latest_record(self):
+        # the last record of a path is used
+        self.write(["job0","job1"])
+        self.allresult["job0"]["energy"] = -100.0
+        self.write(["job0"],append=True)
+        compactfile = os.path.join(self.work_path,"compact.json")
+        resultfile.CompactJsonl(self.jsonlfile,compactfile)
+        self.assertEqual(resultfile.ReadResults(compactfile)["job0"]["energy"], -100.0)
+
+class TestTimeDiff(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.time_json = {"total": 20.0,
+                          "sub": [{"class_name": "Driver", "sub": [{"name": "driver_line", "cpu_second": 19.0, "calls": 1}]},
+                                  {"class_name": "Hamilt", "sub": [{"name": "h_psi", "cpu_second": 12.0, "calls": 200},
+                                                                   {"name": "s_psi", "cpu_second": 1.0, "calls": 10}]}]}
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def test_read_time_table(self):
+        outputf = os.path.join(self.work_path,"output")
+        with open(outputf,"w") as f1: f1.write(TIME_OUTPUT)
+        table1 = timediff.ReadTimeTable(outputf)
+        self.assertEqual(table1[("total",None)], (10.0,1))
+        self.assertEqual(table1[("Hamilt","vnl_psi")], (2.0,100))
+        self.assertEqual(table1[("Hamilt",None)], (6.0,2))
+
+        # time.json in the job path is used firstly
+        with open(os.path.join(self.work_path,"time.json"),"w") as f1: json.dump(self.time_json,f1)
+        table2 = timediff.ReadTimeTable(os.path.join(self.work_path,"time.json"))
+        self.assertEqual(table2, timediff.ReadTimeTable(self.work_path))
+        self.assertEqual(table2[("Hamilt","s_psi")], (1.0,10))
+        self.assertEqual(table2[("Hamilt",None)], (13.0,2))
+        self.assertEqual(timediff.ReadTimeTable(os.path.join(self.work_path,"not_exist")), {})
+
+    def test_time_diff(self):
+        table1 = ResultAbacus.TimeTableFromOutput(TIME_OUTPUT.split("\n"))
+        table2 = ResultAbacus.TimeTableFromJson(self.time_json)
+        diff = {i["function"]:i for i in timediff.TimeDiff(table1,table2)}
+        self.assertEqual(sorted(diff), ["Driver/driver_line","Hamilt/h_psi","Hamilt/s_psi","Hamilt/vnl_psi"])
+        # driver_line is 10 s slower, h_psi is called twice as many times but each call is 0.02 s slower
+        self.assertAlmostEqual(diff["Driver/driver_line"]["growth"], 10.0)
+        self.assertAlmostEqual(diff["Hamilt/h_psi"]["growth"], (0.06 - 0.04) * 200)
+        self.assertAlmostEqual(diff["Hamilt/s_psi"]["growth"], 1.0)
+        self.assertAlmostEqual(diff["Hamilt/vnl_psi"]["growth"], -2.0)
+        self.assertEqual(diff["Hamilt/s_psi"]["time1"], None)
+        self.assertEqual([i["function"] for i in timediff.TimeDiff(table1,table2)],
+                         ["Driver/driver_line","Hamilt/h_psi","Hamilt/s_psi","Hamilt/vnl_psi"])
+
+    def test_timediff_output(self):
+        outputf = os.path.join(self.work_path,"output")
+        jsonf = os.path.join(self.work_path,"time.json")
+        with open(outputf,"w") as f1: f1.write(TIME_OUTPUT)
+        with open(jsonf,"w") as f1: json.dump(self.time_json,f1)
+        param = timediff.TimeDiffArgs(argparse.ArgumentParser()).parse_args(["-j",outputf,jsonf,"-n","2","-o",os.path.join(self.work_path,"diff.json")])
+        timediff.timediff(param)
+        with open(os.path.join(self.work_path,"diff.json")) as f1: output = json.load(f1)
+        self.assertEqual([output["total1"],output["total2"]], [10.0,20.0])
+        self.assertEqual(len(output["diff"]), 4)
+
+class TestNeighborList(unittest.TestCase):
+    def brute_force(self,lattice,coords,r,centers,tol=1e-8):
+        # check the images of all atoms in a large enough range of shifts
+        lattice = np.array(lattice)
+        spacing = 1.0 / np.linalg.norm(np.linalg.inv(lattice).T, axis=1)
+        frac = np.linalg.solve(lattice.T, np.array(coords).T).T
+        nshift = [int(np.ceil(r / i)) + int(np.ceil(np.abs(frac[:,j]).max())) + 1 for j,i in enumerate(spacing)]
+        pairs = set()
+        for icenter in centers:
+            for ineighbor in range(len(coords)):
+                for shift in itertools.product(*[range(-n, n + 1) for n in nshift]):
+                    dist = np.linalg.norm(coords[ineighbor] + np.dot(shift,lattice) - coords[icenter])
+                    if tol < dist <= r:
+                        pairs.add((icenter,ineighbor,shift,round(dist,8)))
+        return pairs
+
+    def check(self,lattice,coords,r,centers=None):
+        coords = np.array(coords,dtype=float)
+        center,neighbor,image,distance = neighbor_list(lattice,coords,r,centers=centers)
+        pairs = {(int(c),int(n),tuple(int(k) for k in i),round(float(d),8)) for c,n,i,d in zip(center,neighbor,image,distance)}
+        self.assertEqual(len(pairs), len(center))
+        centers = range(len(coords)) if centers is None else centers
+        self.assertEqual(pairs, self.brute_force(lattice,coords,r,centers))
+        # the distance is the length of the bond to the image
+        np.testing.assert_allclose(np.linalg.norm(coords[neighbor] + image.dot(lattice) - coords[center],axis=1), distance)
+        # sorted by the center atom in the order of centers, and then by the distance
+        order = [list(centers).index(i) for i in center]
+        self.assertEqual(order, sorted(order))
+        for i in set(center):
+            self.assertTrue(np.all(np.diff(distance[center == i]) >= 0))
+
+    def test_cubic(self):
+        rng = np.random.default_rng(0)
+        self.check(np.eye(3) * 5.0, rng.random((20,3)) * 5.0, 2.5)
+
+    def test_triclinic(self):
+        rng = np.random.default_rng(1)
+        lattice = [[4.0,0.0,0.0],[1.5,3.5,0.0],[0.8,-1.2,4.5]]
+        frac = rng.random((12,3))
+        self.check(lattice, frac.dot(lattice), 3.0, centers=[3,0,7])
+
+    def test_atoms_outside_cell(self):
+        rng = np.random.default_rng(2)
+        lattice = np.eye(3) * 3.0
+        frac = rng.random((6,3)) * 3 - 1
+        self.check(lattice, frac.dot(lattice), 2.0)
+
+    def test_cutoff_larger_than_cell(self):
+        # the neighbors include the images of the center atom itself
+        self.check([[2.0,0,0],[0,2.5,0],[0,0,3.0]], [[0.1,0.2,0.3],[1.0,1.2,1.4]], 4.5)
+
+    def test_fractional_coordinates(self):
+        lattice = [[3.0,0,0],[0,3.0,0],[0,0,3.0]]
+        frac = [[0,0,0],[0.5,0.5,0.5]]
+        result = neighbor_list(lattice,frac,2.7,cartesian=False)
+        expected = neighbor_list(lattice,np.dot(frac,lattice),2.7)
+        for i,j in zip(result,expected):
+            np.testing.assert_allclose(i,j)
+        # each atom of the bcc cell has 8 nearest neighbors
+        self.assertEqual(np.bincount(result[0]).tolist(), [8,8])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
-import unittest,os,shutil,re
+import unittest,os,shutil,re,json,tempfile,argparse
 from pathlib import Path
 
-from abacustest import prepare
+import numpy as np
+from abacustest import prepare,constant
 import defaultset
 
 class TestPredft(unittest.TestCase):
@@ -307,4 +308,189 @@ class TestPredft(unittest.TestCase):
                         dpks_descriptor = stru_text[i+1].strip().split()[0]
                         break
                 self.assertTrue(dpks_descriptor in ["jle.orb","./jle.orb"])       
-    
\ No newline at end of file
+    
+    def test_prepare_plan_shard(self):
+        # case5: only list the examples by plan, and prepare the examples in 3 shards
+        param_setting = {
+            "example_template": ["a","b"],
+            "mix_input": {
+                "ecutwfc": [50, 60, 70],
+                "kspacing": [0.1, 0.12]
+            }
+        }
+        plan_setting = prepare.DoPrepare(param_setting,"abacustest",plan=True)
+        self.assertFalse(os.path.exists("abacustest"))
+        self.assertEqual([len(i) for i in plan_setting], [6, 6])
+        
+        # the first swept parameter changes fastest, which is same as before
+        settings = list(plan_setting[0].values())
+        self.assertEqual([[i[-1]["ecutwfc"],i[-1]["kspacing"]] for i in settings],
+                         [[50,0.1],[60,0.1],[70,0.1],[50,0.12],[60,0.12],[70,0.12]])
+        
+        all_paths = []
+        for ishard in range(3):
+            shard_setting = prepare.DoPrepare(param_setting,"abacustest",shard=(ishard,3))
+            self.assertEqual(sum([len(i) for i in shard_setting]), 4)
+            for i in shard_setting:
+                for j in i:
+                    self.assertTrue(os.path.isfile(os.path.join(j,"INPUT")))
+                    all_paths.append(j)
+        self.assertEqual(sorted(all_paths), sorted(list(plan_setting[0]) + list(plan_setting[1])))
+
+    def test_prepare_nproc(self):
+        # case6: prepare by several threads, the paths and files should be same as by one thread
+        param_setting = {
+            "example_template": ["a","b","c"],
+            "mix_input": {
+                "ecutwfc": [50, 60, 70],
+                "kspacing": [0.1, 0.12]
+            },
+            "mix_kpt": [2, 3]
+        }
+        serial_setting = prepare.DoPrepare(param_setting,"abacustest1")
+        parallel_setting = prepare.DoPrepare(param_setting,"abacustest2",nproc=4)
+        self.assertEqual(len(serial_setting), len(parallel_setting))
+        for i,j in zip(serial_setting,parallel_setting):
+            self.assertEqual([os.path.relpath(k,"abacustest1") for k in i], [os.path.relpath(k,"abacustest2") for k in j])
+            self.assertEqual(list(i.values()), list(j.values()))
+            for k1,k2 in zip(i,j):
+                self.assertEqual(sorted(os.listdir(k1)), sorted(os.listdir(k2)))
+                for ifile in ["INPUT","KPT","STRU"]:
+                    self.assertEqual(Path(os.path.join(k1,ifile)).read_text(), Path(os.path.join(k2,ifile)).read_text())
+
+    def test_prepare_file_manifest(self):
+        # case7: the pp files defined in each STRU should only be linked to the examples of this STRU
+        for i in range(3):
+            os.makedirs("s%d" % i,exist_ok=True)
+            Path("s%d/STRU" % i).write_text(defaultset.STRU1.replace("Si.upf","Si%d.upf" % i))
+            Path("s%d/Si%d.upf" % (i,i)).write_text("Si%d.upf" % i)
+            Path("s%d/Si.orb" % i).write_text("Si.orb")
+        param_setting = {
+            "example_template": ["a"],
+            "mix_stru": ["s*/STRU"],
+            "extra_files": ["a/Si.orb","a/Si.orb"]
+        }
+        all_path_setting = prepare.DoPrepare(param_setting,"abacustest",summary_file="summary.json")
+        self.assertEqual(len(all_path_setting[0]), 3)
+        for j,v in all_path_setting[0].items():
+            ipp = v[0].split(os.sep)[0][1:]
+            self.assertEqual(sorted(os.listdir(j)), sorted(["INPUT","KPT","STRU","Si.orb","Si%s.upf" % ipp]))
+        
+        summary = json.load(open("summary.json"))
+        self.assertEqual(summary["total"]["jobs"], 3)
+        self.assertEqual(summary["total"]["links"], sum([i["links"] for i in summary["jobs"]]))
+        self.assertEqual(summary["total"]["links"], 12)  # KPT, STRU, Si.orb and SiX.upf
+
+    def test_prepare_same_files(self):
+        # case9: the files with the same name and content are linked once, and files with different names are all linked
+        Path("Si_copy.orb").write_text("Si.orb")
+        param_setting = {
+            "example_template": ["a"],
+            "extra_files": ["a/Si.orb","b/Si.orb","./a/Si.orb","Si_copy.orb"]
+        }
+        all_path_setting = prepare.DoPrepare(param_setting,"abacustest",summary_file="summary.json")
+        for j in all_path_setting[0]:
+            self.assertEqual(sorted(os.listdir(j)), sorted(["INPUT","KPT","STRU","Si.upf","Si.orb","Si_copy.orb"]))
+            self.assertEqual(Path(os.path.join(j,"Si_copy.orb")).read_text(), "Si.orb")
+        with open("summary.json") as f1:
+            summary = json.load(f1)
+        self.assertEqual(summary["total"]["links"], 5)  # KPT, STRU, Si.upf, Si.orb and Si_copy.orb
+
+    def test_prepare_empty_list(self):
+        # case8: the parameter with an empty list is removed from INPUT, and other inputs are still prepared
+        param_setting = {
+            "example_template": ["a"],
+            "mix_input": {
+                "ecutwfc": [60, 70],
+                "basis_type": [],
+                "smearing_sigma": []
+            }
+        }
+        all_path_setting = prepare.DoPrepare(param_setting,"abacustest")
+        self.assertEqual(len(all_path_setting[0]), 2)
+        ecutwfc = []
+        for j,v in all_path_setting[0].items():
+            self.assertEqual(v[-1]["smearing_sigma"], None)
+            iinput = prepare.PrepareAbacus.ReadInput(os.path.join(j,"INPUT"))
+            self.assertNotIn("basis_type", iinput)
+            self.assertNotIn("smearing_sigma", iinput)
+            ecutwfc.append(iinput["ecutwfc"])
+        self.assertEqual(sorted(ecutwfc), [60,70])
+
+    def test_shard_type(self):
+        self.assertEqual(prepare.ShardType("1/4"), (1,4))
+        for value in ["4/4","-1/4","1","a/4","1/2/3"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                prepare.ShardType(value)
+
+class TestAbacusStru(unittest.TestCase):
+    def setUp(self):
+        self.work_path = tempfile.mkdtemp()
+        self.struf = os.path.join(self.work_path,"STRU")
+        Path(self.struf).write_text(defaultset.STRU1)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path)
+
+    def test_move_flags(self):
+        # the move flags of each atom are kept when the STRU is read and written
+        stru = prepare.AbacusStru.ReadStru(self.struf)
+        self.assertEqual(stru.get_move(), ["0 0 0","1 1 1"])
+        newf = os.path.join(self.work_path,"STRU.new")
+        stru.write(newf)
+        new_stru = prepare.AbacusStru.ReadStru(newf)
+        self.assertEqual(new_stru.get_move(), ["0 0 0","1 1 1"])
+        self.assertEqual(new_stru.get_coord(), stru.get_coord())
+        self.assertEqual(new_stru.get_cell(), stru.get_cell())
+
+    def test_atom_settings(self):
+        # the settings after the move flags, and the default flags of the atom without settings
+        Path(self.struf).write_text(defaultset.STRU1.replace("0.00 0.00 0.00 0 0 0","0.00 0.00 0.00 m 0 0 1 mag 1.0").replace("0.25 0.25 0.25 1 1 1","0.25 0.25 0.25"))
+        stru = prepare.AbacusStru.ReadStru(self.struf)
+        self.assertEqual(stru.get_move(), ["m 0 0 1 mag 1.0","1 1 1"])
+        stru.write(self.struf)
+        self.assertEqual(prepare.AbacusStru.ReadStru(self.struf).get_move(), ["m 0 0 1 mag 1.0","1 1 1"])
+
+    def test_default_move_flags(self):
+        stru = prepare.AbacusStru(label=["Si"],atom_number=[2],cell=[[1,0,0],[0,1,0],[0,0,1]],
+                                  coord=[[0,0,0],[0.5,0.5,0.5]],pp=["Si.upf"],magmom=[0.0])
+        self.assertEqual(stru.get_move(), ["1 1 1","1 1 1"])
+        stru.write(self.struf)
+        coord_lines = Path(self.struf).read_text().strip().split("\n")[-2:]
+        self.assertEqual([i.split()[3:] for i in coord_lines], [["1","1","1"],["1","1","1"]])
+
+    def test_readonly_array(self):
+        stru = prepare.AbacusStru.ReadStru(self.struf)
+        for value in [stru.get_coord(array=True),stru.get_coord(direct=True,array=True),
+                      stru.get_cell(array=True),stru.get_type_index()]:
+            with self.assertRaises(ValueError):
+                value[0] = 1
+        # the list is a copy, and the change does not affect the structure
+        coord = stru.get_coord()
+        coord[0][0] = 100.0
+        self.assertEqual(stru.get_coord(array=True)[0,0], 0.0)
+        np.testing.assert_array_equal(stru.get_label(array=True), ["Si","Si"])
+        np.testing.assert_array_equal(stru.get_element(array=True), [14,14])
+
+    def test_coordinate_round_trip(self):
+        # STRU1 is cartesian in unit of lattice constant 10.2 Bohr
+        stru = prepare.AbacusStru.ReadStru(self.struf)
+        cell_bohr = np.array([[0.5,0.5,0.0],[0.5,0.0,0.5],[0.0,0.5,0.5]]) * 10.2
+        cart_bohr = np.array([[0.0,0.0,0.0],[0.25,0.25,0.25]]) * 10.2
+        np.testing.assert_allclose(stru.get_cell(bohr=True,array=True), cell_bohr)
+        np.testing.assert_allclose(stru.get_cell(array=True), cell_bohr * constant.BOHR2A)
+        np.testing.assert_allclose(stru.get_coord(bohr=True,array=True), cart_bohr)
+        np.testing.assert_allclose(stru.get_coord(array=True), cart_bohr * constant.BOHR2A)
+        
+        # cartesian -> direct -> cartesian
+        direct = stru.get_coord(direct=True,array=True)
+        np.testing.assert_allclose(direct.dot(cell_bohr), cart_bohr, atol=1e-12)
+        direct_stru = prepare.AbacusStru(label=["Si"],atom_number=[2],cell=stru.get_cell(bohr=True,array=True),
+                                         coord=direct,pp=["Si.upf"],magmom=[0.0])
+        np.testing.assert_allclose(direct_stru.get_coord(bohr=True,array=True), cart_bohr, atol=1e-12)
+        np.testing.assert_allclose(direct_stru.get_coord(direct=True,array=True), direct)
+        
+        # write as direct and read back
+        direct_stru.write(self.struf)
+        new_stru = prepare.AbacusStru.ReadStru(self.struf)
+        np.testing.assert_allclose(new_stru.get_coord(array=True), cart_bohr * constant.BOHR2A, atol=1e-9)